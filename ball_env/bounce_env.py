@@ -408,6 +408,86 @@ class Bounce:
 
             return np.array(losses), np.array(trajectories), np.array(grad_norms)
 
+    @wp.kernel
+    def clip_kernel(x: wp.array(dtype=wp.vec3), clip: float):
+        v = x[0]
+        x[0] = wp.vec3(
+            wp.clamp(v[0], -clip, clip),
+            wp.clamp(v[1], -clip, clip),
+            wp.clamp(v[2], -clip, clip),
+        )
+
+    def train_loop(self, iters, clip=False, log_interval=16, tol=1e-4):
+        """First-order training loop that stays on the device, also on CPU
+
+        Alternative to train_graph() where graph capture is not available: the
+        tape and loss / gradient buffers are allocated once, gradient averaging,
+        clipping and the descent step run as kernels, and losses and trajectories
+        are only copied to NumPy every log_interval iterations. As in train_graph()
+        the per-env noise is drawn once at construction and not resampled.
+        """
+
+        tape = wp.Tape()
+        x = self.states[0].particle_qd
+        x_grad = wp.zeros(1, dtype=wp.vec3, device=self.device)
+
+        losses = []
+        trajectories = []
+
+        for i in range(iters):
+            with wp.ScopedTimer("Step", active=self.profile):
+                self.loss.zero_()
+                self.l.zero_()
+
+                with tape:
+                    self.compute_loss()
+                    self.sum_loss()
+
+                tape.backward(self.l)
+
+                # gradient descent step on the mean gradient
+                x_grad.zero_()
+
+                wp.launch(
+                    self.mean_kernel,
+                    dim=len(x),
+                    inputs=[x.grad, x_grad, float(self.num_envs)],
+                    device=self.device,
+                )
+
+                if clip:
+                    wp.launch(
+                        self.clip_kernel,
+                        dim=1,
+                        inputs=[x_grad, float(clip)],
+                        device=self.device,
+                    )
+
+                wp.launch(
+                    self.step_kernel,
+                    dim=len(x),
+                    inputs=[x, x_grad, self.train_rate],
+                    device=self.device,
+                )
+
+                # clear grads and recorded launches for next iteration
+                tape.reset()
+
+            if i % log_interval == 0 or i == iters - 1:
+                losses.append(self.loss.numpy().copy())
+                trajectories.append(self.trajectory())
+
+                if len(losses) > 2:
+                    if np.abs(losses[-1].mean() - losses[-2].mean()) < tol:
+                        print("Early stopping at iter", i)
+                        break
+
+            if self.render:
+                with wp.ScopedTimer("Render", active=self.profile):
+                    self.render_iter(i)
+
+        return np.array(losses), np.array(trajectories)
+
     def train_graph(self, iters, clip=False, norm=False, tol=1e-4):
         # capture forward/backward passes
         wp.capture_begin()
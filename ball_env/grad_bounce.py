@@ -7,18 +7,11 @@
 
 import os
 import numpy as np
-from tqdm import tqdm
 
-from bounce_env import Bounce
-
-import warp as wp
-import warp.sim
-import warp.sim.render
+from horizon_sweep import horizon_sweep
 
 
 def main():
-    np.random.seed(0)
-
     std = 1e-1
     n = 2
     m = 2
@@ -26,41 +19,8 @@ def main():
     H = 40
     clip = 5.0
 
-    fobgs = []
-    zobgs = []
-    losses = []
-    baseline = []
-
-    for h in tqdm(range(1, H + 1)):
-        env = Bounce(num_envs=N, num_steps=h, profile=False, render=False)
-        w = env.noise_[:, :2]
-
-        param = env.states[0].particle_qd
-
-        tape = wp.Tape()
-        with tape:
-            loss = env.compute_loss()
-            l = env.sum_loss()
-        tape.backward(l)
-        fobg = tape.gradients[param].numpy()
-        fobg = fobg[:, :2]
-
-        # gradient clipping by value
-        # print(np.sum(np.abs(fobg) > clip))
-        # fobg = np.clip(fobg, -clip, clip)
-
-        # gradient clipping by norm
-        # if np.any(fobg > clip):
-        # fobg = clip * fobg / np.linalg.norm(fobg)
-
-        tape.zero()
-        loss = loss.numpy()
-
-        losses.append(loss)
-        baseline.append(loss[0])
-        zobg = 1 / std**2 * (loss[..., None] - loss[0]) * w
-        zobgs.append(zobg)
-        fobgs.append(fobg)
+    # all horizons 1..H from a single rollout and backward pass
+    result = horizon_sweep(num_envs=N, horizon=H, std=std, seed=0)
 
     # env.render_iter(0)  # render last interation
 
@@ -74,10 +34,10 @@ def main():
     np.savez(
         filename,
         h=np.arange(0, H),
-        zobgs=zobgs,
-        fobgs=fobgs,
-        losses=losses,
-        baseline=baseline,
+        zobgs=result["zobgs"],
+        fobgs=result["fobgs"],
+        losses=result["losses"],
+        baseline=result["baseline"],
         std=std,
         n=n,
         m=m,
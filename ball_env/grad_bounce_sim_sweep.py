@@ -7,29 +7,16 @@
 
 import os
 import numpy as np
-from tqdm import tqdm
 
-from bounce_env import Bounce
-
-import warp as wp
-import warp.sim
-import warp.sim.render
+from horizon_sweep import run_sweeps
 
 
 def main():
-    np.random.seed(0)
-
     std = 1e-1
-    n = 2
-    m = 2
     N = 128
     H = 40
     clip = 5.0
 
-    w = np.random.normal(0.0, std, (N, m))
-    w[0] = 0.0  # for baseline
-    ww = np.append(w, np.zeros((N, 1)), axis=1)
-
     sweeps = [
         {
             "soft_contact_ke": 1e4,
@@ -82,52 +69,8 @@ def main():
         },
     ]
 
-    results = []
-
-    for i, params in enumerate(sweeps):
-        print("Sweep", i)
-
-        fobgs = []
-        zobgs = []
-        losses = []
-        baseline = []
-
-        for h in tqdm(range(1, H + 1)):
-            env = Bounce(N, h, profile=False, render=False, **params)
-
-            param = env.states[0].particle_qd
-
-            tape = wp.Tape()
-            with tape:
-                loss = env.compute_loss()
-                l = env.sum_loss()
-            tape.backward(l)
-            fobg = tape.gradients[param].numpy()
-            fobg = fobg[:, :2]
-            # gradient clipping by value
-            # print(np.sum(np.abs(fobg) > clip))
-            # fobg = np.clip(fobg, -clip, clip)
-
-            # gradient clipping by norm
-            # if np.any(fobg > clip):
-            # fobg = clip * fobg / np.linalg.norm(fobg)
-            tape.zero()
-            loss = loss.numpy()
-
-            losses.append(loss)
-            baseline.append(loss[0])
-            zobg = 1 / std**2 * (loss[..., None] - loss[0]) * w
-            zobgs.append(zobg)
-            fobgs.append(fobg)
-
-        result = {
-            "zobgs": np.array(zobgs),
-            "fobgs": np.array(fobgs),
-            "losses": np.array(losses),
-            "baseline": np.array(baseline),
-        }
-        result.update(params)
-        results.append(result)
+    # every parameter set shares the noise seed, horizons 1..H come from one rollout
+    results = run_sweeps(sweeps, num_envs=N, horizon=H, std=std, seed=0)
 
     # env.render_iter(0)  # render last interation
 
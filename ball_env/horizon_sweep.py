@@ -0,0 +1,160 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+###########################################################################
+# Horizon sweep engine for the ball bounce gradient studies
+#
+# Instead of building a new Bounce env and simulating from scratch for
+# every horizon h = 1..H, every env is replicated once per horizon and the
+# replicas are simulated together for H steps. Replica h evaluates its loss
+# at the end of step h, so a single rollout and a single backward pass give
+# the per-env losses, first-order and zeroth-order gradients of every
+# prefix horizon. Replicas share the initial velocity noise of their env.
+#
+###########################################################################
+
+import os
+import multiprocessing
+
+import numpy as np
+
+from bounce_env import Bounce
+
+import warp as wp
+import warp.sim
+
+
+class HorizonBounce(Bounce):
+    """Bounce env with num_envs particles per horizon, particle h*num_envs + i
+    is env i evaluated after h + 1 steps"""
+
+    def __init__(self, num_envs=32, num_steps=200, **kwargs):
+        self.horizon_envs = num_envs
+        self.num_horizons = num_steps
+
+        super().__init__(num_envs=num_envs * num_steps, num_steps=num_steps, **kwargs)
+
+    def noise(self):
+        noise = np.random.normal(0.0, self.std, (self.horizon_envs, 2))
+        noise[0] = 0.0  # for baseline
+        noise = np.append(noise, np.zeros((self.horizon_envs, 1)), axis=1)
+
+        self.noise_ = np.tile(noise, (self.num_horizons, 1))
+        return self.noise_
+
+    @wp.kernel
+    def horizon_loss_kernel(
+        pos: wp.array(dtype=wp.vec3),
+        target: wp.vec3,
+        offset: int,
+        loss: wp.array(dtype=float),
+    ):
+        i = wp.tid() + offset
+        delta = pos[i] - target
+        loss[i] = wp.dot(delta, delta)
+
+    def compute_loss(self):
+        for i in range(self.sim_steps):
+            self.states[i].clear_forces()
+            wp.sim.collide(self.model, self.states[i])
+            self.integrator.simulate(
+                self.model, self.states[i], self.states[i + 1], self.sim_dt
+            )
+            self.count_contact_changes(i)
+
+            # losses of the replicas whose horizon ends with this step
+            if (i + 1) % self.sim_substeps == 0:
+                h = (i + 1) // self.sim_substeps - 1
+
+                wp.launch(
+                    self.horizon_loss_kernel,
+                    dim=self.horizon_envs,
+                    inputs=[
+                        self.states[i + 1].particle_q,
+                        self.target,
+                        h * self.horizon_envs,
+                        self.loss,
+                    ],
+                    device=self.device,
+                )
+
+        return self.loss
+
+
+def horizon_sweep(num_envs=128, horizon=40, std=1e-1, seed=0, **params):
+    """Returns losses and gradient estimates of every horizon 1..horizon
+
+    Args:
+        num_envs: Number of noisy initial velocities, env 0 is the noise free baseline
+        horizon: Longest horizon in steps
+        std: Standard deviation of the initial velocity noise
+        seed: Seed of the noise, shared by all horizons
+        params: Contact parameters passed to Bounce
+
+    Returns:
+        A dict with zobgs and fobgs of shape [horizon, num_envs, 2], losses of shape
+        [horizon, num_envs] and the baseline loss of env 0 for each horizon
+    """
+
+    np.random.seed(seed)
+
+    env = HorizonBounce(
+        num_envs=num_envs, num_steps=horizon, std=std, profile=False, render=False, **params
+    )
+    w = env.noise_[:num_envs, :2]
+
+    param = env.states[0].particle_qd
+
+    tape = wp.Tape()
+    with tape:
+        loss = env.compute_loss()
+        l = env.sum_loss()
+    tape.backward(l)
+
+    # replicas are independent, so the gradient of the summed loss w.r.t. the
+    # initial velocity of a replica is the gradient of its own loss
+    fobgs = tape.gradients[param].numpy().reshape(horizon, num_envs, 3)[..., :2]
+    tape.zero()
+
+    losses = loss.numpy().reshape(horizon, num_envs)
+    baseline = losses[:, 0]
+    zobgs = 1 / std**2 * (losses[..., None] - baseline[:, None, None]) * w
+
+    return {
+        "zobgs": zobgs,
+        "fobgs": fobgs,
+        "losses": losses,
+        "baseline": baseline,
+    }
+
+
+def _sweep_worker(args):
+    kwargs, params = args
+
+    result = horizon_sweep(**kwargs, **params)
+    result.update(params)
+    return result
+
+
+def run_sweeps(sweeps, processes=None, **kwargs):
+    """Runs horizon_sweep() for every parameter set in sweeps across a process pool
+
+    Each worker initializes its own warp context, kwargs are shared by all
+    parameter sets. Results are returned in the order of sweeps.
+    """
+
+    if processes is None:
+        processes = min(len(sweeps), os.cpu_count())
+
+    jobs = [(kwargs, params) for params in sweeps]
+
+    if processes <= 1:
+        return [_sweep_worker(job) for job in jobs]
+
+    # spawn, since warp / CUDA state does not survive a fork
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        return pool.map(_sweep_worker, jobs)
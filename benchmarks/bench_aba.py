@@ -0,0 +1,109 @@
+"""Compares simulation steps/sec and peak device memory of the dense mass
+matrix dynamics (J^T*M*J, Cholesky, solve) against the O(n) articulated body
+algorithm selected with SemiImplicitIntegrator(dynamics="aba").
+
+    python benchmarks/bench_aba.py --envs HumanoidEnv,SNUHumanoidEnv --num_envs 2048
+    python benchmarks/bench_aba.py --envs HumanoidEnv --grad
+"""
+
+import argparse
+import time
+
+import torch
+
+from dflex import envs
+
+
+def step(env, grad, horizon):
+    state = env.state
+    loss = torch.zeros((), device=env.device)
+
+    for _ in range(horizon if grad else 1):
+        state = env.integrator.forward(
+            env.model,
+            state,
+            env.sim_dt,
+            env.sim_substeps,
+            env.MM_caching_frequency,
+        )
+        loss = loss + (state.joint_qd**2).sum()
+
+    if grad:
+        loss.backward()
+    else:
+        env.state = state
+
+
+def bench(env, grad, horizon, steps, warmup):
+    for _ in range(warmup):
+        step(env, grad, horizon)
+
+    cuda = env.device.startswith("cuda")
+    if cuda:
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step(env, grad, horizon)
+
+    if cuda:
+        torch.cuda.synchronize()
+
+    elapsed = time.perf_counter() - start
+    peak = torch.cuda.max_memory_allocated() if cuda else 0
+
+    return steps * (horizon if grad else 1) / elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envs", type=str, default="HumanoidEnv,SNUHumanoidEnv")
+    parser.add_argument("--num_envs", type=int, default=2048)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--grad", action="store_true")
+    parser.add_argument("--horizon", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.grad:
+        args.steps = max(1, args.steps // args.horizon)
+        args.warmup = max(1, args.warmup // args.horizon)
+
+    mb = 1.0 / 2**20
+
+    for name in args.envs.split(","):
+        print(
+            "{} x {} envs on {} ({})".format(
+                name, args.num_envs, args.device, "grad" if args.grad else "no-grad"
+            )
+        )
+
+        results = {}
+        for dynamics in ("dense", "aba"):
+            env = getattr(envs, name)(
+                num_envs=args.num_envs,
+                device=args.device,
+                no_grad=not args.grad,
+                early_termination=False,
+                dynamics=dynamics,
+            )
+            env.reset()
+
+            rate, peak = bench(env, args.grad, args.horizon, args.steps, args.warmup)
+            results[dynamics] = rate
+
+            print(
+                "  {:6s} {:10.1f} steps/sec ({:.2f}x), peak {:10.1f} MB".format(
+                    dynamics + ":", rate, rate / results["dense"], peak * mb
+                )
+            )
+
+            del env
+            if args.device.startswith("cuda"):
+                torch.cuda.empty_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compares training iterations/sec of Bounce.train(), which copies losses,
+gradients and trajectories to NumPy every iteration, against the on-device
+Bounce.train_loop() that also runs on CPU-only machines.
+
+    python benchmarks/bench_bounce_train.py --device cpu --num_envs 128 --iters 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ball_env"))
+
+from bounce_env import Bounce
+
+
+def timed(env, name, iters, **kwargs):
+    start = time.perf_counter()
+    losses = getattr(env, name)(iters, **kwargs)[0]
+
+    return iters / (time.perf_counter() - start), losses[-1].mean()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--num_envs", type=int, default=128)
+    parser.add_argument("--num_steps", type=int, default=40)
+    parser.add_argument("--iters", type=int, default=50)
+    parser.add_argument("--log_interval", type=int, default=16)
+    args = parser.parse_args()
+
+    results = {}
+    for name, kwargs in (
+        ("train", {}),
+        ("train_loop", {"log_interval": args.log_interval, "tol": 0.0}),
+    ):
+        np.random.seed(0)
+        env = Bounce(
+            num_envs=args.num_envs, num_steps=args.num_steps, adapter=args.device
+        )
+
+        # warm up kernel compilation
+        getattr(env, name)(1, **kwargs)
+
+        rate, loss = timed(env, name, args.iters, **kwargs)
+        results[name] = rate
+
+        print(
+            "{:10s} {:8.2f} iters/sec ({:.2f}x), final mean loss {:.4f}".format(
+                name, rate, rate / results["train"], loss
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Memory/time trade-off of checkpointed simulation steps, where only the
+joint state at each step boundary is kept and the substeps are simulated
+again during backward, against recording every kernel launch. Memory is only
+reported for CUDA devices. Gradients of the two modes are compared by
+dflex/tests/test_checkpoint_sim.py.
+
+    python benchmarks/bench_checkpoint.py --env AntEnv --num_envs 1024 --horizons 32 64 128
+"""
+
+import argparse
+import time
+
+import torch
+
+from dflex import envs
+
+
+def rollout(env, horizon):
+    obs = env.initialize_trajectory()
+    loss = torch.zeros((), device=env.device)
+
+    for _ in range(horizon):
+        actions = torch.tanh(obs[:, : env.num_actions])
+        obs, rew, done, info = env.step(actions)
+        loss = loss - rew.sum()
+
+    loss.backward()
+
+
+def bench(env, horizon, iters, warmup):
+    for _ in range(warmup):
+        rollout(env, horizon)
+
+    # peak memory is only tracked for CUDA devices
+    cuda = env.device.startswith("cuda")
+    base = 0
+    if cuda:
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated()
+
+    start = time.perf_counter()
+    for _ in range(iters):
+        rollout(env, horizon)
+
+    if cuda:
+        torch.cuda.synchronize()
+
+    elapsed = (time.perf_counter() - start) / iters
+    peak = torch.cuda.max_memory_allocated() - base if cuda else 0
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="AntEnv")
+    parser.add_argument("--num_envs", type=int, default=1024)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--iters", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    args = parser.parse_args()
+
+    env = getattr(envs, args.env)(
+        num_envs=args.num_envs,
+        device=args.device,
+        no_grad=False,
+        early_termination=False,
+    )
+    env.reset()
+
+    mb = 1.0 / 2**20
+    print("{} x {} envs on {}".format(args.env, args.num_envs, args.device))
+    print("  horizon   recorded ms / MB     checkpointed ms / MB     time   memory")
+
+    for horizon in args.horizons:
+        results = []
+        for checkpoint in (False, True):
+            env.checkpoint_sim = checkpoint
+            results.append(bench(env, horizon, args.iters, args.warmup))
+
+        (t0, m0), (t1, m1) = results
+        print(
+            "  {:7d} {:9.1f} / {:8.1f} {:12.1f} / {:8.1f} {:7.2f}x {:7.2f}x".format(
+                horizon,
+                t0 * 1e3,
+                m0 * mb,
+                t1 * 1e3,
+                m1 * mb,
+                t1 / t0,
+                m1 / m0 if m0 > 0 else float("nan"),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
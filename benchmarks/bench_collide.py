@@ -0,0 +1,121 @@
+"""Times Model.collide() contact generation against the previous per-shape Python
+loop on replicated models and checks both produce identical contact tensors.
+
+    python benchmarks/bench_collide.py --assets ant,humanoid,snu --num_envs 4096
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import dflex as df
+from dflex.model import GEO_BOX, GEO_CAPSULE, GEO_MESH, GEO_SPHERE
+
+from bench_model_build import BUILDERS
+
+
+def collide_loop(model):
+    """Reference per-shape loop that Model.collide() used to run"""
+
+    body0, body1, point, dist, mat = [], [], [], [], []
+
+    def add_contact(b0, t, p0, d, m):
+        body0.append(b0)
+        body1.append(-1)
+        point.append(df.transform_point(t, np.array(p0)))
+        dist.append(d)
+        mat.append(m)
+
+    for i in range(model.shape_count):
+        X_bs = df.transform_expand(model.shape_transform[i].tolist())
+        geo_type = model.shape_geo_type[i].item()
+        body = model.shape_body[i]
+
+        if geo_type == GEO_SPHERE:
+            add_contact(body, X_bs, (0.0, 0.0, 0.0), model.shape_geo_scale[i][0].item(), i)
+
+        elif geo_type == GEO_CAPSULE:
+            radius = model.shape_geo_scale[i][0].item()
+            half_width = model.shape_geo_scale[i][1].item()
+
+            add_contact(body, X_bs, (-half_width, 0.0, 0.0), radius, i)
+            add_contact(body, X_bs, (half_width, 0.0, 0.0), radius, i)
+
+        elif geo_type == GEO_BOX:
+            e = model.shape_geo_scale[i].tolist()
+
+            for z in (-1.0, 1.0):
+                for y in (-1.0, 1.0):
+                    for x in (-1.0, 1.0):
+                        add_contact(body, X_bs, (x * e[0], y * e[1], z * e[2]), 0.0, i)
+
+        elif geo_type == GEO_MESH:
+            scale = model.shape_geo_scale[i]
+
+            for v in model.shape_geo_src[i].vertices:
+                p = (v[0] * scale[0], v[1] * scale[1], v[2] * scale[2])
+                add_contact(body, X_bs, p, 0.0, i)
+
+    device = model.adapter
+
+    return {
+        "contact_body0": torch.tensor(body0, dtype=torch.int32, device=device),
+        "contact_body1": torch.tensor(body1, dtype=torch.int32, device=device),
+        "contact_point0": torch.tensor(point, dtype=torch.float32, device=device),
+        "contact_dist": torch.tensor(dist, dtype=torch.float32, device=device),
+        "contact_material": torch.tensor(mat, dtype=torch.int32, device=device),
+    }
+
+
+def timed(func, model):
+    start = time.perf_counter()
+    result = func(model)
+
+    if model.adapter.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=str, default="ant,humanoid,snu")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    args = parser.parse_args()
+
+    for name in args.assets.split(","):
+        builder = df.sim.ModelBuilder()
+        BUILDERS[name](builder)
+        model = builder.finalize(args.device, replicas=args.num_envs)
+
+        reference, loop_time = timed(collide_loop, model)
+        _, vec_time = timed(lambda m: m.collide(None), model)
+
+        mismatched = [
+            attr
+            for attr, value in reference.items()
+            if not torch.equal(value.view(getattr(model, attr).shape), getattr(model, attr))
+        ]
+        max_error = (reference["contact_point0"].view(-1, 3) - model.contact_point0).abs().max()
+
+        print(
+            "{} x {} envs on {}, {} contacts".format(
+                name, args.num_envs, args.device, model.contact_count
+            )
+        )
+        print("  per-shape loop: {:8.3f} s".format(loop_time))
+        print(
+            "  vectorized:     {:8.3f} s ({:.1f}x)".format(vec_time, loop_time / vec_time)
+        )
+        print(
+            "  mismatched tensors: {}, max point error {:.3e}".format(
+                mismatched or "none", max_error.item()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compares simulation steps/sec with and without ground contact compaction
+(dflex.config.contact_compaction), reports the fraction of contact points the
+broadphase keeps active and checks the final states match.
+
+    python benchmarks/bench_contacts.py --envs HumanoidEnv,SNUHumanoidEnv --num_envs 1024
+    python benchmarks/bench_contacts.py --envs HumanoidEnv --grad
+"""
+
+import argparse
+import time
+
+import torch
+
+import dflex as df
+from dflex import envs
+
+
+def rollout(env, grad, horizon):
+    env.reset()
+    env.integrator.reset_contact_stats()
+
+    state = env.state
+    loss = torch.zeros((), device=env.device)
+
+    for _ in range(horizon):
+        state = env.integrator.forward(
+            env.model, state, env.sim_dt, env.sim_substeps, env.MM_caching_frequency
+        )
+        loss = loss + (state.joint_qd**2).sum()
+
+    if grad:
+        loss.backward()
+
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envs", type=str, default="HumanoidEnv,SNUHumanoidEnv")
+    parser.add_argument("--num_envs", type=int, default=1024)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--grad", action="store_true")
+    parser.add_argument("--horizon", type=int, default=32)
+    parser.add_argument("--iters", type=int, default=5)
+    args = parser.parse_args()
+
+    cuda = args.device.startswith("cuda")
+    default_compaction = df.config.contact_compaction
+
+    for name in args.envs.split(","):
+        env = getattr(envs, name)(
+            num_envs=args.num_envs,
+            device=args.device,
+            no_grad=not args.grad,
+            early_termination=False,
+        )
+
+        print(
+            "{} x {} envs on {} ({}), {} contact points".format(
+                name,
+                args.num_envs,
+                args.device,
+                "grad" if args.grad else "no-grad",
+                env.model.contact_count,
+            )
+        )
+
+        results = {}
+        for compaction in (False, True):
+            df.config.contact_compaction = compaction
+
+            # warm up
+            rollout(env, args.grad, args.horizon)
+
+            if cuda:
+                torch.cuda.synchronize()
+
+            start = time.perf_counter()
+            for _ in range(args.iters):
+                state = rollout(env, args.grad, args.horizon)
+
+            if cuda:
+                torch.cuda.synchronize()
+
+            rate = args.iters * args.horizon / (time.perf_counter() - start)
+            stats = env.integrator.contact_stats
+            final = torch.cat([state.joint_q, state.joint_qd]).detach()
+            results[compaction] = (rate, final)
+
+            print(
+                "  compaction {:3s}: {:10.1f} steps/sec ({:.2f}x), active contacts {:6.2%}".format(
+                    "on" if compaction else "off",
+                    rate,
+                    rate / results[False][0],
+                    stats["active"] / max(stats["total"], 1),
+                )
+            )
+
+        drift = (results[True][1] - results[False][1]).abs().max().item()
+        print("  max state difference: {:.3e}".format(drift))
+
+        del env
+        if cuda:
+            torch.cuda.empty_cache()
+
+    df.config.contact_compaction = default_compaction
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measures CPU env-steps/sec of dflex envs as a function of the number of
+host threads used to launch kernels (see dflex.config.cpu_threads).
+
+    python benchmarks/bench_cpu_threads.py --envs AntEnv HumanoidEnv --num_envs 4096
+"""
+
+import argparse
+import os
+import time
+
+import torch
+
+import dflex as df
+from dflex import envs
+
+
+def bench_env(env_name, num_envs, threads, steps, warmup):
+    df.adjoint.set_cpu_threads(threads)
+
+    env = getattr(envs, env_name)(
+        num_envs=num_envs,
+        device="cpu",
+        no_grad=True,
+        stochastic_init=False,
+        early_termination=False,
+    )
+    env.reset()
+
+    actions = torch.zeros((env.num_envs, env.num_actions), device="cpu")
+
+    for _ in range(warmup):
+        env.step(actions)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(actions)
+    elapsed = time.perf_counter() - start
+
+    return steps * env.num_envs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envs", nargs="+", default=["AntEnv", "HumanoidEnv"])
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--threads", nargs="+", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    threads = args.threads
+    if threads is None:
+        threads = [1]
+        while threads[-1] * 2 <= (os.cpu_count() or 1):
+            threads.append(threads[-1] * 2)
+
+    print("{:<14} {:>8} {:>16} {:>9}".format("env", "threads", "env-steps/sec", "speedup"))
+
+    for env_name in args.envs:
+        baseline = None
+        for n in threads:
+            sps = bench_env(env_name, args.num_envs, n, args.steps, args.warmup)
+            if baseline is None:
+                baseline = sps
+
+            print(
+                "{:<14} {:>8} {:>16.1f} {:>8.2f}x".format(
+                    env_name, n, sps, sps / baseline
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
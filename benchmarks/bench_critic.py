@@ -0,0 +1,117 @@
+"""Compares critic-phase wall time of the per-minibatch critic loop used by
+SHAC/AHAC before train_critic (CriticDataset with host side NaN filtering and an
+.item() sync per epoch) against StackedCriticDataset + train_critic, reported
+through TimeReport.
+
+    python benchmarks/bench_critic.py --num_envs 1024 --steps 32 --obs_dim 37
+"""
+
+import argparse
+from collections import deque
+
+import numpy as np
+import torch
+from torch.nn.utils.clip_grad import clip_grad_norm_
+
+from shac.models.critic import CriticMLP
+from shac.utils.critic_trainer import train_critic
+from shac.utils.dataset import CriticDataset, StackedCriticDataset
+from shac.utils.time_report import TimeReport
+
+
+def legacy_train(critic, optimizer, obs, target_values, batches, iterations, grad_norm):
+    dataset = CriticDataset(
+        obs.shape[0] * obs.shape[1] // batches, obs, target_values, drop_last=False
+    )
+
+    last_losses = deque(maxlen=5)
+    for j in range(iterations):
+        total_critic_loss = 0.0
+        for i in range(len(dataset)):
+            batch_sample = dataset[i]
+            optimizer.zero_grad()
+            predicted_values = critic.predict(batch_sample["obs"]).squeeze(-2)
+            loss = ((predicted_values - batch_sample["target_values"]) ** 2).mean()
+            loss.backward()
+
+            for params in critic.parameters():
+                params.grad.nan_to_num_(0.0, 0.0, 0.0)
+
+            clip_grad_norm_(critic.parameters(), grad_norm)
+            optimizer.step()
+
+            total_critic_loss += loss
+
+        total_critic_loss /= len(dataset)
+        if len(last_losses) == 5 and abs(np.diff(last_losses).mean()) < 2e-1:
+            return j + 1
+        last_losses.append(total_critic_loss.item())
+
+    return iterations
+
+
+def stacked_train(critic, optimizer, obs, target_values, batches, iterations, grad_norm):
+    dataset = StackedCriticDataset(batches, obs, target_values)
+
+    _, epochs = train_critic(
+        critic,
+        optimizer,
+        dataset,
+        iterations,
+        grad_norm=grad_norm,
+        early_stop=True,
+    )
+
+    return epochs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_envs", type=int, default=1024)
+    parser.add_argument("--steps", type=int, default=32)
+    parser.add_argument("--obs_dim", type=int, default=37)
+    parser.add_argument("--batches", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=64)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    args = parser.parse_args()
+
+    obs = torch.randn((args.steps, args.num_envs, args.obs_dim), device=args.device)
+    target_values = obs.sum(dim=-1)
+
+    time_report = TimeReport()
+
+    for name, train, foreach in (
+        ("legacy critic training", legacy_train, False),
+        ("stacked critic training", stacked_train, True),
+    ):
+        torch.manual_seed(0)
+        critic = CriticMLP(args.obs_dim, [128, 128], "elu", device=args.device)
+        optimizer = torch.optim.Adam(
+            critic.parameters(), 2e-3, (0.7, 0.95), foreach=foreach
+        )
+
+        time_report.add_timer(name)
+        epochs = 0
+        for _ in range(args.epochs):
+            time_report.start_timer(name)
+            epochs += train(
+                critic,
+                optimizer,
+                obs,
+                target_values,
+                args.batches,
+                args.iterations,
+                1.0,
+            )
+            if args.device.startswith("cuda"):
+                torch.cuda.synchronize()
+            time_report.end_timer(name)
+
+        print("{}: {} critic epochs".format(name, epochs))
+
+    time_report.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compares simulation steps/sec of SemiImplicitIntegrator against
+FusedArticulationIntegrator, which evaluates a whole articulation substep in
+one kernel (and all substeps of a no-grad step in one launch).
+
+    python benchmarks/bench_fused.py --envs AntEnv,HumanoidEnv,SNUHumanoidEnv --num_envs 2048
+    python benchmarks/bench_fused.py --envs AntEnv --grad
+"""
+
+import argparse
+import time
+
+import torch
+
+import dflex as df
+from dflex import envs
+
+
+def step(env):
+    env.state = env.integrator.forward(
+        env.model,
+        env.state,
+        env.sim_dt,
+        env.sim_substeps,
+        env.MM_caching_frequency,
+    )
+
+
+def step_grad(env, horizon):
+    state = env.state
+    loss = torch.zeros((), device=env.device)
+
+    for _ in range(horizon):
+        state = env.integrator.forward(
+            env.model,
+            state,
+            env.sim_dt,
+            env.sim_substeps,
+            env.MM_caching_frequency,
+        )
+        loss = loss + (state.joint_qd**2).sum()
+
+    loss.backward()
+
+
+def bench(env, grad, horizon, steps, warmup):
+    def run():
+        if grad:
+            step_grad(env, horizon)
+        else:
+            step(env)
+
+    for _ in range(warmup):
+        run()
+
+    if env.device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        run()
+
+    if env.device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    elapsed = time.perf_counter() - start
+
+    return steps * (horizon if grad else 1) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envs", type=str, default="AntEnv,HumanoidEnv,SNUHumanoidEnv")
+    parser.add_argument("--num_envs", type=int, default=2048)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--grad", action="store_true")
+    parser.add_argument("--horizon", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.grad:
+        args.steps = max(1, args.steps // args.horizon)
+        args.warmup = max(1, args.warmup // args.horizon)
+
+    for name in args.envs.split(","):
+        env = getattr(envs, name)(
+            num_envs=args.num_envs,
+            device=args.device,
+            no_grad=not args.grad,
+            early_termination=False,
+        )
+        env.reset()
+
+        env.integrator = df.sim.SemiImplicitIntegrator()
+        unfused = bench(env, args.grad, args.horizon, args.steps, args.warmup)
+
+        env.reset()
+        env.integrator = df.sim.FusedArticulationIntegrator()
+        fused = bench(env, args.grad, args.horizon, args.steps, args.warmup)
+
+        print(
+            "{} x {} envs on {} ({})".format(
+                name, args.num_envs, args.device, "grad" if args.grad else "no-grad"
+            )
+        )
+        print("  semi-implicit: {:10.1f} steps/sec".format(unfused))
+        print(
+            "  fused:         {:10.1f} steps/sec ({:.2f}x)".format(
+                fused, fused / unfused
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measures cold vs. warm `import dflex` time with the per-kernel compile cache.
+
+The cold run uses an empty kernel cache directory so every kernel is built,
+the warm runs reuse it. Each import runs in a fresh interpreter.
+
+    python benchmarks/bench_import.py --warm_runs 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def time_import(cache_dir, statement):
+    env = dict(os.environ)
+    env["DFLEX_KERNEL_CACHE"] = cache_dir
+
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", statement],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--warm_runs", type=int, default=3)
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="kernel cache to use, defaults to a new temporary directory",
+    )
+    args = parser.parse_args()
+
+    statement = "import dflex"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = args.cache_dir or tmp
+
+        cold = time_import(cache_dir, statement)
+        print("cold import: {:.2f}s".format(cold))
+
+        warm = [time_import(cache_dir, statement) for _ in range(args.warm_runs)]
+        print(
+            "warm import: {:.2f}s (min {:.2f}s over {} runs)".format(
+                sum(warm) / len(warm), min(warm), len(warm)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
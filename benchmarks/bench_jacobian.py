@@ -0,0 +1,129 @@
+"""Times the per-step dynamics jacobian of DFlexEnv(jacobian=True), taken from
+the step's own forward pass, against the previous approach of simulating the
+step a second time and looping over rows with the graph always retained.
+Correctness of every row is checked by dflex/tests/test_jacobian.py.
+
+    python benchmarks/bench_jacobian.py --env AntEnv --num_envs 256
+    python benchmarks/bench_jacobian.py --env HopperEnv --device cpu
+"""
+
+import argparse
+import time
+
+import torch
+
+from dflex import envs
+
+
+def jacobian_loop(output, input):
+    """Reference row loop that DFlexEnv used before"""
+
+    num_envs, input_dim = input.shape
+    output_dim = output.shape[1]
+    jacobians = torch.zeros((num_envs, output_dim, input_dim), dtype=torch.float32)
+    for out_idx in range(output_dim):
+        select_index = torch.zeros(output.shape[1])
+        select_index[out_idx] = 1.0
+        e = torch.tile(select_index, (num_envs, 1)).to(input.device)
+        (grad,) = torch.autograd.grad(
+            outputs=output, inputs=input, grad_outputs=e, retain_graph=True
+        )
+        jacobians[:, out_idx, :] = grad.view(num_envs, input_dim)
+
+    return jacobians
+
+
+def simulate(env, actions):
+    """Simulates the step again from inputs (obs, act) as DFlexEnv.step() used to"""
+
+    inputs = torch.cat((env.obs_buf.clone(), env.unscale_act(actions)), dim=1)
+    inputs.requires_grad_(True)
+    env.set_state_act(inputs[:, : env.num_obs], inputs[:, env.num_obs :])
+
+    output = env.integrator.forward(
+        env.model,
+        env.state,
+        env.sim_dt,
+        env.sim_substeps,
+        env.MM_caching_frequency,
+        False,
+    )
+
+    return env.observation_from_state(output), inputs
+
+
+def timed(func, env, iters):
+    cuda = env.device.startswith("cuda")
+    result = None
+
+    if cuda:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+
+    for _ in range(iters):
+        result = func()
+
+    if cuda:
+        torch.cuda.synchronize()
+
+    return result, (time.perf_counter() - start) / iters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="AntEnv")
+    parser.add_argument("--num_envs", type=int, default=256)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--iters", type=int, default=5)
+    args = parser.parse_args()
+
+    def make_env(jacobian):
+        env = getattr(envs, args.env)(
+            num_envs=args.num_envs,
+            device=args.device,
+            no_grad=False,
+            early_termination=False,
+            jacobian=jacobian,
+        )
+        env.reset()
+
+        return env
+
+    env = make_env(jacobian=False)
+    jac_env = make_env(jacobian=True)
+
+    actions = torch.zeros((env.num_envs, env.num_actions), device=env.device)
+
+    def step():
+        env.initialize_trajectory()
+        env.step(actions)
+
+    def step_jacobian():
+        jac_env.initialize_trajectory()
+        return jac_env.step(actions)[3]["jacobian"]
+
+    def loop():
+        env.initialize_trajectory()
+        env.step(actions)
+        return jacobian_loop(*simulate(env, actions))
+
+    _, step_time = timed(step, env, args.iters)
+    new, new_time = timed(step_jacobian, jac_env, args.iters)
+    _, old_time = timed(loop, env, args.iters)
+
+    print(
+        "{} x {} envs on {}, jacobian {} x {}".format(
+            args.env, args.num_envs, args.device, new.shape[1], new.shape[2]
+        )
+    )
+    print("  step:                   {:8.2f} ms".format(step_time * 1e3))
+    print("  step + re-sim row loop: {:8.2f} ms".format(old_time * 1e3))
+    print(
+        "  step(jacobian=True):    {:8.2f} ms ({:.2f}x)".format(
+            new_time * 1e3, old_time / new_time
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
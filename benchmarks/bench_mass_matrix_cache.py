@@ -0,0 +1,114 @@
+"""Sweeps mass_matrix_freq (MM_caching_frequency) for an environment and reports
+steps/sec, the mass matrix cache statistics and the drift of the final joint
+state against the first frequency of the sweep (refactorizing on every
+substep by default), to pick a frequency per env.
+
+    python benchmarks/bench_mass_matrix_cache.py --env HumanoidEnv --freqs 1,2,4,8,16,48
+    python benchmarks/bench_mass_matrix_cache.py --env SNUHumanoidEnv --grad
+"""
+
+import argparse
+import time
+
+import torch
+
+from dflex import envs
+
+
+def rollout(env, start, freq, grad, horizon):
+    # the no-grad path advances states in-place, so always start from a copy
+    state = env.model.state()
+    with torch.no_grad():
+        state.joint_q.copy_(start.joint_q)
+        state.joint_qd.copy_(start.joint_qd)
+
+    loss = torch.zeros((), device=env.device)
+
+    for _ in range(horizon):
+        state = env.integrator.forward(
+            env.model, state, env.sim_dt, env.sim_substeps, freq
+        )
+        loss = loss + (state.joint_qd**2).sum()
+
+    if grad:
+        loss.backward()
+
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="HumanoidEnv")
+    parser.add_argument("--freqs", type=str, default="1,2,4,8,16,48")
+    parser.add_argument("--num_envs", type=int, default=1024)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--grad", action="store_true")
+    parser.add_argument("--horizon", type=int, default=32)
+    parser.add_argument("--iters", type=int, default=5)
+    args = parser.parse_args()
+
+    env = getattr(envs, args.env)(
+        num_envs=args.num_envs,
+        device=args.device,
+        no_grad=not args.grad,
+        early_termination=False,
+    )
+    env.reset()
+
+    cache = env.model.mass_matrix_cache
+    cuda = args.device.startswith("cuda")
+    mb = 1.0 / 2**20
+
+    start_state = env.state
+
+    reference = None
+
+    print(
+        "{} x {} envs on {} ({}), {} substeps".format(
+            args.env,
+            args.num_envs,
+            args.device,
+            "grad" if args.grad else "no-grad",
+            env.sim_substeps,
+        )
+    )
+
+    for freq in [int(f) for f in args.freqs.split(",")]:
+        # warm up and allocate the buffers held by a rollout
+        rollout(env, start_state, freq, args.grad, args.horizon)
+
+        if cuda:
+            torch.cuda.synchronize()
+
+        cache.reset_stats()
+        cache.reset_peak()
+
+        start = time.perf_counter()
+        for _ in range(args.iters):
+            state = rollout(env, start_state, freq, args.grad, args.horizon)
+
+        if cuda:
+            torch.cuda.synchronize()
+
+        elapsed = time.perf_counter() - start
+        stats = cache.stats()
+
+        final = torch.cat([state.joint_q, state.joint_qd]).detach()
+        if reference is None:
+            reference = final
+        drift = (final - reference).abs().max().item()
+
+        print(
+            "  freq {:3d}: {:10.1f} steps/sec, reuse {:5.1%}, buffer allocs {:3d}, peak held {:8.1f} MB, max drift {:.3e}".format(
+                freq,
+                args.iters * args.horizon / elapsed,
+                stats["reuse_rate"],
+                stats["misses"],
+                stats["peak_bytes"] * mb,
+                drift,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Compares model construction time of populating a ModelBuilder once per
+environment against building a single environment and replicating it with
+ModelBuilder.finalize(replicas=N), and checks both produce the same tensors.
+
+    python benchmarks/bench_model_build.py --assets ant,humanoid,snu --num_envs 4096
+"""
+
+import argparse
+import os
+import time
+
+import torch
+
+import dflex as df
+from dflex.envs import load_utils as lu
+
+ASSETS = os.path.join(os.path.dirname(df.__file__), "envs", "assets")
+
+
+def add_ant(builder):
+    lu.parse_mjcf(
+        os.path.join(ASSETS, "ant.xml"),
+        builder,
+        density=1000.0,
+        stiffness=0.0,
+        damping=1.0,
+        contact_ke=4.0e4,
+        contact_kd=1.0e4,
+        contact_kf=3.0e3,
+        contact_mu=0.75,
+        limit_ke=1.0e3,
+        limit_kd=1.0e1,
+        armature=0.05,
+    )
+
+
+def add_humanoid(builder):
+    lu.parse_mjcf(
+        os.path.join(ASSETS, "humanoid.xml"),
+        builder,
+        stiffness=5.0,
+        damping=0.1,
+        contact_ke=2.0e4,
+        contact_kd=5.0e3,
+        contact_kf=1.0e3,
+        contact_mu=0.75,
+        limit_ke=1.0e3,
+        limit_kd=1.0e1,
+        armature=0.007,
+        load_stiffness=True,
+        load_armature=True,
+    )
+
+
+def add_snu(builder):
+    lu.Skeleton(
+        os.path.join(ASSETS, "snu", "human.xml"),
+        os.path.join(ASSETS, "snu", "muscle284.xml"),
+        builder,
+        {
+            "Pelvis",
+            "FemurR",
+            "TibiaR",
+            "TalusR",
+            "FootThumbR",
+            "FootPinkyR",
+            "FemurL",
+            "TibiaL",
+            "TalusL",
+            "FootThumbL",
+            "FootPinkyL",
+        },
+        stiffness=5.0,
+        damping=2.0,
+        contact_ke=5e3,
+        contact_kd=2e3,
+        contact_kf=1e3,
+        contact_mu=0.5,
+        limit_ke=1e3,
+        limit_kd=1e1,
+        armature=0.05,
+    )
+
+
+BUILDERS = {"ant": add_ant, "humanoid": add_humanoid, "snu": add_snu}
+
+
+def build_loop(add, num_envs, device):
+    builder = df.sim.ModelBuilder()
+    for _ in range(num_envs):
+        add(builder)
+
+    return builder.finalize(device)
+
+
+def build_replicated(add, num_envs, device):
+    builder = df.sim.ModelBuilder()
+    add(builder)
+
+    return builder.finalize(device, replicas=num_envs)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+
+    if args[-1].startswith("cuda"):
+        torch.cuda.synchronize()
+
+    return result, time.perf_counter() - start
+
+
+def compare(a, b):
+    mismatched = []
+
+    for name, value in a.__dict__.items():
+        other = b.__dict__.get(name)
+
+        if torch.is_tensor(value):
+            if not (value.shape == other.shape and torch.equal(value, other)):
+                mismatched.append(name)
+        elif isinstance(value, (int, float)) and value != other:
+            mismatched.append(name)
+
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=str, default="ant,humanoid,snu")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    args = parser.parse_args()
+
+    for name in args.assets.split(","):
+        add = BUILDERS[name]
+
+        looped, loop_time = timed(build_loop, add, args.num_envs, args.device)
+        replicated, rep_time = timed(build_replicated, add, args.num_envs, args.device)
+
+        mismatched = compare(looped, replicated)
+
+        print("{} x {} envs on {}".format(name, args.num_envs, args.device))
+        print("  per-env builder: {:8.2f} s".format(loop_time))
+        print(
+            "  replicated:      {:8.2f} s ({:.1f}x)".format(
+                rep_time, loop_time / rep_time
+            )
+        )
+        print("  mismatched attributes: {}".format(mismatched or "none"))
+
+
+if __name__ == "__main__":
+    main()
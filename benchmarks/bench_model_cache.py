@@ -0,0 +1,90 @@
+"""Compares env construction time with an empty model cache (parsing assets and
+building the model) against loading the serialized model written by the first
+construction, and checks both produce the same model tensors.
+
+    python benchmarks/bench_model_cache.py --envs AntEnv,SNUHumanoidEnv --num_envs 4096
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import torch
+
+import dflex as df
+from dflex import envs
+
+
+def construct(name, num_envs, device):
+    start = time.perf_counter()
+
+    env = getattr(envs, name)(
+        num_envs=num_envs,
+        device=device,
+        no_grad=True,
+        early_termination=False,
+    )
+
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    return env, time.perf_counter() - start
+
+
+def compare(a, b):
+    mismatched = []
+
+    for name, value in a.__dict__.items():
+        if name in df.model.MassMatrixCache.names:
+            continue
+
+        other = b.__dict__.get(name)
+
+        if torch.is_tensor(value):
+            if not (
+                torch.is_tensor(other)
+                and value.shape == other.shape
+                and torch.equal(value, other.to(value.device))
+            ):
+                mismatched.append(name)
+        elif isinstance(value, (int, float)) and value != other:
+            mismatched.append(name)
+
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envs", type=str, default="AntEnv,SNUHumanoidEnv")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    args = parser.parse_args()
+
+    # use a fresh cache so the first construction is always cold
+    df.config.model_cache_dir = tempfile.mkdtemp(prefix="dflex_models_")
+    df.config.cache_models = True
+
+    try:
+        for name in args.envs.split(","):
+            cold, cold_time = construct(name, args.num_envs, args.device)
+            warm, warm_time = construct(name, args.num_envs, args.device)
+
+            mismatched = compare(cold.model, warm.model)
+
+            print("{} x {} envs on {}".format(name, args.num_envs, args.device))
+            print("  cold (build + save): {:8.2f} s".format(cold_time))
+            print(
+                "  warm (load):         {:8.2f} s ({:.1f}x)".format(
+                    warm_time, cold_time / warm_time
+                )
+            )
+            print("  mismatched attributes: {}".format(mismatched or "none"))
+
+            del cold, warm
+    finally:
+        shutil.rmtree(df.config.model_cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
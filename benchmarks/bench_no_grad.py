@@ -0,0 +1,94 @@
+"""Compares simulation steps/sec of the no-grad fast path in
+SemiImplicitIntegrator.forward against the previous no-grad path, which
+created a Tape and autograd tracked temporaries on every substep.
+
+    python benchmarks/bench_no_grad.py --env AntEnv --num_envs 2048 --device cuda:0
+"""
+
+import argparse
+import time
+
+import torch
+
+import dflex as df
+from dflex import envs
+
+
+def legacy_forward(integrator, model, state, dt, substeps, mass_matrix_freq):
+    # the no-grad path before the fast path was introduced
+    for i in range(substeps):
+        integrator._simulate(
+            df.Tape(),
+            model,
+            state,
+            state,
+            dt / float(substeps),
+            update_mass_matrix=(i % mass_matrix_freq) == 0,
+        )
+
+    return state
+
+
+def fast_forward(integrator, model, state, dt, substeps, mass_matrix_freq):
+    return integrator.forward(model, state, dt, substeps, mass_matrix_freq)
+
+
+def bench(env, forward, steps, warmup):
+    def step():
+        env.state = forward(
+            env.integrator,
+            env.model,
+            env.state,
+            env.sim_dt,
+            env.sim_substeps,
+            env.MM_caching_frequency,
+        )
+
+    for _ in range(warmup):
+        step()
+
+    if env.device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+
+    if env.device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="AntEnv")
+    parser.add_argument("--num_envs", type=int, default=2048)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    args = parser.parse_args()
+
+    env = getattr(envs, args.env)(
+        num_envs=args.num_envs,
+        device=args.device,
+        no_grad=True,
+        early_termination=False,
+    )
+    env.reset()
+
+    legacy = bench(env, legacy_forward, args.steps, args.warmup)
+    fast = bench(env, fast_forward, args.steps, args.warmup)
+
+    print("{} x {} envs on {}".format(args.env, args.num_envs, args.device))
+    print("  legacy no-grad: {:10.1f} steps/sec".format(legacy))
+    print("  fast no-grad:   {:10.1f} steps/sec ({:.2f}x)".format(fast, fast / legacy))
+    print(
+        "  env-steps/sec:  {:10.1f} -> {:.1f}".format(
+            legacy * args.num_envs, fast * args.num_envs
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
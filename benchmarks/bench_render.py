@@ -0,0 +1,110 @@
+"""Compares the time to record a rollout to USD with UsdRenderer.update() and a
+stage save per frame against buffered UsdRenderer.record() / flush() with frame
+decimation and a single save, for a subset of the environments.
+
+    python benchmarks/bench_render.py --env HumanoidEnv --steps 1000 --render_every 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import torch
+from pxr import Usd
+
+import dflex as df
+from dflex import envs
+
+
+def rollout(env, steps):
+    states = []
+    with torch.no_grad():
+        env.reset()
+        for _ in range(steps):
+            env.step(torch.zeros((env.num_envs, env.num_actions), device=env.device))
+            # the renderer only reads particle and body transforms
+            states.append(
+                SimpleNamespace(
+                    particle_q=env.state.particle_q.clone(),
+                    body_X_sc=env.state.body_X_sc.clone(),
+                )
+            )
+
+    return states
+
+
+def record_per_step(model, states, dt, filename):
+    stage = Usd.Stage.CreateNew(filename)
+    renderer = df.render.UsdRenderer(model, stage)
+
+    for i, state in enumerate(states):
+        renderer.update(state, (i + 1) * dt)
+        stage.Save()
+
+
+def record_buffered(model, states, dt, filename, links, render_every):
+    stage = Usd.Stage.CreateNew(filename)
+    renderer = df.render.UsdRenderer(model, stage, links)
+
+    for i, state in enumerate(states):
+        if i % render_every == 0:
+            renderer.record(state, (i + 1) * dt)
+
+    renderer.flush()
+    stage.Save()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="HumanoidEnv")
+    parser.add_argument("--num_envs", type=int, default=64)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--render_every", type=int, default=4)
+    parser.add_argument("--render_envs", type=int, default=4)
+    args = parser.parse_args()
+
+    env = getattr(envs, args.env)(
+        num_envs=args.num_envs,
+        device=args.device,
+        no_grad=True,
+        early_termination=False,
+    )
+
+    states = rollout(env, args.steps)
+
+    links_per_env = env.model.link_count // env.num_envs
+    links = range(min(args.render_envs, env.num_envs) * links_per_env)
+
+    with tempfile.TemporaryDirectory() as logdir:
+        start = time.perf_counter()
+        record_per_step(env.model, states, env.dt, os.path.join(logdir, "step.usd"))
+        step_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        record_buffered(
+            env.model,
+            states,
+            env.dt,
+            os.path.join(logdir, "buffered.usd"),
+            links,
+            args.render_every,
+        )
+        buffered_time = time.perf_counter() - start
+
+    print("{} x {} envs, {} steps".format(args.env, args.num_envs, args.steps))
+    print("  update + save per step:       {:8.2f} s".format(step_time))
+    print(
+        "  buffered, every {} of {} envs: {:8.2f} s ({:.1f}x)".format(
+            args.render_every,
+            min(args.render_envs, env.num_envs),
+            buffered_time,
+            step_time / buffered_time,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
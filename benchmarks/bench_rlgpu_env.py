@@ -0,0 +1,94 @@
+"""Measures PPO rollout throughput (policy forward on the rl_games device plus
+env step) of RLGPUEnv with blocking transfers against async_transfer=True, with
+the sim on --sim_device and the policy on CUDA.
+
+    python benchmarks/bench_rlgpu_env.py --env AntEnv --sim_device cpu --num_envs 256
+    python benchmarks/bench_rlgpu_env.py --env AntEnv --sim_device cuda:0 --info_keys
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from rl_games.common import env_configurations
+
+from dflex import envs
+from shac.utils.rlgames_utils import RLGPUEnv
+
+
+def rollout(vec_env, policy, steps):
+    obs = vec_env.reset()
+
+    for _ in range(steps):
+        with torch.no_grad():
+            actions = torch.tanh(policy(obs))
+        obs, reward, done, info = vec_env.step(actions)
+
+    torch.cuda.synchronize()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="AntEnv")
+    parser.add_argument("--num_envs", type=int, default=256)
+    parser.add_argument("--sim_device", type=str, default="cpu")
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--info_keys", action="store_true", help="strip all step extras")
+    args = parser.parse_args()
+
+    env_configurations.register(
+        "bench",
+        {
+            "env_creator": lambda **kwargs: getattr(envs, args.env)(
+                num_envs=args.num_envs,
+                device=args.sim_device,
+                no_grad=True,
+                early_termination=False,
+            ),
+            "vecenv_type": "DFLEX",
+        },
+    )
+
+    results = {}
+    for async_transfer in (False, True):
+        vec_env = RLGPUEnv(
+            "bench",
+            args.num_envs,
+            async_transfer=async_transfer,
+            info_keys=[] if args.info_keys else None,
+        )
+
+        policy = torch.nn.Sequential(
+            torch.nn.Linear(vec_env.env.num_obs, 256),
+            torch.nn.ELU(),
+            torch.nn.Linear(256, vec_env.env.num_acts),
+        ).to(vec_env.rl_device)
+
+        # warm up
+        rollout(vec_env, policy, 10)
+
+        start = time.perf_counter()
+        rollout(vec_env, policy, args.steps)
+        rate = args.steps * args.num_envs / (time.perf_counter() - start)
+        results[async_transfer] = rate
+
+        print(
+            "{} x {} envs, sim on {}, policy on {}, {:9s}: {:12.1f} env steps/sec ({:.2f}x)".format(
+                args.env,
+                args.num_envs,
+                args.sim_device,
+                vec_env.rl_device,
+                "async" if async_transfer else "blocking",
+                rate,
+                rate / results[False],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measures per-env startup time (import, construction and first step) with
+lazy and eager kernel compilation, see dflex.config.lazy_compile.
+
+Each measurement runs in a fresh interpreter against the same kernel cache,
+a warmup pass populates the cache first so only load/codegen time is measured.
+
+    python benchmarks/bench_startup.py --envs AntEnv HopperEnv CheetahEnv --device cuda:0
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+import torch
+import dflex
+from dflex import envs
+t1 = time.perf_counter()
+env = getattr(envs, "{env}")(num_envs={num_envs}, device="{device}", no_grad=True)
+t2 = time.perf_counter()
+env.reset()
+env.step(torch.zeros((env.num_envs, env.num_actions), device="{device}"))
+if "{device}".startswith("cuda"):
+    torch.cuda.synchronize()
+t3 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "construct": t2 - t1, "first_step": t3 - t2}}))
+"""
+
+
+def run_child(env_name, num_envs, device, lazy):
+    env = dict(os.environ)
+    env["DFLEX_LAZY_COMPILE"] = "1" if lazy else "0"
+
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            CHILD.format(env=env_name, num_envs=num_envs, device=device),
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    # the result is the last line, anything before is build/log output
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--envs", nargs="+", default=["AntEnv", "HopperEnv", "CheetahEnv"]
+    )
+    parser.add_argument("--num_envs", type=int, default=64)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    args = parser.parse_args()
+
+    # populate the kernel cache so both modes measure a warm start
+    run_child(args.envs[0], 1, args.device, lazy=False)
+
+    print(
+        "{:<14} {:<6} {:>9} {:>11} {:>12} {:>9}".format(
+            "env", "mode", "import", "construct", "first step", "total"
+        )
+    )
+
+    for env_name in args.envs:
+        for lazy in (False, True):
+            t = run_child(env_name, args.num_envs, args.device, lazy)
+            print(
+                "{:<14} {:<6} {:>8.2f}s {:>10.2f}s {:>11.2f}s {:>8.2f}s".format(
+                    env_name,
+                    "lazy" if lazy else "eager",
+                    t["import"],
+                    t["construct"],
+                    t["first_step"],
+                    sum(t.values()),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares differentiable rollouts with and without recycling of the
+intermediate substep states (dflex.config.recycle_states), reporting
+rollouts/sec, the allocations made by the state pool and the peak bytes
+of pooled states held during a rollout.
+
+    python benchmarks/bench_state_pool.py --env AntEnv --num_envs 4096 --horizon 64
+"""
+
+import argparse
+import time
+
+import torch
+
+import dflex as df
+from dflex import envs
+
+
+def rollout(env, horizon):
+    obs = env.initialize_trajectory()
+    loss = torch.zeros((), device=env.device)
+
+    for _ in range(horizon):
+        actions = torch.tanh(obs[:, : env.num_actions])
+        obs, rew, done, info = env.step(actions)
+        loss = loss - rew.sum()
+
+    loss.backward()
+
+
+def bench(env, horizon, iters, warmup):
+    pool = env.model.state_pool
+
+    for _ in range(warmup):
+        rollout(env, horizon)
+
+    if env.device.startswith("cuda"):
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+
+    allocated = pool.allocated_bytes
+    peak = 0
+
+    start = time.perf_counter()
+    for _ in range(iters):
+        pool.reset_peak()
+        rollout(env, horizon)
+        peak = max(peak, pool.peak_bytes)
+
+    if env.device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    elapsed = time.perf_counter() - start
+    device_peak = (
+        torch.cuda.max_memory_allocated() if env.device.startswith("cuda") else 0
+    )
+
+    return iters / elapsed, pool.allocated_bytes - allocated, peak, device_peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", type=str, default="AntEnv")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--horizon", type=int, default=64)
+    parser.add_argument("--iters", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    args = parser.parse_args()
+
+    env = getattr(envs, args.env)(
+        num_envs=args.num_envs,
+        device=args.device,
+        no_grad=False,
+        early_termination=False,
+    )
+    env.reset()
+
+    mb = 1.0 / 2**20
+    print("{} x {} envs on {}".format(args.env, args.num_envs, args.device))
+
+    for recycle in (False, True):
+        df.config.recycle_states = recycle
+        env.model.state_pool.clear()
+
+        rate, allocated, peak, device_peak = bench(
+            env, args.horizon, args.iters, args.warmup
+        )
+        print(
+            "  recycle_states={}: {:8.2f} rollouts/sec, pool allocs {:10.1f} MB, pool peak {:10.1f} MB, device peak {:10.1f} MB".format(
+                recycle, rate, allocated * mb, peak * mb, device_peak * mb
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
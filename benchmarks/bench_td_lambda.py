@@ -0,0 +1,85 @@
+"""Checks td_lambda_targets against the reversed per-step TD(lambda) loop
+previously used by SHAC/AHAC and compares their run time.
+
+    python benchmarks/bench_td_lambda.py --steps 64 --num_envs 4096 --device cuda:0
+"""
+
+import argparse
+import time
+
+import torch
+
+import shac.utils.torch_utils as tu
+
+
+def loop_targets(rew, values, done_mask, gamma, lam):
+    target_values = torch.zeros_like(rew)
+
+    Ai = torch.zeros_like(rew[0])
+    Bi = torch.zeros_like(rew[0])
+    lam_i = torch.ones_like(rew[0])
+    for i in reversed(range(rew.shape[0])):
+        lam_i = lam_i * lam * (1.0 - done_mask[i]) + done_mask[i]
+        Ai = (1.0 - done_mask[i]) * (
+            lam * gamma * Ai
+            + gamma * values[i]
+            + (1.0 - lam_i) / (1.0 - lam) * rew[i]
+        )
+        Bi = gamma * (values[i] * done_mask[i] + Bi * (1.0 - done_mask[i])) + rew[i]
+        target_values[i] = (1.0 - lam) * Ai + lam_i * Bi
+
+    return target_values
+
+
+def bench(func, args, iters, device):
+    for _ in range(3):
+        func(*args)
+
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    start = time.perf_counter()
+    for _ in range(iters):
+        func(*args)
+
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    return (time.perf_counter() - start) / iters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=64)
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--done_prob", type=float, default=0.05)
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--lam", type=float, default=0.95)
+    parser.add_argument("--iters", type=int, default=100)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    args = parser.parse_args()
+
+    shape = (args.steps, args.num_envs)
+    rew = torch.randn(shape, device=args.device)
+    values = 10.0 * torch.randn(shape, device=args.device)
+    done_mask = (torch.rand(shape, device=args.device) < args.done_prob).float()
+    done_mask[-1] = 1.0  # the rollouts always end on the last step
+
+    inputs = (rew, values, done_mask, args.gamma, args.lam)
+
+    expected = loop_targets(*inputs)
+    actual = tu.td_lambda_targets(*inputs)
+    error = (actual - expected).abs().max().item()
+    print("max abs error vs loop: {:.3e}".format(error))
+    assert torch.allclose(actual, expected, rtol=1e-5, atol=1e-4)
+
+    loop = bench(loop_targets, inputs, args.iters, args.device)
+    scan = bench(tu.td_lambda_targets, inputs, args.iters, args.device)
+
+    print("{} steps x {} envs on {}".format(args.steps, args.num_envs, args.device))
+    print("  loop: {:8.3f} ms".format(loop * 1e3))
+    print("  scan: {:8.3f} ms ({:.2f}x)".format(scan * 1e3, loop / scan))
+
+
+if __name__ == "__main__":
+    main()
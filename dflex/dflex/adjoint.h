@@ -1,8 +1,13 @@
 #pragma once
 
 #include <cmath>
+#include <cstring>
 #include <stdio.h>
 
+#if defined(CPU) && defined(_WIN32)
+    #include <intrin.h>
+#endif
+
 #ifdef CPU
     #define CUDA_CALLABLE
     #define __device__
@@ -255,8 +260,81 @@ template <typename T>
 CUDA_CALLABLE T operator-(const T& a, const T& b) { return sub(a, b); }
 
 
-// for single thread CPU only
-static int s_threadIdx;
+#ifdef CPU
+
+// thread index of the current CPU kernel invocation, thread local
+// since the CPU entry points may run a launch across several threads
+static thread_local int s_threadIdx;
+
+// number of host threads used by the CPU entry points, see set_cpu_threads()
+static int s_cpuThreads = 1;
+
+// CPU equivalents of the CUDA atomicAdd() intrinsics, when running
+// single threaded these reduce to a plain add so results are unchanged
+inline float atomicAdd(float* address, float val)
+{
+    if (s_cpuThreads <= 1)
+    {
+        float old = *address;
+        *address = old + val;
+        return old;
+    }
+
+#ifdef _WIN32
+    volatile long* addr = (volatile long*)address;
+    long old = *addr;
+    long assumed;
+
+    do
+    {
+        assumed = old;
+
+        float f;
+        memcpy(&f, &assumed, sizeof(float));
+        f += val;
+
+        long desired;
+        memcpy(&desired, &f, sizeof(float));
+
+        old = _InterlockedCompareExchange(addr, desired, assumed);
+    }
+    while (old != assumed);
+
+    float ret;
+    memcpy(&ret, &old, sizeof(float));
+    return ret;
+#else
+    float old;
+    float desired;
+    __atomic_load(address, &old, __ATOMIC_RELAXED);
+
+    do
+    {
+        desired = old + val;
+    }
+    while (!__atomic_compare_exchange(address, &old, &desired, true, __ATOMIC_RELAXED, __ATOMIC_RELAXED));
+
+    return old;
+#endif
+}
+
+inline int atomicAdd(int* address, int val)
+{
+    if (s_cpuThreads <= 1)
+    {
+        int old = *address;
+        *address = old + val;
+        return old;
+    }
+
+#ifdef _WIN32
+    return _InterlockedExchangeAdd((volatile long*)address, val);
+#else
+    return __atomic_fetch_add(address, val, __ATOMIC_RELAXED);
+#endif
+}
+
+#endif
 
 inline CUDA_CALLABLE int tid()
 {
@@ -295,26 +373,19 @@ inline CUDA_CALLABLE void store(T* buf, int index, T value)
     }
 }
 
-#ifdef CUDA
-
 template<typename T>
 inline __device__ void atomic_add(T* buf, T value)
 {
     atomicAdd(buf, value);
 }
-#endif
 
 template<typename T>
 inline __device__ void atomic_add(T* buf, int index, T value)
 {
     if (buf)
     {
-        // CPU mode is sequential so just add
-#ifdef CPU
-        buf[index] += value;
-#elif defined(CUDA)
+        // CPU launches may be multi-threaded, see atomicAdd() above
         atomic_add(buf + index, value);
-#endif
     }
 }
 
@@ -323,12 +394,7 @@ inline __device__ void atomic_sub(T* buf, int index, T value)
 {
     if (buf)
     {
-        // CPU mode is sequential so just add
-#ifdef CPU
-        buf[index] -= value;
-#elif defined(CUDA)
         atomic_add(buf + index, -value);
-#endif
     }
 }
 
@@ -337,12 +403,7 @@ inline CUDA_CALLABLE void adj_load(T* buf, int index, T* adj_buf, int& adj_index
 {
     // allow NULL buffers for case where gradients are not required
     if (adj_buf) {
-#ifdef CPU
-        adj_buf[index] += adj_output;  // does not need to be atomic if single-threaded
-#elif defined(CUDA)
         atomic_add(adj_buf, index, adj_output);
-#endif
-        
     }
 }
 
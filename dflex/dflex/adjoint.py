@@ -6,7 +6,9 @@
 # license agreement from NVIDIA CORPORATION is strictly prohibited.
 
 import os
+import sys
 import imp
+import hashlib
 import ast
 import math
 import inspect
@@ -605,6 +607,13 @@ class DenseGemmBatched:
         return None
 
 
+@builtin("dense_gemm_batched_serial")
+class DenseGemmBatchedSerial:
+    @staticmethod
+    def value_type(args):
+        return None
+
+
 @builtin("dense_chol")
 class DenseChol:
     @staticmethod
@@ -640,6 +649,13 @@ class DenseSolve:
         return None
 
 
+@builtin("aba_solve_batched")
+class AbaSolveBatched:
+    @staticmethod
+    def value_type(args):
+        return None
+
+
 # helpers
 
 
@@ -1329,6 +1345,7 @@ cpu_module_template = """
 // Python entry points
 void {name}_cpu_forward(int dim, {forward_args})
 {{
+    #pragma omp parallel for num_threads(s_cpuThreads) schedule(static) if (s_cpuThreads > 1)
     for (int i=0; i < dim; ++i)
     {{
         s_threadIdx = i;
@@ -1339,6 +1356,7 @@ void {name}_cpu_forward(int dim, {forward_args})
 
 void {name}_cpu_backward(int dim, {forward_args}, {reverse_args})
 {{
+    #pragma omp parallel for num_threads(s_cpuThreads) schedule(static) if (s_cpuThreads > 1)
     for (int i=0; i < dim; ++i)
     {{
         s_threadIdx = i;
@@ -1349,6 +1367,15 @@ void {name}_cpu_backward(int dim, {forward_args}, {reverse_args})
 
 """
 
+cpu_module_threads = """
+
+// sets the number of host threads used by the CPU entry points
+void set_cpu_threads(int num_threads)
+{
+    s_cpuThreads = num_threads > 0 ? num_threads : 1;
+}
+"""
+
 cuda_module_header_template = """
 
 // Python entry points
@@ -1781,6 +1808,34 @@ def rename(name, return_type):
 user_funcs = {}
 user_kernels = {}
 
+# compiled kernel modules, populated as kernels are loaded from the cache
+loaded_modules = []
+
+# generated source for each user function, shared by all kernel modules (see codegen_functions())
+function_source = None
+
+
+def resolve_cpu_threads(num_threads):
+    """Returns the number of host threads to use for CPU kernel launches,
+    a value <= 0 means use all available cores.
+    """
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+
+    return num_threads
+
+
+def set_cpu_threads(num_threads):
+    """Sets the number of host threads used to launch CPU kernels.
+
+    Args:
+        num_threads (int): number of threads, <= 0 to use all available cores
+    """
+    dflex.config.cpu_threads = num_threads
+
+    for m in loaded_modules:
+        m.set_cpu_threads(resolve_cpu_threads(num_threads))
+
 
 def func(f):
     user_funcs[f.__name__] = f
@@ -1800,12 +1855,41 @@ def func(f):
 
 
 def kernel(f):
-    # stores source and compiled entry points for a kernel (will be populated after module loads)
+    # stores source and compiled entry points for a kernel, each kernel is built into its own
+    # module in the kernel cache and the entry points are loaded on first launch
     class Kernel:
         def __init__(self, f):
             self.func = f
 
+            # populated by prepare()
+            self.module_name = None
+            self.cpp_source = None
+            self.cuda_source = None
+            self.entry_points = None
+
+            self.module = None
+
+        def prepare(self):
+            """Generates the module source for this kernel and its cache key"""
+            if self.module_name is None:
+                codegen_kernel_module(self)
+
+        def build_path(self):
+            self.prepare()
+            return os.path.join(dflex.config.kernel_cache_dir, self.module_name)
+
+        def is_cached(self):
+            return os.path.exists(
+                os.path.join(self.build_path(), self.module_name + module_ext())
+            )
+
+        def load(self):
+            if self.module is None:
+                self.register(load_kernel_module(self))
+
         def register(self, module):
+            self.module = module
+
             # lookup entry points based on name
             self.forward_cpu = eval("module." + self.func.__name__ + "_cpu_forward")
             self.backward_cpu = eval("module." + self.func.__name__ + "_cpu_backward")
@@ -1818,6 +1902,16 @@ def kernel(f):
                     "module." + self.func.__name__ + "_cuda_backward"
                 )
 
+        def __getattr__(self, name):
+            # only called for missing attributes, i.e.: entry points before the module is loaded
+            if name in ("forward_cpu", "backward_cpu", "forward_cuda", "backward_cuda"):
+                self.load()
+
+                if name in self.__dict__:
+                    return self.__dict__[name]
+
+            raise AttributeError(name)
+
     k = Kernel(f)
 
     # register globally
@@ -1826,27 +1920,68 @@ def kernel(f):
     return k
 
 
-def compile():
-    use_cuda = torch.cuda.is_available()
-    if not use_cuda:
-        print("[INFO] CUDA support not found. Disabling CUDA kernel compilation.")
+def build_flags():
+    if os.name == "nt":
+        cpp_flags = ["/Ox", "-DNDEBUG", "/fp:fast", "/openmp"]
+        ld_flags = ["-DNDEBUG"]
+
+    #        cpp_flags = ["/Zi", "/Od", "/DEBUG"]
+    #        ld_flags = ["/DEBUG"]
+    elif sys.platform == "darwin":
+        # Apple clang does not ship OpenMP, CPU kernels run single threaded
+        cpp_flags = ["-Z", "-O2", "-DNDEBUG"]
+        ld_flags = ["-DNDEBUG"]
+    else:
+        cpp_flags = ["-Z", "-O2", "-DNDEBUG", "-fopenmp"]
+        ld_flags = ["-DNDEBUG", "-fopenmp"]
 
-    cpp_source = ""
-    cuda_source = ""
+    # just use minimum to ensure compatability
+    cuda_flags = ["-gencode=arch=compute_50,code=compute_50"]
+
+    return cpp_flags, ld_flags, cuda_flags
+
+
+def module_ext():
+    if os.name == "nt":
+        return ".pyd"
+    else:
+        return ".so"
+
+
+def header_hash():
+    """Hash of the dflex runtime headers, any change to them invalidates all cached kernels"""
+    include_path = os.path.dirname(os.path.realpath(__file__))
 
-    cpp_source += cpu_module_header
-    cuda_source += cuda_module_header
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(include_path)):
+        if name.endswith(".h"):
+            with open(os.path.join(include_path, name), "rb") as f:
+                h.update(f.read())
 
-    # kernels
-    entry_points = []
+    return h.hexdigest()
+
+
+def codegen_functions():
+    """Generates source for all user functions and registers them as builtins
+    so they may be called from kernels, returns a dict mapping each function name
+    to its (cpu, cuda) source. The result is shared between kernel modules.
+    """
+    global function_source
+
+    if function_source is not None and function_source[0] == list(user_funcs.keys()):
+        return function_source[1]
+
+    sources = {}
 
     # functions
     for name, func in user_funcs.items():
         adj = Adjoint(func, device="cpu")
-        cpp_source += codegen_func(adj, device="cpu")
+        cpp_source = codegen_func(adj, device="cpu")
 
         adj = Adjoint(func, device="cuda")
-        cuda_source += codegen_func(adj, device="cuda")
+        cuda_source = codegen_func(adj, device="cuda")
+
+        sources[name] = (cpp_source, cuda_source)
 
         # import pdb
         # pdb.set_trace()
@@ -1869,116 +2004,175 @@ def compile():
 
         cuda_functions[func.__name__] = CUDAFunc
 
-    for name, kernel in user_kernels.items():
-        if use_cuda:
-            # each kernel gets an entry point in the module
-            entry_points.append(name + "_cuda_forward")
-            entry_points.append(name + "_cuda_backward")
+    function_source = (list(user_funcs.keys()), sources)
 
-        # each kernel gets an entry point in the module
-        entry_points.append(name + "_cpu_forward")
-        entry_points.append(name + "_cpu_backward")
+    return sources
 
-        if use_cuda:
-            adj = Adjoint(kernel.func, device="cuda")
-            cuda_source += codegen_kernel(adj, device="cuda")
-            cuda_source += codegen_module(adj, device="cuda")
-            cpp_source += codegen_module_decl(adj, device="cuda")
 
-        adj = Adjoint(kernel.func, device="cpu")
-        cpp_source += codegen_kernel(adj, device="cpu")
-        cpp_source += codegen_module(adj, device="cpu")
-        cpp_source += codegen_module_decl(adj, device="cpu")
+def referenced_functions(f):
+    """Returns the names of the user functions called by f, directly or through
+    other user functions, in registration order so callees precede their callers.
+    """
+    found = set()
+    pending = [f]
 
-    include_path = os.path.dirname(os.path.realpath(__file__))
-    build_path = os.path.dirname(os.path.realpath(__file__)) + "/kernels"
-    cache_file = build_path + "/adjoint.gen"
+    while pending:
+        tree = ast.parse(inspect.getsource(pending.pop()))
 
-    if os.path.exists(build_path) == False:
-        os.mkdir(build_path)
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call):
+                continue
 
-    # test cache
-    if os.path.exists(cache_file):
-        f = open(cache_file, "r")
+            # same lookup as Adjoint, builtins are called as attributes, user funcs by name
+            if isinstance(node.func, ast.Attribute):
+                name = node.func.attr
+            elif isinstance(node.func, ast.Name):
+                name = node.func.id
+            else:
+                continue
 
-        cache_string = f.read()
-        f.close()
+            if name in user_funcs and name not in found:
+                found.add(name)
+                pending.append(user_funcs[name])
 
-        if cache_string == cpp_source:
-            print("Using cached kernels")
-            module = import_module("kernels", build_path)
+    return [name for name in user_funcs if name in found]
 
-            # register kernel methods
-            for k in user_kernels.values():
-                k.register(module)
 
-            return module
+def codegen_kernel_module(kernel):
+    """Generates the standalone module source for a kernel and derives the
+    module name from a hash of the source, build flags and torch version.
+    """
+    use_cuda = torch.cuda.is_available()
 
-    # print("ignoring rebuild, using stale kernels")
-    # module = import_module("kernels", build_path)
-    # return module
+    func_source = codegen_functions()
 
-    # cache stale, rebuild
-    print("Rebuilding kernels")
+    # only the user functions the kernel calls are compiled into its module
+    used = referenced_functions(kernel.func)
+    func_cpp_source = "".join(func_source[f][0] for f in used)
+    func_cuda_source = "".join(func_source[f][1] for f in used)
 
-    set_build_env()
+    name = kernel.func.__name__
 
-    # debug config
-    # module = torch.utils.cpp_extension.load_inline('kernels', [cpp_source], None, entry_points, extra_cflags=["/Zi", "/Od"], extra_ldflags=["/DEBUG"], build_directory=build_path, extra_include_paths=[include_path], verbose=True)
+    cpp_source = cpu_module_header + cpu_module_threads + func_cpp_source
+    cuda_source = cuda_module_header + func_cuda_source
 
-    if os.name == "nt":
-        cpp_flags = ["/Ox", "-DNDEBUG", "/fp:fast"]
-        ld_flags = ["-DNDEBUG"]
+    # each kernel gets an entry point in the module
+    entry_points = ["set_cpu_threads"]
 
-    #        cpp_flags = ["/Zi", "/Od", "/DEBUG"]
-    #        ld_flags = ["/DEBUG"]
-    else:
-        cpp_flags = ["-Z", "-O2", "-DNDEBUG"]
-        ld_flags = ["-DNDEBUG"]
+    if use_cuda:
+        entry_points.append(name + "_cuda_forward")
+        entry_points.append(name + "_cuda_backward")
 
-    # just use minimum to ensure compatability
-    cuda_flags = ["-gencode=arch=compute_50,code=compute_50"]
+        adj = Adjoint(kernel.func, device="cuda")
+        cuda_source += codegen_kernel(adj, device="cuda")
+        cuda_source += codegen_module(adj, device="cuda")
+        cpp_source += codegen_module_decl(adj, device="cuda")
+
+    entry_points.append(name + "_cpu_forward")
+    entry_points.append(name + "_cpu_backward")
+
+    adj = Adjoint(kernel.func, device="cpu")
+    cpp_source += codegen_kernel(adj, device="cpu")
+    cpp_source += codegen_module(adj, device="cpu")
+    cpp_source += codegen_module_decl(adj, device="cpu")
+
+    if not use_cuda:
+        cuda_source = ""
+
+    h = hashlib.sha256()
+    h.update(cpp_source.encode())
+    h.update(cuda_source.encode())
+    h.update(repr(build_flags()).encode())
+    h.update(torch.__version__.encode())
+    h.update(str(torch.version.cuda).encode())
+    h.update(header_hash().encode())
+
+    kernel.module_name = name + "_" + h.hexdigest()[:16]
+    kernel.cpp_source = cpp_source
+    kernel.cuda_source = cuda_source
+    kernel.entry_points = entry_points
+
+
+def load_kernel_module(kernel):
+    """Loads the compiled module for a kernel from the cache, building it first if required"""
+
+    build_path = kernel.build_path()
+
+    if kernel.is_cached():
+        module = import_module(kernel.module_name, build_path)
 
-    # release config
-    if use_cuda:
-        module = torch.utils.cpp_extension.load_inline(
-            "kernels",
-            cpp_sources=[cpp_source],
-            cuda_sources=[cuda_source],
-            functions=entry_points,
-            extra_cflags=cpp_flags,
-            extra_ldflags=ld_flags,
-            extra_cuda_cflags=cuda_flags,
-            build_directory=build_path,
-            extra_include_paths=[include_path],
-            verbose=True,
-            with_pytorch_error_handling=False,
-        )
     else:
+        print("Building kernel {}".format(kernel.func.__name__))
+
+        set_build_env()
+
+        os.makedirs(build_path, exist_ok=True)
+
+        include_path = os.path.dirname(os.path.realpath(__file__))
+        cpp_flags, ld_flags, cuda_flags = build_flags()
+
+        # debug config
+        # module = torch.utils.cpp_extension.load_inline('kernels', [cpp_source], None, entry_points, extra_cflags=["/Zi", "/Od"], extra_ldflags=["/DEBUG"], build_directory=build_path, extra_include_paths=[include_path], verbose=True)
+
+        # release config
         module = torch.utils.cpp_extension.load_inline(
-            "kernels",
-            cpp_sources=[cpp_source],
-            cuda_sources=[],
-            functions=entry_points,
+            kernel.module_name,
+            cpp_sources=[kernel.cpp_source],
+            cuda_sources=[kernel.cuda_source] if kernel.cuda_source else [],
+            functions=kernel.entry_points,
             extra_cflags=cpp_flags,
             extra_ldflags=ld_flags,
             extra_cuda_cflags=cuda_flags,
             build_directory=build_path,
             extra_include_paths=[include_path],
-            verbose=True,
+            verbose=False,
             with_pytorch_error_handling=False,
         )
 
-    # update cache
-    f = open(cache_file, "w")
-    f.write(cpp_source)
-    f.close()
+    module.set_cpu_threads(resolve_cpu_threads(dflex.config.cpu_threads))
+    loaded_modules.append(module)
+
+    return module
+
+
+def compile(lazy=None):
+    """Prepares all registered kernels, kernels whose source, build flags or
+    torch version changed since the last run are rebuilt into the kernel cache
+    (see dflex.config.kernel_cache_dir). Cached kernels are loaded on first launch.
+
+    Args:
+        lazy (bool): if True skip code generation entirely, each kernel is then generated,
+            built (if not cached) and loaded the first time it is launched.
+            Defaults to dflex.config.lazy_compile
+    """
+    if lazy is None:
+        lazy = dflex.config.lazy_compile
+
+    use_cuda = torch.cuda.is_available()
+    if not use_cuda:
+        print("[INFO] CUDA support not found. Disabling CUDA kernel compilation.")
 
-    # register kernel methods
+    os.makedirs(dflex.config.kernel_cache_dir, exist_ok=True)
+
+    if lazy:
+        return user_kernels
+
+    stale = []
     for k in user_kernels.values():
-        k.register(module)
+        k.prepare()
 
-    return module
+        if not k.is_cached():
+            stale.append(k)
+
+    if len(stale):
+        print("Rebuilding {} of {} kernels".format(len(stale), len(user_kernels)))
+    else:
+        print("Using cached kernels")
+
+    for k in stale:
+        k.load()
+
+    return user_kernels
 
 
 # ---------------------------------------------
@@ -2224,13 +2418,57 @@ def launch_torch(
     return output
 
 
+# launch a kernel without recording it for the backward pass
+def launch(func, dim, inputs, outputs, adapter):
+    if dim > 0:
+        # run kernel
+        if adapter == "cpu":
+            func.forward_cpu(*[dim, *inputs, *outputs])
+        elif torch.device(adapter).type == "cuda":  # adapter.startswith('cuda'):
+            func.forward_cuda(*[dim, *inputs, *outputs])
+
+        if dflex.config.verify_fp:
+            check_adapter(inputs, adapter)
+            check_adapter(outputs, adapter)
+            check_finite(inputs)
+            check_finite(outputs)
+
+
+class NullTape:
+    """Drop-in replacement for Tape that runs kernels without recording them,
+    used by the no-grad simulation path where no backward pass is required.
+    """
+
+    def launch(
+        self,
+        func,
+        dim,
+        inputs,
+        outputs,
+        adapter,
+        preserve_output=False,
+        skip_check_grad=False,
+    ):
+        launch(func, dim, inputs, outputs, adapter)
+
+
 class Tape:
-    def __init__(self):
+    def __init__(self, record=None):
+        """
+        Args:
+            record: Whether launches are recorded for the backward pass, by default
+                they are unless the global ``dflex.config.no_grad`` is set
+        """
+
+        self.record = record
         self.launches = []
 
         # dictionary mapping Tensor inputs to their adjoint
         self.adjoints = {}
 
+        # callbacks run once the recorded launches are discarded
+        self.on_reset = []
+
     def launch(
         self,
         func,
@@ -2243,19 +2481,14 @@ class Tape:
     ):
         if dim > 0:
             # run kernel
-            if adapter == "cpu":
-                func.forward_cpu(*[dim, *inputs, *outputs])
-            elif torch.device(adapter).type == "cuda":  # adapter.startswith('cuda'):
-                func.forward_cuda(*[dim, *inputs, *outputs])
-
-            if dflex.config.verify_fp:
-                check_adapter(inputs, adapter)
-                check_adapter(outputs, adapter)
-                check_finite(inputs)
-                check_finite(outputs)
+            launch(func, dim, inputs, outputs, adapter)
 
             # record launch
-            if dflex.config.no_grad == False:
+            record = self.record
+            if record is None:
+                record = dflex.config.no_grad == False
+
+            if record:
                 self.launches.append(
                     [func, dim, inputs, outputs, adapter, preserve_output]
                 )
@@ -2276,7 +2509,16 @@ class Tape:
                     check_grad=True,
                 )
 
-    def replay(self):
+    def replay(self, restore_outputs=False):
+        """Runs the adjoints of the recorded launches in reverse order
+
+        Args:
+            restore_outputs: The adjoint kernels evaluate the forward statements
+                again, which accumulates into the outputs of every launch a second
+                time. If True the outputs are restored after each adjoint so the
+                tape can be replayed repeatedly and the step results stay intact
+        """
+
         for kernel in reversed(self.launches):
             func = kernel[0]
             dim = kernel[1]
@@ -2285,6 +2527,10 @@ class Tape:
             outputs = kernel[3]
             adapter = kernel[4]
 
+            saved = None
+            if restore_outputs:
+                saved = [o.clone() if torch.is_tensor(o) else None for o in outputs]
+
             # lookup adj_inputs
             adj_inputs = []
             adj_outputs = []
@@ -2316,6 +2562,11 @@ class Tape:
             ):  # elif adapter.startswith('cuda'):
                 func.backward_cuda(*[dim, *inputs, *outputs, *adj_inputs, *adj_outputs])
 
+            if saved is not None:
+                for o, value in zip(outputs, saved):
+                    if value is not None:
+                        o.copy_(value)
+
             if dflex.config.verify_fp:
                 check_finite(inputs)
                 check_finite(outputs)
@@ -2326,6 +2577,10 @@ class Tape:
         self.adjoints = {}
         self.launches = []
 
+        for callback in self.on_reset:
+            callback()
+        self.on_reset = []
+
     def zero(self):
         # print("Adjoint len", len(self.adjoints))
 
@@ -10,3 +10,31 @@ import os
 no_grad = False  # disable adjoint tracking
 check_grad = False  # will perform numeric gradient checking after each launch
 verify_fp = False  # verify inputs and outputs are finite after each launch
+recycle_states = True  # reuse intermediate substep states once their tape is reset
+cache_mass_matrix = True  # reuse mass matrix / factorization buffers once their tape is reset
+cpu_threads = 1  # number of host threads used to launch CPU kernels (<= 0 uses all cores)
+
+# compiled kernels are cached per-kernel outside the package directory
+kernel_cache_dir = os.environ.get(
+    "DFLEX_KERNEL_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "dflex", "kernels"),
+)
+
+# generate and build kernels on first launch instead of at import time,
+# set DFLEX_LAZY_COMPILE=0 to build all kernels when dflex is imported
+lazy_compile = os.environ.get("DFLEX_LAZY_COMPILE", "1") != "0"
+
+# finalized env models are serialized here and loaded on restart instead of parsing
+# assets again, see DFlexEnv.load_model(), set DFLEX_MODEL_CACHE_ENABLE=0 to always rebuild
+model_cache_dir = os.environ.get(
+    "DFLEX_MODEL_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "dflex", "models"),
+)
+cache_models = os.environ.get("DFLEX_MODEL_CACHE_ENABLE", "1") != "0"
+
+# evaluate ground contacts only for points the broadphase finds below contact_margin,
+# a margin >= 0 keeps every contact that applies a force so results are unchanged.
+# Off by default: gathering the active set waits on the device every substep, which
+# mostly pays off for CPU models where the contact kernel runs serially
+contact_compaction = False
+contact_margin = 0.0
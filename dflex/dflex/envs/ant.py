@@ -134,9 +134,18 @@ class AntEnv(DFlexEnv):
         start_height = 0.75
 
         asset_folder = os.path.join(os.path.dirname(__file__), "assets")
+
+        asset_path = os.path.join(asset_folder, "ant.xml")
+
+        # base transform, environments are spread along z once replicated
         for i in range(self.num_environments):
+            start_pos_z = i * self.env_dist
+            self.start_pos.append([0.0, start_height, start_pos_z])
+
+        def build():
+            # build a single environment and replicate it in finalize()
             lu.parse_mjcf(
-                os.path.join(asset_folder, "ant.xml"),
+                asset_path,
                 self.builder,
                 density=1000.0,
                 stiffness=0.0,
@@ -150,41 +159,45 @@ class AntEnv(DFlexEnv):
                 armature=0.05,
             )
 
-            # base transform
-            start_pos_z = i * self.env_dist
-            self.start_pos.append([0.0, start_height, start_pos_z])
-
-            self.builder.joint_q[
-                i * self.num_joint_q : i * self.num_joint_q + 3
-            ] = self.start_pos[-1]
-            self.builder.joint_q[
-                i * self.num_joint_q + 3 : i * self.num_joint_q + 7
-            ] = self.start_rot
+            self.builder.joint_q[0:3] = self.start_pos[0]
+            self.builder.joint_q[3:7] = self.start_rot
 
             # set joint targets to rest pose in mjcf
-            self.builder.joint_q[
-                i * self.num_joint_q + 7 : i * self.num_joint_q + 15
-            ] = [0.0, 1.0, 0.0, -1.0, 0.0, -1.0, 0.0, 1.0]
-            self.builder.joint_target[
-                i * self.num_joint_q + 7 : i * self.num_joint_q + 15
-            ] = [0.0, 1.0, 0.0, -1.0, 0.0, -1.0, 0.0, 1.0]
+            self.builder.joint_q[7:15] = [0.0, 1.0, 0.0, -1.0, 0.0, -1.0, 0.0, 1.0]
+            self.builder.joint_target[7:15] = [0.0, 1.0, 0.0, -1.0, 0.0, -1.0, 0.0, 1.0]
 
-        self.start_pos = tu.to_torch(self.start_pos, device=self.device)
-        self.start_joint_q = tu.to_torch(self.start_joint_q, device=self.device)
+            # finalize model
+            model = self.builder.finalize(self.device, replicas=self.num_environments)
+            model.joint_q.view(self.num_environments, -1)[:, 0:3] = tu.to_torch(
+                self.start_pos, device=self.device
+            )
+            model.ground = self.ground
+            model.gravity = torch.tensor(
+                (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
+            )
+
+            # contacts only depend on the shapes, so they are cached with the model
+            if model.ground:
+                model.collide(None)
+
+            return model, {}
 
-        # finalize model
-        self.model = self.builder.finalize(self.device)
-        self.model.ground = self.ground
-        self.model.gravity = torch.tensor(
-            (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
+        self.model, _ = self.load_model(
+            build,
+            [asset_path],
+            env_dist=self.env_dist,
+            ground=self.ground,
+            contact_ke=self.contact_ke,
+            contact_kd=self.contact_kd,
         )
 
-        self.integrator = df.sim.SemiImplicitIntegrator()
+        self.start_pos = tu.to_torch(self.start_pos, device=self.device)
+        self.start_joint_q = tu.to_torch(self.start_joint_q, device=self.device)
 
-        self.state = self.model.state()
+        self.model.no_grad = self.no_grad
+        self.integrator = df.sim.SemiImplicitIntegrator()
 
-        if self.model.ground:
-            self.model.collide(self.state)
+        self.state = self.model.state(requires_grad=not self.no_grad)
 
     def unscale_act(self, action):
         return action * self.action_strength
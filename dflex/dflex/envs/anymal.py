@@ -194,9 +194,10 @@ class AnymalEnv(DFlexEnv):
             (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
         )
 
+        self.model.no_grad = self.no_grad
         self.integrator = df.sim.SemiImplicitIntegrator()
 
-        self.state = self.model.state()
+        self.state = self.model.state(requires_grad=not self.no_grad)
 
         if self.model.ground:
             self.model.collide(self.state)
@@ -114,55 +114,52 @@ class CheetahEnv(DFlexEnv):
         start_height = -0.2
 
         asset_folder = os.path.join(os.path.dirname(__file__), "assets")
-        for i in range(self.num_environments):
-            link_start = len(self.builder.joint_type)
-
-            lu.parse_mjcf(
-                os.path.join(asset_folder, "half_cheetah.xml"),
-                self.builder,
-                density=1000.0,
-                stiffness=0.0,
-                damping=1.0,
-                contact_ke=self.contact_ke,
-                contact_kd=self.contact_kd,
-                contact_kf=1e3,
-                contact_mu=1.0,
-                limit_ke=1e3,
-                limit_kd=1e1,
-                armature=0.1,
-                radians=True,
-                load_stiffness=True,
-            )
 
-            self.builder.joint_X_pj[link_start] = df.transform(
-                (0.0, 1.0, 0.0),
-                df.quat_from_axis_angle((1.0, 0.0, 0.0), -math.pi * 0.5),
-            )
+        # build a single environment and replicate it in finalize()
+        lu.parse_mjcf(
+            os.path.join(asset_folder, "half_cheetah.xml"),
+            self.builder,
+            density=1000.0,
+            stiffness=0.0,
+            damping=1.0,
+            contact_ke=self.contact_ke,
+            contact_kd=self.contact_kd,
+            contact_kf=1e3,
+            contact_mu=1.0,
+            limit_ke=1e3,
+            limit_kd=1e1,
+            armature=0.1,
+            radians=True,
+            load_stiffness=True,
+        )
 
-            # base transform
+        self.builder.joint_X_pj[0] = df.transform(
+            (0.0, 1.0, 0.0),
+            df.quat_from_axis_angle((1.0, 0.0, 0.0), -math.pi * 0.5),
+        )
+
+        # base transform
+        for i in range(self.num_environments):
             self.start_pos.append([0.0, start_height])
 
-            # set joint targets to rest pose in mjcf
-            self.builder.joint_q[
-                i * self.num_joint_q + 3 : i * self.num_joint_q + 9
-            ] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
-            self.builder.joint_target[
-                i * self.num_joint_q + 3 : i * self.num_joint_q + 9
-            ] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        # set joint targets to rest pose in mjcf
+        self.builder.joint_q[3:9] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        self.builder.joint_target[3:9] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
 
         self.start_pos = tu.to_torch(self.start_pos, device=self.device)
         self.start_joint_q = tu.to_torch(self.start_joint_q, device=self.device)
 
         # finalize model
-        self.model = self.builder.finalize(self.device)
+        self.model = self.builder.finalize(self.device, replicas=self.num_environments)
         self.model.ground = self.ground
         self.model.gravity = torch.tensor(
             (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
         )
 
+        self.model.no_grad = self.no_grad
         self.integrator = df.sim.SemiImplicitIntegrator()
 
-        self.state = self.model.state()
+        self.state = self.model.state(requires_grad=not self.no_grad)
 
         if self.model.ground:
             self.model.collide(self.state)
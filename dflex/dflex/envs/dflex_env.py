@@ -7,6 +7,9 @@
 
 import os
 import sys
+import hashlib
+import inspect
+import weakref
 from abc import abstractmethod
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -15,6 +18,7 @@ import numpy as np
 import torch
 
 import dflex as df
+import dflex.envs.load_utils as lu
 
 try:
     from pxr import Usd
@@ -24,26 +28,75 @@ except ModuleNotFoundError:
 from gym import spaces
 
 
-def jacobian(output, input, max_out_dim=None):
-    """Computes the jacobian of output tensor with respect to the input"""
-    num_envs, input_dim = input.shape
+def jacobian(output, inputs, max_out_dim=None):
+    """Computes the jacobian of output tensor with respect to the inputs
+
+    Environments are independent, so one backward pass with a one-hot row in
+    grad_outputs yields that row of the jacobian for every environment at once,
+    the full jacobian takes one pass per output dimension. The graph of output
+    is kept, so it can still be differentiated afterwards.
+
+    Args:
+        output: Tensor of shape [num_envs, output_dim]
+        inputs: Tensor or sequence of tensors the output was computed from, each
+            of shape [num_envs, ...] or flattened from it
+        max_out_dim: Optionally only compute the first max_out_dim rows
+
+    Returns:
+        Tensor of shape [num_envs, output_dim, input_dim] on the device of output,
+        input_dim is the number of input elements per environment
+    """
+    if torch.is_tensor(inputs):
+        inputs = (inputs,)
+
+    num_envs = output.shape[0]
     output_dim = output.shape[1]
     if max_out_dim:
         output_dim = min(output_dim, max_out_dim)
-    jacobians = torch.zeros((num_envs, output_dim, input_dim), dtype=torch.float32)
+
+    rows = []
     for out_idx in range(output_dim):
-        select_index = torch.zeros(output.shape[1])
-        select_index[out_idx] = 1.0
-        e = torch.tile(select_index, (num_envs, 1)).cuda()
-        # retain = out_idx != output_dim - 1  # NOTE: experimental
-        try:
-            (grad,) = torch.autograd.grad(
-                outputs=output, inputs=input, grad_outputs=e, retain_graph=True
+        e = torch.zeros_like(output)
+        e[:, out_idx] = 1.0
+        grads = torch.autograd.grad(
+            outputs=output,
+            inputs=inputs,
+            grad_outputs=e,
+            retain_graph=True,
+            allow_unused=True,
+        )
+        rows.append(
+            torch.cat(
+                [
+                    (torch.zeros_like(i) if g is None else g).view(num_envs, -1)
+                    for i, g in zip(inputs, grads)
+                ],
+                dim=1,
             )
-            jacobians[:, out_idx, :] = grad.view(num_envs, input_dim)
-        except RuntimeError as err:
-            print(f"WARN: Couldn't compute jacobian for {out_idx} index")
-            print(err)
+        )
+
+    return torch.stack(rows, dim=1)
+
+
+def jacobian_input(x):
+    """Returns a copy of x in the graph that the jacobian can be taken with respect to"""
+
+    x = x.clone()
+    if not x.requires_grad:
+        x.requires_grad_(True)
+
+    return x
+
+
+def save_stage(renderer, stage):
+    """Writes the frames buffered by the renderer to the stage and saves it"""
+
+    renderer.flush()
+
+    try:
+        stage.Save()
+    except:
+        print("USD save error")
 
 
 class DFlexEnv:
@@ -62,8 +115,9 @@ class DFlexEnv:
         jacobian=False,
         device="cuda:0",
     ):
+        # gradient mode of this env only, applied to its model in init_sim() so
+        # no-grad and differentiable envs can be stepped in the same process
         self.no_grad = no_grad
-        df.config.no_grad = self.no_grad
         self.nan_state_fix = nan_state_fix
         self.jacobian_norm = jacobian_norm
         # if true resets all envs on earfly termination
@@ -87,6 +141,11 @@ class DFlexEnv:
 
         self.MM_caching_frequency = MM_caching_frequency
 
+        # re-simulate steps during backward instead of keeping their kernel launches,
+        # set by the training algorithm to trade compute for memory on long rollouts,
+        # gradients then only flow to the state in df.sim.CHECKPOINT_ATTRS and the model
+        self.checkpoint_sim = False
+
         # initialize observation and action space
         self.num_observations = num_obs
         self.num_actions = num_act
@@ -111,6 +170,50 @@ class DFlexEnv:
             self.num_envs, device=self.device, dtype=torch.long, requires_grad=False
         )
 
+    def load_model(self, build, assets=(), **kwargs):
+        """Returns (model, extras) from the on-disk model cache, calling build() on a miss
+
+        build() must return a finalized model, including contacts from collide(), and a
+        json-serializable dict of extras. The cache key hashes the asset files, the env
+        and dflex model sources, num_envs and the construction kwargs, so editing any of
+        them triggers a rebuild. Set dflex.config.cache_models = False to always rebuild.
+        """
+
+        if not df.config.cache_models:
+            return build()
+
+        key = hashlib.sha256()
+        key.update(str(df.model.Model.SERIAL_VERSION).encode())
+
+        for asset in assets:
+            with open(asset, "rb") as f:
+                key.update(f.read())
+
+        for module in (type(self), df.model, lu):
+            with open(inspect.getsourcefile(module), "rb") as f:
+                key.update(f.read())
+
+        kwargs["num_envs"] = self.num_envs
+        key.update(repr(sorted(kwargs.items())).encode())
+
+        path = os.path.join(
+            df.config.model_cache_dir,
+            "{}_{}".format(type(self).__name__, key.hexdigest()[:16]),
+        )
+
+        if os.path.exists(os.path.join(path, "meta.json")):
+            return df.model.Model.load(path, self.device)
+
+        model, extras = build()
+
+        try:
+            os.makedirs(df.config.model_cache_dir, exist_ok=True)
+            model.save(path, extras)
+        except (OSError, ValueError) as e:
+            print("Could not cache model to {}: {}".format(path, e))
+
+        return model, extras
+
     @abstractmethod
     def observation_from_state(self, state):
         pass
@@ -184,33 +287,43 @@ class DFlexEnv:
             if actions.requires_grad:
                 actions.register_hook(create_hook())
 
+        self.integrator.reset_contact_stats()
+
+        # the dynamics jacobian is taken of this step, with respect to the joint
+        # state it starts from and the unscaled actions, which need to be in the graph
+        jac = None
+        compute_jacobian = (
+            self.jacobian
+            and not play
+            and torch.is_grad_enabled()
+            and self.model.grad_enabled()
+        )
+        if compute_jacobian:
+            self.state.joint_q = jacobian_input(self.state.joint_q)
+            self.state.joint_qd = jacobian_input(self.state.joint_qd)
+            unscaled_actions = jacobian_input(unscaled_actions)
+            self.set_act(unscaled_actions)
+
         next_state = self.integrator.forward(
             self.model,
             self.state,
             self.sim_dt,
             self.sim_substeps,
             self.MM_caching_frequency,
+            # the tape is replayed once per jacobian row and again for training
+            reset_tape=not compute_jacobian,
+            checkpoint=self.checkpoint_sim,
         )
 
+        # ground contacts evaluated after broadphase vs. all contact points, summed over substeps
+        contact_stats = dict(self.integrator.contact_stats)
+
         # compute dynamics jacobians if requested
-        if self.jacobian and not play:
-            inputs = torch.cat((self.obs_buf.clone(), unscaled_actions.clone()), dim=1)
-            inputs.requires_grad_(True)
-            last_obs = inputs[:, : self.num_obs]
-            act = inputs[:, self.num_obs :]
-            self.set_state_act(last_obs, act)
-            output = self.integrator.forward(
-                self.model,
-                self.state,
-                self.sim_dt,
-                self.sim_substeps,
-                self.MM_caching_frequency,
-                False,
-            )
-            outputs = self.observation_from_state(output)
-            # TODO for some reason can only compute up to 11th dim
-            jac = jacobian(outputs, inputs, max_out_dim=11)
-            self.jacobians.append(jac.cpu().numpy())
+        if compute_jacobian:
+            outputs = self.observation_from_state(next_state)
+            inputs = (self.state.joint_q, self.state.joint_qd, unscaled_actions)
+            jac = jacobian(outputs, inputs).cpu().numpy()
+            self.jacobians.append(jac)
 
         self.state = next_state
         self.sim_time += self.sim_dt
@@ -231,6 +344,8 @@ class DFlexEnv:
             "obs_before_reset": self.obs_buf.clone(),
             "termination": termination,
             "truncation": truncation,
+            "active_contacts": contact_stats["active"],
+            "total_contacts": contact_stats["total"],
         }
         if hasattr(self, "primal"):
             extras.update({"primal": self.primal})
@@ -251,8 +366,8 @@ class DFlexEnv:
                 }
             )
 
-            if self.jacobian and not play:
-                extras.update({"jacobian": jac.cpu().numpy()})
+            if jac is not None:
+                extras.update({"jacobian": jac})
 
         # reset all environments which have been terminated
         done = termination | truncation
@@ -327,29 +442,88 @@ class DFlexEnv:
 
         return self.obs_buf
 
-    def setup_visualizer(self, logdir=None):
+    def setup_visualizer(self, logdir=None, render_every=1, render_envs=None, save_every=100):
+        """Creates the USD recorder used when the env was constructed with render=True
+
+        Frames are buffered in host memory and written to the stage in bulk. Can be
+        called again after construction to change the options, the stage is reused.
+
+        Args:
+            logdir: Directory of the USD file, only used when the stage is created
+            render_every: Record every n-th step
+            render_envs: Indices of the environments to record, all by default
+            save_every: Write buffered frames and save the stage every n recorded
+                frames, if 0 the stage is only saved by save_render() / close(),
+                frames still buffered when the env is closed, collected or the
+                process exits are always saved
+        """
+
         if self.visualize:
-            filename = f"{logdir}/{self.__class__.__name__}_{self.num_envs}.usd"
-            self.stage = Usd.Stage.CreateNew(filename)
-            self.renderer = df.render.UsdRenderer(self.model, self.stage)
+            # save what the previous recorder still buffers before replacing it
+            if getattr(self, "render_finalizer", None) is not None:
+                self.render_finalizer()
+
+            if getattr(self, "stage", None) is None:
+                filename = f"{logdir}/{self.__class__.__name__}_{self.num_envs}.usd"
+                self.stage = Usd.Stage.CreateNew(filename)
+
+            links = None
+            if render_envs is not None:
+                links_per_env = self.model.link_count // self.num_envs
+                links = [
+                    env * links_per_env + link
+                    for env in render_envs
+                    for link in range(links_per_env)
+                ]
+
+            self.renderer = df.render.UsdRenderer(self.model, self.stage, links)
             self.renderer.draw_points = True
             self.renderer.draw_springs = True
             self.renderer.draw_shapes = True
             self.render_time = 0.0
 
+            # runs at most once, from close(), garbage collection or interpreter exit
+            self.render_finalizer = weakref.finalize(
+                self, save_stage, self.renderer, self.stage
+            )
+
+            self.render_every = render_every
+            self.render_envs = (
+                range(self.num_envs) if render_envs is None else list(render_envs)
+            )
+            self.render_save_every = save_every
+            self.render_steps = 0
+
+    def render_due(self):
+        """Advances the render clock and returns True if this step should be recorded"""
+
+        self.render_steps += 1
+        return (self.render_steps - 1) % self.render_every == 0
+
+    def save_render(self):
+        """Writes the buffered frames to the stage and saves it"""
+
+        if self.visualize:
+            save_stage(self.renderer, self.stage)
+
     def render(self, mode="human"):
         if self.visualize:
             self.render_time += self.dt
-            self.renderer.update(self.state, self.render_time)
 
-            render_interval = 1
-            if self.num_frames == render_interval:
-                try:
-                    self.stage.Save()
-                except:
-                    print("USD save error")
+            if not self.render_due():
+                return
 
-                self.num_frames -= render_interval
+            self.renderer.record(self.state, self.render_time)
+
+            if (
+                self.render_save_every
+                and len(self.renderer.frames) >= self.render_save_every
+            ):
+                self.save_render()
+
+    def close(self):
+        if self.visualize:
+            self.render_finalizer()
 
     def clear_grad(self, checkpoint=None):
         """cut off the gradient from the current state to previous states"""
@@ -362,7 +536,7 @@ class DFlexEnv:
                 checkpoint["joint_act"] = self.state.joint_act.clone()
                 checkpoint["progress_buf"] = self.progress_buf.clone()
 
-            self.state = self.model.state()
+            self.state = self.model.state(requires_grad=not self.no_grad)
             self.state.joint_q = checkpoint["joint_q"]
             self.state.joint_qd = checkpoint["joint_qd"]
             self.state.joint_act = checkpoint["joint_act"]
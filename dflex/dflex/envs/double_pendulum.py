@@ -124,9 +124,10 @@ class DoublePendulumEnv(DFlexEnv):
             (0.0, -9.81, 0.0), dtype=torch.float, device=self.device
         )
 
+        self.model.no_grad = self.no_grad
         self.integrator = df.sim.SemiImplicitIntegrator()
 
-        self.state = self.model.state()
+        self.state = self.model.state(requires_grad=not self.no_grad)
         self.start_joint_q = self.state.joint_q.clone()
         self.start_joint_qd = self.state.joint_qd.clone()
 
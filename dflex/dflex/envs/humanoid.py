@@ -48,7 +48,8 @@ class HumanoidEnv(DFlexEnv):
         height_rew_scale=10.0,
         up_rew_scale=0.1,
         heading_rew_scale=1.0,
-        height_rew_type="xu"
+        height_rew_type="xu",
+        dynamics="dense",
     ):
         num_obs = 76
         num_act = 21
@@ -71,6 +72,7 @@ class HumanoidEnv(DFlexEnv):
         self.early_termination = early_termination
         self.contact_ke = contact_ke
         self.contact_kd = contact_kd if contact_kd is not None else contact_ke / 10.0
+        self.dynamics = dynamics
 
         self.init_sim()
 
@@ -171,9 +173,18 @@ class HumanoidEnv(DFlexEnv):
         start_height = 1.35
 
         asset_folder = os.path.join(os.path.dirname(__file__), "assets")
+
+        asset_path = os.path.join(asset_folder, "humanoid.xml")
+
+        # base transform, environments are spread along z once replicated
         for i in range(self.num_environments):
+            start_pos_z = i * self.env_dist
+            self.start_pos.append([0.0, start_height, start_pos_z])
+
+        def build():
+            # build a single environment and replicate it in finalize()
             lu.parse_mjcf(
-                os.path.join(asset_folder, "humanoid.xml"),
+                asset_path,
                 self.builder,
                 stiffness=5.0,
                 damping=0.1,
@@ -188,45 +199,52 @@ class HumanoidEnv(DFlexEnv):
                 load_armature=True,
             )
 
-            # base transform
-            start_pos_z = i * self.env_dist
-            self.start_pos.append([0.0, start_height, start_pos_z])
+            self.builder.joint_q[0:3] = self.start_pos[0]
+            self.builder.joint_q[3:7] = self.start_rot
 
-            self.builder.joint_q[
-                i * self.num_joint_q : i * self.num_joint_q + 3
-            ] = self.start_pos[-1]
-            self.builder.joint_q[
-                i * self.num_joint_q + 3 : i * self.num_joint_q + 7
-            ] = self.start_rot
+            # finalize model
+            model = self.builder.finalize(self.device, replicas=self.num_environments)
+            model.joint_q.view(self.num_environments, -1)[:, 0:3] = tu.to_torch(
+                self.start_pos, device=self.device
+            )
+            model.ground = self.ground
+            model.gravity = torch.tensor(
+                (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
+            )
 
-        num_q = int(len(self.builder.joint_q) / self.num_environments)
-        num_qd = int(len(self.builder.joint_qd) / self.num_environments)
-        print(num_q, num_qd)
+            # contacts only depend on the shapes, so they are cached with the model
+            if model.ground:
+                model.collide(None)
 
-        print("Start joint_q: ", self.builder.joint_q[0:num_q])
+            return model, {}
 
-        self.start_joint_q = self.builder.joint_q[7:num_q].copy()
+        self.model, _ = self.load_model(
+            build,
+            [asset_path],
+            env_dist=self.env_dist,
+            ground=self.ground,
+            contact_ke=self.contact_ke,
+            contact_kd=self.contact_kd,
+        )
 
-        self.start_pos = tu.to_torch(self.start_pos, device=self.device)
-        self.start_joint_q = tu.to_torch(self.start_joint_q, device=self.device)
+        num_q = self.model.joint_coord_count // self.num_environments
+        num_qd = self.model.joint_dof_count // self.num_environments
+        print(num_q, num_qd)
 
-        # finalize model
-        self.model = self.builder.finalize(self.device)
-        self.model.ground = self.ground
-        self.model.gravity = torch.tensor(
-            (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
-        )
+        env_joint_q = self.model.joint_q.view(self.num_environments, -1)[0]
+        print("Start joint_q: ", env_joint_q.tolist())
+
+        self.start_joint_q = env_joint_q[7:num_q].clone()
+        self.start_pos = tu.to_torch(self.start_pos, device=self.device)
 
-        self.integrator = df.sim.SemiImplicitIntegrator()
+        self.model.no_grad = self.no_grad
+        self.integrator = df.sim.SemiImplicitIntegrator(self.dynamics)
 
-        self.state = self.model.state()
+        self.state = self.model.state(requires_grad=not self.no_grad)
 
         num_act = int(len(self.state.joint_act) / self.num_environments) - 6
         print("num_act = ", num_act)
 
-        if self.model.ground:
-            self.model.collide(self.state)
-
     def unscale_act(self, action):
         return action * self.motor_scale * self.motor_strengths
 
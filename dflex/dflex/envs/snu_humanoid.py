@@ -55,6 +55,7 @@ class SNUHumanoidEnv(DFlexEnv):
         heading_rew_scale=1.0,
         action_penalty=-1e-3,
         joint_vel_obs_scaling=0.1,
+        dynamics="dense",
     ):
         self.filter = {
             "Pelvis",
@@ -113,6 +114,7 @@ class SNUHumanoidEnv(DFlexEnv):
         self.early_termination = early_termination
         self.contact_ke = contact_ke
         self.contact_kd = contact_kd if contact_kd is not None else contact_ke / 10.0
+        self.dynamics = dynamics
 
         self.init_sim()
 
@@ -167,8 +169,6 @@ class SNUHumanoidEnv(DFlexEnv):
             [10000.0, 0.0, 0.0], device=self.device, requires_grad=False
         ).repeat((self.num_envs, 1))
 
-        self.start_pos = []
-
         if self.visualize:
             self.env_dist = 2.0
         else:
@@ -180,71 +180,83 @@ class SNUHumanoidEnv(DFlexEnv):
         asset_path = os.path.join(self.asset_folder, "human.xml")
         muscle_path = os.path.join(self.asset_folder, "muscle284.xml")
 
-        for i in range(self.num_environments):
-            if self.mtu_actuations:
-                skeleton = lu.Skeleton(
-                    asset_path,
-                    muscle_path,
-                    self.builder,
-                    self.filter,
-                    stiffness=5.0,
-                    damping=2.0,
-                    contact_ke=5e3,
-                    contact_kd=2e3,
-                    contact_kf=1e3,
-                    contact_mu=0.5,
-                    limit_ke=1e3,
-                    limit_kd=1e1,
-                    armature=0.05,
-                )
-            else:
-                skeleton = lu.Skeleton(
-                    asset_path,
-                    None,
-                    self.builder,
-                    self.filter,
-                    stiffness=5.0,
-                    damping=2.0,
-                    contact_ke=5e3,
-                    contact_kd=2e3,
-                    contact_kf=1e3,
-                    contact_mu=0.5,
-                    limit_ke=1e3,
-                    limit_kd=1e1,
-                    armature=0.05,
-                )
+        def build():
+            # build a single environment and replicate it in finalize()
+            skeleton = lu.Skeleton(
+                asset_path,
+                muscle_path if self.mtu_actuations else None,
+                self.builder,
+                self.filter,
+                stiffness=5.0,
+                damping=2.0,
+                contact_ke=5e3,
+                contact_kd=2e3,
+                contact_kf=1e3,
+                contact_mu=0.5,
+                limit_ke=1e3,
+                limit_kd=1e1,
+                armature=0.05,
+            )
 
-            # set initial position 1m off the ground
-            self.builder.joint_q[skeleton.coord_start + 2] = i * self.env_dist
+            # set initial position 1m off the ground, environments are spread along z once replicated
             self.builder.joint_q[skeleton.coord_start + 1] = start_height
 
             self.builder.joint_q[
                 skeleton.coord_start + 3 : skeleton.coord_start + 7
             ] = self.start_rot
 
-            self.start_pos.append(
-                [
-                    self.builder.joint_q[skeleton.coord_start],
-                    start_height,
-                    self.builder.joint_q[skeleton.coord_start + 2],
-                ]
-            )
+            start_pos = [
+                [self.builder.joint_q[skeleton.coord_start], start_height, i * self.env_dist]
+                for i in range(self.num_environments)
+            ]
 
+            # the link indices of the skeleton refer to the first environment
             self.skeletons.append(skeleton)
 
-        num_muscles = len(self.skeletons[0].muscles)
-        num_q = int(len(self.builder.joint_q) / self.num_environments)
-        num_qd = int(len(self.builder.joint_qd) / self.num_environments)
+            # finalize model
+            model = self.builder.finalize(self.device, replicas=self.num_environments)
+            model.joint_q.view(self.num_environments, -1)[:, 0:3] = tu.to_torch(
+                start_pos, device=self.device
+            )
+            model.ground = self.ground
+            model.gravity = torch.tensor(
+                (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
+            )
+
+            # contacts only depend on the shapes, so they are cached with the model
+            if model.ground:
+                model.collide(None)
+
+            return model, {"muscle_strength": [m.muscle_strength for m in skeleton.muscles]}
+
+        # the renderer needs the mesh map of the parsed skeleton, so only cache for training
+        if self.visualize:
+            self.model, extras = build()
+        else:
+            self.model, extras = self.load_model(
+                build,
+                [asset_path, muscle_path],
+                env_dist=self.env_dist,
+                ground=self.ground,
+                mtu_actuations=self.mtu_actuations,
+                filter=sorted(self.filter),
+            )
+
+        num_muscles = len(extras["muscle_strength"])
+        num_q = self.model.joint_coord_count // self.num_environments
+        num_qd = self.model.joint_dof_count // self.num_environments
         print(num_q, num_qd)
 
-        print("Start joint_q: ", self.builder.joint_q[0:num_q])
+        env_joint_q = self.model.joint_q.view(self.num_environments, -1)
+        print("Start joint_q: ", env_joint_q[0].tolist())
         print("Num muscles: ", num_muscles)
 
-        self.start_joint_q = self.builder.joint_q[7:num_q].copy()
-        self.start_joint_target = self.start_joint_q.copy()
+        self.start_pos = env_joint_q[:, 0:3].clone()
+        self.start_joint_q = env_joint_q[0, 7:num_q].clone()
+        self.start_joint_target = self.start_joint_q.clone()
 
-        for m in self.skeletons[0].muscles:
-            self.muscle_strengths.append(self.str_scale * m.muscle_strength)
+        for strength in extras["muscle_strength"]:
+            self.muscle_strengths.append(self.str_scale * strength)
 
         for mi in range(len(self.muscle_strengths)):
             self.muscle_strengths[mi] = self.str_scale * self.muscle_strengths[mi]
@@ -253,25 +265,10 @@ class SNUHumanoidEnv(DFlexEnv):
             self.muscle_strengths, device=self.device
         ).repeat(self.num_envs)
 
-        self.start_pos = tu.to_torch(self.start_pos, device=self.device)
-        self.start_joint_q = tu.to_torch(self.start_joint_q, device=self.device)
-        self.start_joint_target = tu.to_torch(
-            self.start_joint_target, device=self.device
-        )
-
-        # finalize model
-        self.model = self.builder.finalize(self.device)
-        self.model.ground = self.ground
-        self.model.gravity = torch.tensor(
-            (0.0, -9.81, 0.0), dtype=torch.float32, device=self.device
-        )
-
-        self.integrator = df.sim.SemiImplicitIntegrator()
+        self.model.no_grad = self.no_grad
+        self.integrator = df.sim.SemiImplicitIntegrator(self.dynamics)
 
-        self.state = self.model.state()
-
-        if self.model.ground:
-            self.model.collide(self.state)
+        self.state = self.model.state(requires_grad=not self.no_grad)
 
     def unscale_act(self, action):
         return action
@@ -414,16 +411,33 @@ class SNUHumanoidEnv(DFlexEnv):
         """SNU Humanoid requires special rendering as it uses muscles"""
 
         if self.visualize:
+            self.render_time += self.dt * self.inv_control_freq
+
+            if not self.render_due():
+                return
+
             with torch.no_grad():
 
-                muscle_start = 0
-                skel_index = 0
+                links_per_env = self.model.link_count // self.num_environments
+                body_X_sc = self.state.body_X_sc.detach().cpu().numpy()
+
+                # muscle paths are read from host copies instead of one transfer per element
+                muscle_start_host = self.model.muscle_start.tolist()
+                muscle_links = self.model.muscle_links.tolist()
+                muscle_points = self.model.muscle_points.cpu().numpy()
+                muscle_activation = self.model.muscle_activation.detach().cpu().tolist()
+                muscle_strengths = self.muscle_strengths.cpu().tolist()
+
+                s = self.skeletons[0]
+
+                for skel_index in self.render_envs:
+                    muscle_start = skel_index * len(s.muscles)
 
-                for s in self.skeletons:
                     for mesh, link in s.mesh_map.items():
                         
                         if link != -1:
-                            X_sc = df.transform_expand(self.state.body_X_sc[link].tolist())
+                            link += skel_index * links_per_env
+                            X_sc = df.transform_expand(body_X_sc[link].tolist())
 
                             mesh_path = os.path.join(self.asset_folder, "OBJ/" + mesh + ".usd")
 
@@ -431,32 +445,23 @@ class SNUHumanoidEnv(DFlexEnv):
 
                     for m in range(len(s.muscles)):
 
-                        start = self.model.muscle_start[muscle_start + m].item()
-                        end = self.model.muscle_start[muscle_start + m + 1].item()
+                        start = muscle_start_host[muscle_start + m]
+                        end = muscle_start_host[muscle_start + m + 1]
 
                         points = []
 
                         for w in range(start, end):
                             
-                            link = self.model.muscle_links[w].item()
-                            point = self.model.muscle_points[w].cpu().numpy()
+                            link = muscle_links[w]
+                            point = muscle_points[w]
 
-                            X_sc = df.transform_expand(self.state.body_X_sc[link].cpu().tolist())
+                            X_sc = df.transform_expand(body_X_sc[link].tolist())
 
                             points.append(Gf.Vec3f(df.transform_point(X_sc, point).tolist()))
                         
-                        self.renderer.add_line_strip(points, name=s.muscles[m].name + str(skel_index), radius=0.0075, color=(self.model.muscle_activation[muscle_start + m]/self.muscle_strengths[m], 0.2, 0.5), time=self.render_time)
-                    
-                    muscle_start += len(s.muscles)
-                    skel_index += 1
-
-            self.render_time += self.dt * self.inv_control_freq
-            self.renderer.update(self.state, self.render_time)
+                        self.renderer.add_line_strip(points, name=s.muscles[m].name + str(skel_index), radius=0.0075, color=(muscle_activation[muscle_start + m]/muscle_strengths[m], 0.2, 0.5), time=self.render_time)
 
-            if (self.num_frames == 1):
-                try:
-                    self.stage.Save()
-                except:
-                    print("USD save error")
+            self.renderer.record(self.state, self.render_time)
 
-                self.num_frames -= 1
+            if self.render_save_every and len(self.renderer.frames) >= self.render_save_every:
+                self.save_render()
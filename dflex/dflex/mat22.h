@@ -17,7 +17,6 @@ struct mat22
     float data[2][2];
 };
 
-#ifdef CUDA
 inline __device__ void atomic_add(mat22 * addr, mat22 value) {
     // *addr += value;
     atomicAdd(&((addr -> data)[0][0]), value.data[0][0]);
@@ -25,7 +24,6 @@ inline __device__ void atomic_add(mat22 * addr, mat22 value) {
     atomicAdd(&((addr -> data)[1][0]), value.data[1][0]);
     atomicAdd(&((addr -> data)[1][1]), value.data[1][1]);
 }
-#endif
 
 inline CUDA_CALLABLE void adj_mat22(float m00, float m01, float m10, float m11, float& adj_m00, float& adj_m01, float& adj_m10, float& adj_m11, const mat22& adj_ret)
 {
@@ -63,7 +63,6 @@ struct mat33
     float data[3][3];
 };
 
-#ifdef CUDA
 inline __device__ void atomic_add(mat33 * addr, mat33 value) {
     atomicAdd(&((addr -> data)[0][0]), value.data[0][0]);
     atomicAdd(&((addr -> data)[1][0]), value.data[1][0]);
@@ -75,7 +74,6 @@ inline __device__ void atomic_add(mat33 * addr, mat33 value) {
     atomicAdd(&((addr -> data)[1][2]), value.data[1][2]);
     atomicAdd(&((addr -> data)[2][2]), value.data[2][2]);
 }
-#endif
 
 inline CUDA_CALLABLE void adj_mat33(float3 c0, float3 c1, float3 c2,
                       float3& a0, float3& a1, float3& a2,
@@ -16,12 +16,9 @@ CUDA_CALLABLE inline int dense_index(int rows, int cols, int i, int j)
 }
 
 
-#ifdef CPU
-
-const int kNumThreadsPerBlock = 1;
-
+// single thread multiply, used directly by kernels that run one thread per-matrix
 template <bool t1, bool t2, bool add>
-CUDA_CALLABLE inline void dense_gemm_impl(int m, int n, int p, const float* __restrict__ A, const float* __restrict__ B, float* __restrict__ C)
+CUDA_CALLABLE inline void dense_gemm_serial_impl(int m, int n, int p, const float* __restrict__ A, const float* __restrict__ B, float* __restrict__ C)
 {
     for (int i=0; i < m; i++)
     {
@@ -42,6 +39,16 @@ CUDA_CALLABLE inline void dense_gemm_impl(int m, int n, int p, const float* __re
     }
 }
 
+#ifdef CPU
+
+const int kNumThreadsPerBlock = 1;
+
+template <bool t1, bool t2, bool add>
+CUDA_CALLABLE inline void dense_gemm_impl(int m, int n, int p, const float* __restrict__ A, const float* __restrict__ B, float* __restrict__ C)
+{
+    dense_gemm_serial_impl<t1, t2, add>(m, n, p, A, B, C);
+}
+
 #else
 
 const int kNumThreadsPerBlock = 256;
@@ -98,6 +105,30 @@ CUDA_CALLABLE inline void dense_gemm_batched(
     dense_gemm<add>(m[batch], n[batch], p[batch], t1, t2, A+A_start[batch], B+B_start[batch], C+C_start[batch]);
 }
 
+template <bool add=false>
+CUDA_CALLABLE inline void dense_gemm_serial(int m, int n, int p, int t1, int t2, const float* __restrict__ A, const float* __restrict__ B, float* __restrict__ C)
+{
+    if (t1 == 0 && t2 == 0)
+        dense_gemm_serial_impl<false, false, add>(m, n, p, A, B, C);
+    else if (t1 == 1 && t2 == 0)
+        dense_gemm_serial_impl<true, false, add>(m, n, p, A, B, C);
+    else if (t1 == 0 && t2 == 1)
+        dense_gemm_serial_impl<false, true, add>(m, n, p, A, B, C);
+    else if (t1 == 1 && t2 == 1)
+        dense_gemm_serial_impl<true, true, add>(m, n, p, A, B, C);
+}
+
+// as dense_gemm_batched but launched with one thread per-batch on all devices
+CUDA_CALLABLE inline void dense_gemm_batched_serial(
+    const int* __restrict__ m, const int* __restrict__ n, const int* __restrict__ p, int t1, int t2,
+     const int* __restrict__ A_start,  const int* __restrict__ B_start, const int* __restrict__ C_start,
+     const float* __restrict__ A, const float* __restrict__ B, float* __restrict__ C)
+{
+    const int batch = tid();
+
+    dense_gemm_serial<false>(m[batch], n[batch], p[batch], t1, t2, A+A_start[batch], B+B_start[batch], C+C_start[batch]);
+}
+
 
 
 
@@ -285,6 +316,38 @@ CUDA_CALLABLE inline void adj_dense_gemm_batched(
 }
 
 
+CUDA_CALLABLE inline void adj_dense_gemm_serial(
+    int m, int n, int p, int t1, int t2, const float* A, const float* B, float* C,
+    float* adj_A, float* adj_B, const float* adj_C)
+{
+    if (t1)
+    {
+        dense_gemm_serial<true>(p, m, n, 0, 1, B, adj_C, adj_A);
+        dense_gemm_serial<true>(p, n, m, int(!t1), 0, A, adj_C, adj_B);
+    }
+    else
+    {
+        dense_gemm_serial<true>(m, p, n, 0, int(!t2), adj_C, B, adj_A);
+        dense_gemm_serial<true>(p, n, m, int(!t1), 0, A, adj_C, adj_B);
+    }
+}
+
+CUDA_CALLABLE inline void adj_dense_gemm_batched_serial(
+    const int* __restrict__ m, const int* __restrict__ n, const int* __restrict__ p, int t1, int t2,
+    const int* __restrict__ A_start,  const int* __restrict__ B_start, const int* __restrict__ C_start,
+    const float* __restrict__ A, const float* __restrict__ B, float* __restrict__ C,
+    // adj
+    int* __restrict__ adj_m, int* __restrict__ adj_n, int* __restrict__ adj_p, int adj_t1, int adj_t2,
+    int* __restrict__ adj_A_start,  int* __restrict__ adj_B_start, int* __restrict__ adj_C_start,
+    float* __restrict__ adj_A, float* __restrict__ adj_B, const float* __restrict__ adj_C)
+{
+    const int batch = tid();
+
+    adj_dense_gemm_serial(m[batch], n[batch], p[batch], t1, t2, A+A_start[batch], B+B_start[batch], C+C_start[batch],
+                          adj_A+A_start[batch], adj_B+B_start[batch], adj_C+C_start[batch]);
+}
+
+
 CUDA_CALLABLE inline void adj_dense_chol(
     int n, const float* A, const float* __restrict__ regularization, float* L,
     int adj_n, const float* adj_A, const float* __restrict__ adj_regularization, float* adj_L)
@@ -9,9 +9,16 @@
 """
 
 import math
+import os
+import json
+import shutil
+import functools
+import weakref
 import torch
 import numpy as np
 
+import dflex.config
+
 from typing import Tuple
 from typing import List
 
@@ -180,6 +187,240 @@ class State:
         return tensors
 
 
+class StatePool:
+    """Recycles the tensors of intermediate simulation states
+
+    The differentiable integrator allocates a new state for every substep, but the
+    intermediate states are only referenced by the tape of the step that created
+    them. Once that tape is reset (after the backward pass) or freed, their tensors
+    are handed back to the pool and reused by the next rollout instead of being
+    reallocated.
+
+    Attributes:
+        allocated_bytes (int): Total bytes of state tensors allocated by the pool
+        in_use_bytes (int): Bytes of pooled state tensors currently held by tapes
+        peak_bytes (int): Peak of in_use_bytes since the last call to reset_peak()
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.free = []
+
+        self.allocated_bytes = 0
+        self.in_use_bytes = 0
+        self.peak_bytes = 0
+
+    @staticmethod
+    def _nbytes(tensors):
+        return sum(t.element_size() * t.nelement() for t in tensors.values())
+
+    def acquire(self) -> State:
+        """Returns a state initialized like :func:`Model.state()`, reusing released tensors if possible"""
+
+        if self.free:
+            tensors = self.free.pop()
+
+            # restore the initial configuration without recording it in the graph
+            with torch.no_grad():
+                for name in ("particle_q", "particle_qd", "joint_q", "joint_qd"):
+                    if name in tensors:
+                        tensors[name].copy_(getattr(self.model, name))
+
+                for name in ("joint_act", "body_f_s", "contact_f", "contact_count"):
+                    if name in tensors:
+                        tensors[name].zero_()
+        else:
+            s = self.model.state()
+            tensors = {k: v for k, v in s.__dict__.items() if torch.is_tensor(v)}
+            self.allocated_bytes += self._nbytes(tensors)
+
+        # fresh state object so attributes attached during simulation are not carried over
+        s = State()
+        s.particle_count = self.model.particle_count
+        s.link_count = self.model.link_count
+        s.__dict__.update(tensors)
+        s._pool_tensors = tensors
+
+        self.in_use_bytes += self._nbytes(tensors)
+        self.peak_bytes = max(self.peak_bytes, self.in_use_bytes)
+
+        return s
+
+    def release(self, states):
+        """Returns states to the pool, the list is emptied so releasing twice is a no-op"""
+
+        while states:
+            tensors = states.pop()._pool_tensors
+            self.in_use_bytes -= self._nbytes(tensors)
+            self.free.append(tensors)
+
+    def reset_peak(self):
+        self.peak_bytes = self.in_use_bytes
+
+    def clear(self):
+        """Drops all free states, states currently in use are unaffected"""
+
+        for tensors in self.free:
+            self.allocated_bytes -= self._nbytes(tensors)
+        self.free = []
+
+
+class MassMatrixCache:
+    """Persistent mass matrix and factorization buffers of the dense articulation dynamics
+
+    Each mass matrix update builds J, M, P = M*J, H = J^T*P and the Cholesky factor
+    L of H, the factor is then reused by the solves of the following substeps
+    (``mass_matrix_freq``) and by ``adj_dense_solve`` when the tape is replayed.
+    Buffers referenced by a recording tape are held until that tape is reset or
+    freed and are then handed out again, steps that are not recorded share a
+    single persistent set, so buffers are only allocated while the number of
+    steps in flight grows.
+
+    Attributes:
+        factorizations (int): Substeps that rebuilt and factorized the mass matrix
+        reuses (int): Substeps that solved with a cached factorization
+        hits (int): Buffer sets handed out without allocating
+        misses (int): Buffer sets allocated
+        allocated_bytes (int): Total bytes of buffers allocated by the cache
+        in_use_bytes (int): Bytes of buffers currently held by tapes
+        peak_bytes (int): Peak of in_use_bytes since the last call to reset_peak()
+    """
+
+    names = ("M", "J", "P", "H", "L")
+
+    def __init__(self, model):
+        self.model = model
+        self.free = []
+        self.persistent = None
+
+        self.allocated_bytes = 0
+        self.in_use_bytes = 0
+        self.peak_bytes = 0
+
+        self.reset_stats()
+
+    @staticmethod
+    def _nbytes(buffers):
+        return sum(t.element_size() * t.nelement() for t in buffers.values())
+
+    def _alloc(self, requires_grad):
+        m = self.model
+        sizes = {"M": m.M_size, "J": m.J_size, "P": m.J_size, "H": m.H_size, "L": m.H_size}
+
+        buffers = {
+            name: torch.zeros(
+                sizes[name],
+                dtype=torch.float32,
+                device=m.adapter,
+                requires_grad=requires_grad,
+            )
+            for name in self.names
+        }
+
+        self.misses += 1
+        self.allocated_bytes += self._nbytes(buffers)
+
+        return buffers
+
+    def acquire(self, requires_grad=True, tape=None):
+        """Returns a dict of zeroed M, J, P, H, L buffers
+
+        Args:
+            requires_grad: If False the buffers are not read by a backward pass
+            tape: Tape the buffers are launched on, buffers taken for a recording
+                tape are returned to the cache when it is reset or freed. If None
+                the buffers of a differentiable step are not pooled.
+        """
+
+        recording = requires_grad and getattr(tape, "on_reset", None) is not None
+
+        if not requires_grad or (tape is not None and not recording):
+            # no launch holds a reference to the buffers once the step returns
+            if self.persistent is None:
+                self.persistent = self._alloc(False)
+            else:
+                self.hits += 1
+
+            buffers = self.persistent
+
+        elif recording and dflex.config.cache_mass_matrix:
+            if self.free:
+                buffers = self.free.pop()
+                self.hits += 1
+            else:
+                buffers = self._alloc(True)
+
+            held = [buffers]
+            tape.on_reset.append(functools.partial(self.release, held))
+            weakref.finalize(tape, self.release, held)
+
+            self.in_use_bytes += self._nbytes(buffers)
+            self.peak_bytes = max(self.peak_bytes, self.in_use_bytes)
+
+        else:
+            return self._alloc(True)
+
+        # P and H are fully overwritten, L is zeroed since only one triangle is set which can trigger NaN detection
+        with torch.no_grad():
+            buffers["M"].zero_()
+            buffers["J"].zero_()
+            buffers["L"].zero_()
+
+        return buffers
+
+    def release(self, held):
+        """Returns buffer sets to the cache, the list is emptied so releasing twice is a no-op"""
+
+        while held:
+            buffers = held.pop()
+            self.in_use_bytes -= self._nbytes(buffers)
+            self.free.append(buffers)
+
+    def record(self, update_mass_matrix, substeps=1):
+        """Counts `substeps` solves that either refactorized or reused the cached factor"""
+
+        if update_mass_matrix:
+            self.factorizations += substeps
+        else:
+            self.reuses += substeps
+
+    def stats(self):
+        """Returns the cache statistics as a dict, used to tune ``mass_matrix_freq``"""
+
+        solves = self.factorizations + self.reuses
+
+        return {
+            "factorizations": self.factorizations,
+            "reuses": self.reuses,
+            "reuse_rate": self.reuses / solves if solves else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "allocated_bytes": self.allocated_bytes,
+            "in_use_bytes": self.in_use_bytes,
+            "peak_bytes": self.peak_bytes,
+        }
+
+    def reset_stats(self):
+        self.factorizations = 0
+        self.reuses = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reset_peak(self):
+        self.peak_bytes = self.in_use_bytes
+
+    def clear(self):
+        """Drops all free buffers, buffers currently held by tapes are unaffected"""
+
+        for buffers in self.free:
+            self.allocated_bytes -= self._nbytes(buffers)
+        self.free = []
+
+        if self.persistent is not None:
+            self.allocated_bytes -= self._nbytes(self.persistent)
+            self.persistent = None
+
+
 class Model:
     """Holds the definition of the simulation model
 
@@ -254,6 +495,9 @@ class Model:
         desired.
     """
 
+    # bump when the layout written by save() changes, invalidates cached models
+    SERIAL_VERSION = 1
+
     def __init__(self, adapter):
         self.particle_q = None
         self.particle_qd = None
@@ -339,11 +583,47 @@ class Model:
         self.particle_radius = 0.1
         self.adapter = adapter
 
-    def state(self) -> State:
+        # system matrices, see alloc_mass_matrix()
+        self.M = None
+        self.J = None
+        self.P = None
+        self.H = None
+        self.L = None
+
+        # persistent buffers used by the no-grad simulation path, see scratch()
+        self.scratch_buffers = {}
+
+        # recycled intermediate states of the differentiable path, see StatePool
+        self.state_pool = StatePool(self)
+
+        # mass matrix and factorization buffers, see alloc_mass_matrix()
+        self.mass_matrix_cache = MassMatrixCache(self)
+
+        # gradient mode of this model, None follows dflex.config.no_grad, see grad_enabled()
+        self.no_grad = None
+
+    def grad_enabled(self) -> bool:
+        """Returns True if integrators record steps of this model for the backward pass
+
+        Set ``model.no_grad`` to choose the mode per model, e.g. to step a no-grad
+        evaluation model alongside a differentiable training model in the same
+        process, by default the global ``dflex.config.no_grad`` is used.
+        """
+
+        if self.no_grad is None:
+            return not dflex.config.no_grad
+
+        return not self.no_grad
+
+    def state(self, requires_grad=True) -> State:
         """Returns a state object for the model
 
         The returned state will be initialized with the initial configuration given in
         the model description.
+
+        Args:
+            requires_grad: If False the state tensors are not tracked by autograd,
+                this should be used with the no-grad simulation path
         """
 
         s = State()
@@ -365,24 +645,24 @@ class Model:
             s.joint_qd = torch.clone(self.joint_qd)
             s.joint_act = torch.zeros_like(self.joint_qd)
 
-            s.joint_q.requires_grad = True
-            s.joint_qd.requires_grad = True
+            s.joint_q.requires_grad = requires_grad
+            s.joint_qd.requires_grad = requires_grad
 
         # --------------------------------
         # derived state (output only)
 
         if self.particle_count:
-            s.particle_f = torch.empty_like(self.particle_qd, requires_grad=True)
+            s.particle_f = torch.empty_like(self.particle_qd, requires_grad=requires_grad)
 
         if self.link_count:
             # joints
-            s.joint_qdd = torch.empty_like(self.joint_qd, requires_grad=True)
-            s.joint_tau = torch.empty_like(self.joint_qd, requires_grad=True)
+            s.joint_qdd = torch.empty_like(self.joint_qd, requires_grad=requires_grad)
+            s.joint_tau = torch.empty_like(self.joint_qd, requires_grad=requires_grad)
             s.joint_S_s = torch.empty(
                 (self.joint_dof_count, 6),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
 
             # derived rigid body data (maximal coordinates)
@@ -391,96 +671,87 @@ class Model:
                 (self.link_count, 7),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # relative transform from body frame to its center of mass
             s.body_X_sm = torch.empty(
                 (self.link_count, 7),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # spatial inertia matrix 6x6 that encodes the center of mass, mass, and local 3x3 inertia matrix in one
             s.body_I_s = torch.empty(
                 (self.link_count, 6, 6),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # spatial body velocity in world coordinates
             s.body_v_s = torch.empty(
                 (self.link_count, 6),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # spatial body acceleration in world coordinates
             s.body_a_s = torch.empty(
                 (self.link_count, 6),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # external forces applied to the bodies in world coordinates
             s.body_f_s = torch.zeros(
                 (self.link_count, 6),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # contact forces
             s.contact_f = torch.zeros(
                 (self.link_count, 6),
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             s.contact_count = torch.zeros(
                 self.link_count,
                 dtype=torch.float32,
                 device=self.adapter,
-                requires_grad=True,
+                requires_grad=requires_grad,
             )
             # s.body_ft_s = torch.zeros((self.link_count, 6), dtype=torch.float32, device=self.adapter, requires_grad=True)
             # s.body_f_ext_s = torch.zeros((self.link_count, 6), dtype=torch.float32, device=self.adapter, requires_grad=True)
 
         return s
 
-    def alloc_mass_matrix(self):
+    def alloc_mass_matrix(self, requires_grad=True, tape=None):
+        """Points M, J, P, H, L at a zeroed buffer set from the mass matrix cache, see MassMatrixCache.acquire()"""
+
         if self.link_count:
-            # system matrices
-            self.M = torch.zeros(
-                self.M_size,
-                dtype=torch.float32,
-                device=self.adapter,
-                requires_grad=True,
-            )
-            self.J = torch.zeros(
-                self.J_size,
-                dtype=torch.float32,
-                device=self.adapter,
-                requires_grad=True,
-            )
-            self.P = torch.empty(
-                self.J_size,
-                dtype=torch.float32,
-                device=self.adapter,
-                requires_grad=True,
-            )
-            self.H = torch.empty(
-                self.H_size,
-                dtype=torch.float32,
-                device=self.adapter,
-                requires_grad=True,
-            )
+            buffers = self.mass_matrix_cache.acquire(requires_grad, tape)
+
+            for name in MassMatrixCache.names:
+                setattr(self, name, buffers[name])
+
+    def scratch(self, name, shape, dtype=torch.float32):
+        """Returns a zeroed scratch buffer that persists across calls
+
+        Used by the no-grad simulation path to avoid allocating temporaries
+        on every substep, the buffer is reallocated if the shape or dtype changes.
+        """
+
+        buf = self.scratch_buffers.get(name)
+
+        if buf is None or buf.shape != torch.Size(shape) or buf.dtype != dtype:
+            buf = torch.zeros(shape, dtype=dtype, device=self.adapter)
+            self.scratch_buffers[name] = buf
+        else:
+            buf.zero_()
+
+        return buf
 
-            # zero since only upper triangle is set which can trigger NaN detection
-            self.L = torch.zeros(
-                self.H_size,
-                dtype=torch.float32,
-                device=self.adapter,
-                requires_grad=True,
-            )
 
     def flatten(self):
         """Returns a list of Tensors stored by the model
@@ -498,6 +769,104 @@ class Model:
 
         return tensors
 
+    def save(self, path, extras=None):
+        """Serializes the model to a directory so it can be restored with Model.load()
+
+        Every tensor attribute is written as a .npy file and the scalar attributes,
+        together with the optional json-serializable ``extras`` dict, are stored in
+        ``meta.json``. The directory is written to a temporary location and moved into
+        place, so a concurrent reader never observes a partially written model.
+
+        Mass matrix buffers and scratch buffers are not saved, they are reallocated on load.
+        Models referencing mesh or SDF shapes cannot be serialized.
+
+        Args:
+            path: Output directory, replaced if it already exists
+            extras: Additional values returned by Model.load()
+        """
+
+        if self.shape_geo_src is not None and any(
+            src is not None for src in self.shape_geo_src
+        ):
+            raise ValueError("Models with mesh or SDF shapes cannot be serialized")
+
+        tmp = "{}.tmp{}".format(path, os.getpid())
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+
+        tensors = []
+        scalars = {}
+
+        for attr, value in self.__dict__.items():
+            if attr in MassMatrixCache.names or attr in ("adapter", "no_grad"):
+                continue
+
+            if torch.is_tensor(value):
+                np.save(os.path.join(tmp, attr + ".npy"), value.detach().cpu().numpy())
+                tensors.append(attr)
+            elif isinstance(value, (bool, int, float, str)):
+                scalars[attr] = value
+
+        meta = {
+            "version": Model.SERIAL_VERSION,
+            "tensors": tensors,
+            "scalars": scalars,
+            "extras": extras or {},
+        }
+
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path, adapter):
+        """Restores a model written by Model.save()
+
+        Arrays are memory-mapped copy-on-write and moved to ``adapter``, so loading a
+        model onto the CPU does not read the files until the tensors are first used.
+
+        Returns:
+            A tuple (model, extras) where extras is the dict passed to Model.save()
+        """
+
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        if meta["version"] != Model.SERIAL_VERSION:
+            raise ValueError(
+                "Serialized model version {} does not match {}".format(
+                    meta["version"], Model.SERIAL_VERSION
+                )
+            )
+
+        m = Model(adapter)
+
+        for attr in meta["tensors"]:
+            filename = os.path.join(path, attr + ".npy")
+
+            # zero sized arrays cannot be memory-mapped
+            try:
+                a = np.load(filename, mmap_mode="c")
+            except ValueError:
+                a = np.load(filename)
+
+            setattr(m, attr, torch.from_numpy(a).to(adapter))
+
+        for attr, value in meta["scalars"].items():
+            setattr(m, attr, value)
+
+        m.shape_geo_src = [None] * m.shape_count
+        m.geo_meshes = []
+        m.geo_sdfs = []
+
+        m.alloc_mass_matrix()
+
+        return m, meta["extras"]
+
     # builds contacts
     def collide(self, state: State):
         """Constructs a set of contacts between rigid bodies and ground
@@ -525,125 +894,96 @@ class Model:
             it is acceptable to call this method once at initialization time.
         """
 
-        body0 = []
-        body1 = []
-        point = []
-        dist = []
-        mat = []
-
-        def add_contact(b0, b1, t, p0, d, m):
-            body0.append(b0)
-            body1.append(b1)
-            point.append(transform_point(t, np.array(p0)))
-            dist.append(d)
-            mat.append(m)
-
-        for i in range(self.shape_count):
-            # transform from shape to body
-            X_bs = transform_expand(self.shape_transform[i].tolist())
-
-            geo_type = self.shape_geo_type[i].item()
-
-            if geo_type == GEO_SPHERE:
-                radius = self.shape_geo_scale[i][0].item()
-
-                add_contact(self.shape_body[i], -1, X_bs, (0.0, 0.0, 0.0), radius, i)
-
-            elif geo_type == GEO_CAPSULE:
-                radius = self.shape_geo_scale[i][0].item()
-                half_width = self.shape_geo_scale[i][1].item()
-
-                add_contact(
-                    self.shape_body[i], -1, X_bs, (-half_width, 0.0, 0.0), radius, i
-                )
-                add_contact(
-                    self.shape_body[i], -1, X_bs, (half_width, 0.0, 0.0), radius, i
-                )
+        # contact points are generated per geometry type with tensor ops on the model device and
+        # scattered into per-shape order, i.e.: all points of shape i precede those of shape i+1.
+        # Points are computed in double precision as in the reference util.transform_point()
+        device = self.adapter
+        f64 = torch.float64
+
+        geo_type = self.shape_geo_type.long()
+        geo_scale = self.shape_geo_scale.to(f64)
+        shape_index = torch.arange(self.shape_count, device=device)
+
+        sphere = shape_index[geo_type == GEO_SPHERE]
+        capsule = shape_index[geo_type == GEO_CAPSULE]
+        box = shape_index[geo_type == GEO_BOX]
+        mesh = shape_index[geo_type == GEO_MESH].tolist()
+
+        # number of contact points generated for each shape
+        counts = torch.zeros(self.shape_count, dtype=torch.long, device=device)
+        counts[sphere] = 1
+        counts[capsule] = 2
+        counts[box] = 8
+        for i in mesh:
+            counts[i] = len(self.shape_geo_src[i].vertices)
+
+        offsets = torch.cumsum(counts, 0) - counts
+        contact_count = int(counts.sum().item())
+
+        shape = torch.empty(contact_count, dtype=torch.long, device=device)
+        local = torch.empty((contact_count, 3), dtype=f64, device=device)
+        dist = torch.zeros(contact_count, dtype=f64, device=device)
+
+        def add_contacts(shapes, points, d=None):
+            # points has shape [len(shapes), n, 3] and is written to the n slots of each shape
+            n = points.shape[1]
+            index = (offsets[shapes][:, None] + torch.arange(n, device=device)).view(-1)
+
+            shape[index] = shapes.repeat_interleave(n)
+            local[index] = points.reshape(-1, 3)
+            if d is not None:
+                dist[index] = d.repeat_interleave(n)
+
+        add_contacts(
+            sphere, torch.zeros((len(sphere), 1, 3), dtype=f64, device=device), geo_scale[sphere, 0]
+        )
 
-            elif geo_type == GEO_BOX:
-                edges = self.shape_geo_scale[i].tolist()
+        # capsule end points along the local x-axis
+        ends = torch.zeros((len(capsule), 2, 3), dtype=f64, device=device)
+        ends[:, 0, 0] = -geo_scale[capsule, 1]
+        ends[:, 1, 0] = geo_scale[capsule, 1]
+        add_contacts(capsule, ends, geo_scale[capsule, 0])
+
+        # box corners, x varies fastest
+        signs = torch.tensor(
+            [[x, y, z] for z in (-1.0, 1.0) for y in (-1.0, 1.0) for x in (-1.0, 1.0)],
+            dtype=f64,
+            device=device,
+        )
+        add_contacts(box, signs[None, :, :] * geo_scale[box][:, None, :])
 
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (-edges[0], -edges[1], -edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (edges[0], -edges[1], -edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (-edges[0], edges[1], -edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (edges[0], edges[1], -edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (-edges[0], -edges[1], edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (edges[0], -edges[1], edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i],
-                    -1,
-                    X_bs,
-                    (-edges[0], edges[1], edges[2]),
-                    0.0,
-                    i,
-                )
-                add_contact(
-                    self.shape_body[i], -1, X_bs, (edges[0], edges[1], edges[2]), 0.0, i
-                )
+        for i in mesh:
+            # vertices are scaled in single precision
+            vertices = torch.as_tensor(
+                np.asarray(self.shape_geo_src[i].vertices), dtype=torch.float32, device=device
+            )
+            points = (vertices * self.shape_geo_scale[i]).to(f64)
+            add_contacts(shape_index[i : i + 1], points[None, :, :])
 
-            elif geo_type == GEO_MESH:
-                mesh = self.shape_geo_src[i]
-                scale = self.shape_geo_scale[i]
+        # transform from shape to body, see util.transform_point()
+        X_bs = self.shape_transform.to(f64)[shape]
+        p = X_bs[:, 0:3]
+        q = X_bs[:, 3:7]
 
-                for v in mesh.vertices:
-                    p = (v[0] * scale[0], v[1] * scale[1], v[2] * scale[2])
+        a0, a1, a2, w = q[:, 0:1], q[:, 1:2], q[:, 2:3], q[:, 3:4]
+        x0, x1, x2 = local[:, 0:1], local[:, 1:2], local[:, 2:3]
 
-                    add_contact(self.shape_body[i], -1, X_bs, p, 0.0, i)
+        cross = torch.cat((a1 * x2 - a2 * x1, a2 * x0 - a0 * x2, a0 * x1 - a1 * x0), dim=1)
+        dot = a0 * x0 + a1 * x1 + a2 * x2
 
-        # send to torch
-        self.contact_body0 = torch.tensor(body0, dtype=torch.int32, device=self.adapter)
-        self.contact_body1 = torch.tensor(body1, dtype=torch.int32, device=self.adapter)
-        self.contact_point0 = torch.tensor(
-            point, dtype=torch.float32, device=self.adapter
+        point = p + (
+            local * (2.0 * w * w - 1.0) + cross * w * 2.0 + q[:, 0:3] * dot * 2.0
         )
-        self.contact_dist = torch.tensor(dist, dtype=torch.float32, device=self.adapter)
-        self.contact_material = torch.tensor(
-            mat, dtype=torch.int32, device=self.adapter
+
+        self.contact_body0 = self.shape_body[shape].int()
+        self.contact_body1 = torch.full(
+            (contact_count,), -1, dtype=torch.int32, device=device
         )
+        self.contact_point0 = point.float()
+        self.contact_dist = dist.float()
+        self.contact_material = shape.int()
 
-        self.contact_count = len(body0)
+        self.contact_count = contact_count
 
 
 class ModelBuilder:
@@ -1882,7 +2222,7 @@ class ModelBuilder:
         self.body_com[i] = new_com
 
     # returns a (model, state) pair given the description
-    def finalize(self, adapter: str) -> Model:
+    def finalize(self, adapter: str, replicas: int = 1) -> Model:
         """Convert this builder object to a concrete model for simulation.
 
         After building simulation elements this method should be called to transfer
@@ -1890,12 +2230,42 @@ class ModelBuilder:
 
         Args:
             adapter: The simulation adapter to use, e.g.: 'cpu', 'cuda'
+            replicas: Number of copies of the builder contents in the model. The
+                result is identical to populating the builder `replicas` times,
+                but the copies are made with array operations, so a single
+                environment can be built once and replicated for many environments.
 
         Returns:
 
             A model object.
         """
 
+        def rep(values, stride=0):
+            # tile the values for each replica, index arrays are offset by `stride`
+            # per replica while negative indices (no parent, ground) are kept
+            if replicas == 1:
+                return values
+
+            a = np.asarray(values)
+            out = np.tile(a, (replicas,) + (1,) * (a.ndim - 1))
+
+            if stride and a.size:
+                offset = np.repeat(np.arange(replicas) * stride, len(a))
+                offset = offset.reshape((-1,) + (1,) * (a.ndim - 1))
+                out = np.where(out >= 0, out + offset, out)
+
+            return out
+
+        def rep_start(values, stride):
+            # start arrays closed with a sentinel, which becomes the total count
+            if replicas == 1:
+                return values
+
+            return np.append(rep(values[:-1], stride), values[-1] * replicas)
+
+        particle_count = len(self.particle_q)
+        link_count = len(self.joint_type)
+
         # construct particle inv masses
         particle_inv_mass = []
         for m in self.particle_mass:
@@ -1914,92 +2284,93 @@ class ModelBuilder:
 
         # state (initial)
         m.particle_q = torch.tensor(
-            self.particle_q, dtype=torch.float32, device=adapter
+            rep(self.particle_q), dtype=torch.float32, device=adapter
         )
         m.particle_qd = torch.tensor(
-            self.particle_qd, dtype=torch.float32, device=adapter
+            rep(self.particle_qd), dtype=torch.float32, device=adapter
         )
 
         # model
         m.particle_mass = torch.tensor(
-            self.particle_mass, dtype=torch.float32, device=adapter
+            rep(self.particle_mass), dtype=torch.float32, device=adapter
         )
         m.particle_inv_mass = torch.tensor(
-            particle_inv_mass, dtype=torch.float32, device=adapter
+            rep(particle_inv_mass), dtype=torch.float32, device=adapter
         )
 
         # ---------------------
         # collision geometry
 
         m.shape_transform = torch.tensor(
-            transform_flatten_list(self.shape_transform),
+            rep(transform_flatten_list(self.shape_transform)),
             dtype=torch.float32,
             device=adapter,
         )
-        m.shape_body = torch.tensor(self.shape_body, dtype=torch.int32, device=adapter)
+        m.shape_body = torch.tensor(
+            rep(self.shape_body, link_count), dtype=torch.int32, device=adapter)
         m.shape_geo_type = torch.tensor(
-            self.shape_geo_type, dtype=torch.int32, device=adapter
+            rep(self.shape_geo_type), dtype=torch.int32, device=adapter
         )
-        m.shape_geo_src = self.shape_geo_src
+        m.shape_geo_src = self.shape_geo_src * replicas
         m.shape_geo_scale = torch.tensor(
-            self.shape_geo_scale, dtype=torch.float32, device=adapter
+            rep(self.shape_geo_scale), dtype=torch.float32, device=adapter
         )
         m.shape_materials = torch.tensor(
-            self.shape_materials, dtype=torch.float32, device=adapter
+            rep(self.shape_materials), dtype=torch.float32, device=adapter
         )
 
         # ---------------------
         # springs
 
         m.spring_indices = torch.tensor(
-            self.spring_indices, dtype=torch.int32, device=adapter
+            rep(self.spring_indices, particle_count), dtype=torch.int32, device=adapter
         )
         m.spring_rest_length = torch.tensor(
-            self.spring_rest_length, dtype=torch.float32, device=adapter
+            rep(self.spring_rest_length), dtype=torch.float32, device=adapter
         )
         m.spring_stiffness = torch.tensor(
-            self.spring_stiffness, dtype=torch.float32, device=adapter
+            rep(self.spring_stiffness), dtype=torch.float32, device=adapter
         )
         m.spring_damping = torch.tensor(
-            self.spring_damping, dtype=torch.float32, device=adapter
+            rep(self.spring_damping), dtype=torch.float32, device=adapter
         )
         m.spring_control = torch.tensor(
-            self.spring_control, dtype=torch.float32, device=adapter
+            rep(self.spring_control), dtype=torch.float32, device=adapter
         )
 
         # ---------------------
         # triangles
 
         m.tri_indices = torch.tensor(
-            self.tri_indices, dtype=torch.int32, device=adapter
+            rep(self.tri_indices, particle_count), dtype=torch.int32, device=adapter
         )
-        m.tri_poses = torch.tensor(self.tri_poses, dtype=torch.float32, device=adapter)
+        m.tri_poses = torch.tensor(rep(self.tri_poses), dtype=torch.float32, device=adapter)
         m.tri_activations = torch.tensor(
-            self.tri_activations, dtype=torch.float32, device=adapter
+            rep(self.tri_activations), dtype=torch.float32, device=adapter
         )
 
         # ---------------------
         # edges
 
         m.edge_indices = torch.tensor(
-            self.edge_indices, dtype=torch.int32, device=adapter
+            rep(self.edge_indices, particle_count), dtype=torch.int32, device=adapter
         )
         m.edge_rest_angle = torch.tensor(
-            self.edge_rest_angle, dtype=torch.float32, device=adapter
+            rep(self.edge_rest_angle), dtype=torch.float32, device=adapter
         )
 
         # ---------------------
         # tetrahedra
 
         m.tet_indices = torch.tensor(
-            self.tet_indices, dtype=torch.int32, device=adapter
+            rep(self.tet_indices, particle_count), dtype=torch.int32, device=adapter
         )
-        m.tet_poses = torch.tensor(self.tet_poses, dtype=torch.float32, device=adapter)
+        m.tet_poses = torch.tensor(rep(self.tet_poses), dtype=torch.float32, device=adapter)
         m.tet_activations = torch.tensor(
-            self.tet_activations, dtype=torch.float32, device=adapter
+            rep(self.tet_activations), dtype=torch.float32, device=adapter
         )
         m.tet_materials = torch.tensor(
-            self.tet_materials, dtype=torch.float32, device=adapter
+            rep(self.tet_materials), dtype=torch.float32, device=adapter
         )
 
         # -----------------------
@@ -2011,19 +2382,21 @@ class ModelBuilder:
         self.muscle_start.append(len(self.muscle_links))
 
         m.muscle_start = torch.tensor(
-            self.muscle_start, dtype=torch.int32, device=adapter
+            rep_start(self.muscle_start, len(self.muscle_links)),
+            dtype=torch.int32,
+            device=adapter,
         )
         m.muscle_params = torch.tensor(
-            self.muscle_params, dtype=torch.float32, device=adapter
+            rep(self.muscle_params), dtype=torch.float32, device=adapter
         )
         m.muscle_links = torch.tensor(
-            self.muscle_links, dtype=torch.int32, device=adapter
+            rep(self.muscle_links, link_count), dtype=torch.int32, device=adapter
         )
         m.muscle_points = torch.tensor(
-            self.muscle_points, dtype=torch.float32, device=adapter
+            rep(self.muscle_points), dtype=torch.float32, device=adapter
         )
         m.muscle_activation = torch.tensor(
-            self.muscle_activation, dtype=torch.float32, device=adapter
+            rep(self.muscle_activation), dtype=torch.float32, device=adapter
         )
 
         # --------------------------------------
@@ -2039,7 +2412,7 @@ class ModelBuilder:
             )
             body_X_cm.append(transform(self.body_com[i], quat_identity()))
 
-        m.body_I_m = torch.tensor(body_I_m, dtype=torch.float32, device=adapter)
+        m.body_I_m = torch.tensor(rep(body_I_m), dtype=torch.float32, device=adapter)
 
         articulation_count = len(self.articulation_start)
         joint_coord_count = len(self.joint_q)
@@ -2097,8 +2470,28 @@ class ModelBuilder:
             m.M_size += 6 * joint_count * 6 * joint_count
             m.H_size += dof_count * dof_count
 
+        if replicas > 1:
+            # matrix offsets advance by the size of the builder's matrices per replica
+            articulation_J_start = rep(articulation_J_start, m.J_size)
+            articulation_M_start = rep(articulation_M_start, m.M_size)
+            articulation_H_start = rep(articulation_H_start, m.H_size)
+
+            articulation_M_rows = rep(articulation_M_rows)
+            articulation_H_rows = rep(articulation_H_rows)
+            articulation_J_rows = rep(articulation_J_rows)
+            articulation_J_cols = rep(articulation_J_cols)
+
+            articulation_dof_start = rep(articulation_dof_start, joint_dof_count)
+            articulation_coord_start = rep(articulation_coord_start, joint_coord_count)
+
+            m.J_size *= replicas
+            m.M_size *= replicas
+            m.H_size *= replicas
+
         m.articulation_joint_start = torch.tensor(
-            self.articulation_start, dtype=torch.int32, device=adapter
+            rep_start(self.articulation_start, link_count),
+            dtype=torch.int32,
+            device=adapter,
         )
 
         # matrix offsets for batched gemm
@@ -2133,72 +2526,80 @@ class ModelBuilder:
         )
 
         # state (initial)
-        m.joint_q = torch.tensor(self.joint_q, dtype=torch.float32, device=adapter)
-        m.joint_qd = torch.tensor(self.joint_qd, dtype=torch.float32, device=adapter)
+        m.joint_q = torch.tensor(rep(self.joint_q), dtype=torch.float32, device=adapter)
+        m.joint_qd = torch.tensor(rep(self.joint_qd), dtype=torch.float32, device=adapter)
 
         # model
-        m.joint_type = torch.tensor(self.joint_type, dtype=torch.int32, device=adapter)
+        m.joint_type = torch.tensor(rep(self.joint_type), dtype=torch.int32, device=adapter)
         m.joint_parent = torch.tensor(
-            self.joint_parent, dtype=torch.int32, device=adapter
+            rep(self.joint_parent, link_count), dtype=torch.int32, device=adapter
         )
         m.joint_X_pj = torch.tensor(
-            transform_flatten_list(self.joint_X_pj), dtype=torch.float32, device=adapter
+            rep(transform_flatten_list(self.joint_X_pj)),
+            dtype=torch.float32,
+            device=adapter,
         )
         m.joint_X_cm = torch.tensor(
-            transform_flatten_list(body_X_cm), dtype=torch.float32, device=adapter
+            rep(transform_flatten_list(body_X_cm)),
+            dtype=torch.float32,
+            device=adapter,
         )
         m.joint_axis = torch.tensor(
-            self.joint_axis, dtype=torch.float32, device=adapter
+            rep(self.joint_axis), dtype=torch.float32, device=adapter
         )
         m.joint_q_start = torch.tensor(
-            self.joint_q_start, dtype=torch.int32, device=adapter
+            rep_start(self.joint_q_start, joint_coord_count),
+            dtype=torch.int32,
+            device=adapter,
         )
         m.joint_qd_start = torch.tensor(
-            self.joint_qd_start, dtype=torch.int32, device=adapter
+            rep_start(self.joint_qd_start, joint_dof_count),
+            dtype=torch.int32,
+            device=adapter,
         )
 
         # dynamics properties
         m.joint_armature = torch.tensor(
-            self.joint_armature, dtype=torch.float32, device=adapter
+            rep(self.joint_armature), dtype=torch.float32, device=adapter
         )
 
         m.joint_target = torch.tensor(
-            self.joint_target, dtype=torch.float32, device=adapter
+            rep(self.joint_target), dtype=torch.float32, device=adapter
         )
         m.joint_target_ke = torch.tensor(
-            self.joint_target_ke, dtype=torch.float32, device=adapter
+            rep(self.joint_target_ke), dtype=torch.float32, device=adapter
         )
         m.joint_target_kd = torch.tensor(
-            self.joint_target_kd, dtype=torch.float32, device=adapter
+            rep(self.joint_target_kd), dtype=torch.float32, device=adapter
         )
 
         m.joint_limit_lower = torch.tensor(
-            self.joint_limit_lower, dtype=torch.float32, device=adapter
+            rep(self.joint_limit_lower), dtype=torch.float32, device=adapter
         )
         m.joint_limit_upper = torch.tensor(
-            self.joint_limit_upper, dtype=torch.float32, device=adapter
+            rep(self.joint_limit_upper), dtype=torch.float32, device=adapter
         )
         m.joint_limit_ke = torch.tensor(
-            self.joint_limit_ke, dtype=torch.float32, device=adapter
+            rep(self.joint_limit_ke), dtype=torch.float32, device=adapter
         )
         m.joint_limit_kd = torch.tensor(
-            self.joint_limit_kd, dtype=torch.float32, device=adapter
+            rep(self.joint_limit_kd), dtype=torch.float32, device=adapter
         )
 
         # counts
-        m.particle_count = len(self.particle_q)
-
-        m.articulation_count = articulation_count
-        m.joint_coord_count = joint_coord_count
-        m.joint_dof_count = joint_dof_count
-        m.muscle_count = muscle_count
-
-        m.link_count = len(self.joint_type)
-        m.shape_count = len(self.shape_geo_type)
-        m.tri_count = len(self.tri_poses)
-        m.tet_count = len(self.tet_poses)
-        m.edge_count = len(self.edge_rest_angle)
-        m.spring_count = len(self.spring_rest_length)
+        m.particle_count = particle_count * replicas
+
+        m.articulation_count = articulation_count * replicas
+        m.joint_coord_count = joint_coord_count * replicas
+        m.joint_dof_count = joint_dof_count * replicas
+        m.muscle_count = muscle_count * replicas
+
+        m.link_count = link_count * replicas
+        m.shape_count = len(self.shape_geo_type) * replicas
+        m.tri_count = len(self.tri_poses) * replicas
+        m.tet_count = len(self.tet_poses) * replicas
+        m.edge_count = len(self.edge_rest_angle) * replicas
+        m.spring_count = len(self.spring_rest_length) * replicas
         m.contact_count = 0
 
         # store refs to geometry
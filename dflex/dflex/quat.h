@@ -14,14 +14,12 @@ struct quat
     explicit inline CUDA_CALLABLE quat(const float3& v, float w=0.0f) : x(v.x), y(v.y), z(v.z), w(w) {}
 };
 
-#ifdef CUDA
 inline __device__ void atomic_add(quat * addr, quat value) {
     atomicAdd(&(addr -> x), value.x);
     atomicAdd(&(addr -> y), value.y);
     atomicAdd(&(addr -> z), value.z);
     atomicAdd(&(addr -> w), value.w);
 }
-#endif
 
 inline CUDA_CALLABLE void adj_quat(float x, float y, float z, float w, float& adj_x, float& adj_y, float& adj_z, float& adj_w, quat adj_ret)
 {
@@ -31,6 +31,9 @@ Example:
     >>> # write stage to file
     >>> stage.Save()
 
+For long recordings :func:`UsdRenderer.record()` buffers frames in host memory
+and :func:`UsdRenderer.flush()` writes them to the stage in bulk before saving.
+
 Note:
     You must have the Pixar USD bindings installed to use this module
     please see https://developer.nvidia.com/usd to obtain precompiled
@@ -48,6 +51,7 @@ import dflex.sim
 import dflex.util
 
 import math
+import torch
 
 
 def _usd_add_xform(prim):
@@ -87,17 +91,29 @@ def _compute_segment_xform(pos0, pos1):
 class UsdRenderer:
     """A USD renderer"""
 
-    def __init__(self, model: dflex.model.Model, stage):
+    def __init__(self, model: dflex.model.Model, stage, links=None):
         """Construct a UsdRenderer object
 
         Args:
             model: A simulation model
             stage (Usd.Stage): A USD stage (either in memory or on disk)
+            links: Optional list of link indices to render, e.g. the links of a subset
+                of environments, by default all links are rendered
         """
 
         self.stage = stage
         self.model = model
 
+        if links is None:
+            links = range(model.link_count)
+        self.links = [int(b) for b in links]
+        self.link_index = torch.tensor(
+            self.links, dtype=torch.long, device=model.adapter
+        )
+
+        # frames buffered by record() until flush()
+        self.frames = []
+
         self.draw_points = True
         self.draw_springs = False
         self.draw_triangles = False
@@ -136,6 +152,8 @@ class UsdRenderer:
             )
             self.spring_instancer.CreateProtoIndicesAttr().Set([0] * model.spring_count)
 
+            self.spring_pairs = model.spring_indices.view(-1, 2).tolist()
+
         self.stage.SetDefaultPrim(self.root.GetPrim())
 
         # time codes
@@ -208,17 +226,28 @@ class UsdRenderer:
             mesh.GetFaceVertexCountsAttr().Set(counts)
             mesh.GetFaceVertexIndicesAttr().Set(indices)
 
-        # add rigid bodies xform root
-        for b in range(model.link_count):
+        # add rigid bodies xform root, the xform ops are kept to update them without prim lookups
+        self.body_xform_ops = []
+
+        for b in self.links:
             xform = UsdGeom.Xform.Define(
                 stage, self.root.GetPath().AppendChild("body_" + str(b))
             )
             _usd_add_xform(xform)
 
+            ops = xform.GetOrderedXformOps()
+            ops[2].Set(Gf.Vec3d(1.0, 1.0, 1.0))
+            self.body_xform_ops.append(ops)
+
+        rendered = set(self.links)
+
         # add rigid body shapes
         for s in range(model.shape_count):
             parent_path = self.root.GetPath()
             if model.shape_body[s] >= 0:
+                if model.shape_body[s].item() not in rendered:
+                    continue
+
                 parent_path = parent_path.AppendChild(
                     "body_" + str(model.shape_body[s].item())
                 )
@@ -320,14 +349,56 @@ class UsdRenderer:
             time: The current time to update at in seconds
         """
 
+        self._write_frame(time, self._read_frame(state))
+
         try:
             self.stage.SetEndTimeCode(time)
         except:
             pass
 
-        # convert to list
+    def record(self, state: dflex.model.State, time: float):
+        """Buffers the simulation data of a frame in host memory, see flush()
+
+        Args:
+            state: Current state of the simulation
+            time: The time of the frame in seconds
+        """
+
+        self.frames.append((time, self._read_frame(state)))
+
+    def flush(self):
+        """Writes all frames buffered by record() to the stage as time samples"""
+
+        if not self.frames:
+            return
+
+        # batch the authoring of all time samples into a single change notification
+        with Sdf.ChangeBlock():
+            for time, frame in self.frames:
+                self._write_frame(time, frame)
+
+        try:
+            self.stage.SetEndTimeCode(self.frames[-1][0])
+        except:
+            pass
+
+        self.frames = []
+
+    def _read_frame(self, state):
+        # copy everything rendered to the host in one transfer per tensor
+        frame = {}
+
+        if self.model.particle_count:
+            frame["particle_q"] = state.particle_q.detach().cpu().tolist()
+
+        if self.links:
+            frame["body_X_sc"] = state.body_X_sc.detach()[self.link_index].cpu().tolist()
+
+        return frame
+
+    def _write_frame(self, time, frame):
         if self.model.particle_count:
-            particle_q = state.particle_q.tolist()
+            particle_q = frame["particle_q"]
             particle_orientations = [
                 Gf.Quath(1.0, 0.0, 0.0, 0.0)
             ] * self.model.particle_count
@@ -350,10 +421,7 @@ class UsdRenderer:
             line_rotations = []
             line_scales = []
 
-            for i in range(self.model.spring_count):
-                index0 = self.model.spring_indices[i * 2 + 0]
-                index1 = self.model.spring_indices[i * 2 + 1]
-
+            for index0, index1 in self.spring_pairs:
                 pos0 = particle_q[index0]
                 pos1 = particle_q[index1]
 
@@ -369,20 +437,10 @@ class UsdRenderer:
             self.spring_instancer.GetOrientationsAttr().Set(line_rotations, time)
             self.spring_instancer.GetScalesAttr().Set(line_scales, time)
 
-        # rigids
-        for b in range(self.model.link_count):
-            # xform = UsdGeom.Xform.Define(self.stage, self.root.GetPath().AppendChild("body_" + str(b)))
-
-            node = UsdGeom.Xform(
-                self.stage.GetPrimAtPath(
-                    self.root.GetPath().AppendChild("body_" + str(b))
-                )
-            )
-
-            # unpack rigid spatial_transform
-            X_sb = dflex.util.transform_expand(state.body_X_sc[b].tolist())
-
-            _usd_set_xform(node, X_sb, (1.0, 1.0, 1.0), time)
+        # rigids, unpack spatial transforms (p, q) with q = (x, y, z, w)
+        for ops, X_sb in zip(self.body_xform_ops, frame.get("body_X_sc", ())):
+            ops[0].Set(Gf.Vec3d(X_sb[0], X_sb[1], X_sb[2]), time)
+            ops[1].Set(Gf.Quatf(X_sb[6], X_sb[3], X_sb[4], X_sb[5]), time)
 
     def add_sphere(self, pos: tuple, radius: float, name: str, time: float = 0.0):
         """Debug helper to add a sphere for visualization
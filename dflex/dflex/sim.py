@@ -11,6 +11,8 @@ models + state forward in time.
 """
 
 import math
+import functools
+import weakref
 import torch
 import numpy as np
 
@@ -1180,6 +1182,31 @@ def spatial_transform_inertia(t: df.spatial_transform, I: df.spatial_matrix):
     return mul(mul(transpose(T), I), T)
 
 
+@df.kernel
+def eval_rigid_contacts_broadphase(
+    body_X_s: df.tensor(df.spatial_transform),
+    contact_body: df.tensor(int),
+    contact_point: df.tensor(df.float3),
+    contact_dist: df.tensor(float),
+    contact_depth: df.tensor(float),  # output
+):
+    tid = df.tid()
+
+    c_body = df.load(contact_body, tid)
+    c_point = df.load(contact_point, tid)
+    c_dist = df.load(contact_dist, tid)
+
+    X_s = df.load(body_X_s, c_body)
+
+    n = float3(0.0, 1.0, 0.0)
+
+    # same ground test as eval_rigid_contacts_art, contacts with depth >= 0.0 apply no force
+    p = df.spatial_transform_point(X_s, c_point) - n * c_dist
+    c = df.dot(n, p)
+
+    df.store(contact_depth, tid, c)
+
+
 @df.kernel
 def eval_rigid_contacts_art(
     body_X_s: df.tensor(df.spatial_transform),  # position of colliding body
@@ -2238,6 +2265,35 @@ def eval_dense_solve_batched(
     dense_solve_batched(b_start, A_start, A_dim, A, L, b, tmp, x)
 
 
+# articulated body algorithm, one thread per-articulation, solves H*qdd = tau in
+# O(n) without forming H, the adjoint recomputes the factorization in work
+@df.kernel
+def eval_rigid_aba(
+    articulation_start: df.tensor(int),
+    joint_parent: df.tensor(int),
+    joint_qd_start: df.tensor(int),
+    joint_S_s: df.tensor(df.spatial_vector),
+    body_I_s: df.tensor(df.spatial_matrix),
+    joint_armature: df.tensor(float),
+    joint_tau: df.tensor(float),
+    tmp: df.tensor(float),
+    work: df.tensor(float),
+    joint_qdd: df.tensor(float),
+):
+    aba_solve_batched(
+        articulation_start,
+        joint_parent,
+        joint_qd_start,
+        joint_S_s,
+        body_I_s,
+        joint_armature,
+        joint_tau,
+        tmp,
+        work,
+        joint_qdd,
+    )
+
+
 @df.kernel
 def eval_rigid_integrate(
     joint_type: df.tensor(int),
@@ -2271,197 +2327,897 @@ def eval_rigid_integrate(
     )
 
 
-g_state_out = None
-
-
-# define PyTorch autograd op to wrap simulate func
-class SimulateFunc(torch.autograd.Function):
-    """PyTorch autograd function representing a simulation stpe
-
-    Note:
-
-        This node will be inserted into the computation graph whenever
-        `forward()` is called on an integrator object. It should not be called
-        directly by the user.
-    """
-
-    @staticmethod
-    def forward(
-        ctx,
-        integrator,
-        model,
-        state_in,
-        dt,
-        substeps,
-        mass_matrix_freq,
-        reset_tape,
-        *tensors
-    ):
-        """
-        ctx: context object that can be used to stash information for backward computation
-        tensors: TODO?
-        """
-
-        # record launches
-        ctx.tape = df.Tape()
-
-        # ctx.inputs is the input to the model but what are they?
-        ctx.inputs = tensors
-        ctx.reset_tape = reset_tape
-        ctx.num_backward = 0  # TODO very much a hack
-
-        actuation = state_in.joint_act
-
-        # simulate
-        for i in range(substeps):
-            # ensure actuation is set on all substeps
-            state_in.joint_act = actuation
-            state_out = model.state()
-
-            integrator._simulate(
-                ctx.tape,
-                model,
-                state_in,
-                state_out,
-                dt / float(substeps),
-                update_mass_matrix=((i % mass_matrix_freq) == 0),
-            )
+# ----------------------------
+# fused articulation step, one thread per-articulation runs every stage of a substep
 
-            # swap states
-            state_in = state_out
 
-        # use global to pass state object back to caller
-        global g_state_out
-        g_state_out = state_out
+@df.func
+def clear_link_forces(
+    i: int,
+    body_ft_s: df.tensor(df.spatial_vector),
+    contact_f: df.tensor(df.spatial_vector),
+    contact_count: df.tensor(float),
+):
+    df.store(body_ft_s, i, spatial_vector())
+    df.store(contact_f, i, spatial_vector())
+    df.store(contact_count, i, 0.0)
 
-        # ctx.outputs is simple the output of a single step simulation
-        ctx.outputs = df.to_weak_list(state_out.flatten())
-        return tuple(state_out.flatten())
+    return 0
 
-    @staticmethod
-    def backward(ctx, *grad_output):
-        ctx.num_backward += 1
-        # NOTE: debugging code below
-        # print("calling backwards!")
-        # tot_norm = 0
-        # for i in ctx.inputs:
-        #     tot_norm += torch.norm(i.float())
-        # print("Input norm", tot_norm)
 
-        # ensure grads are contiguous in memory
-        # TODO why call gradients adjoints?
-        adj_outputs = df.make_contiguous(grad_output)
+@df.func
+def compute_contact_force_art(
+    i: int,
+    body_X_s: df.tensor(df.spatial_transform),
+    body_v_s: df.tensor(df.spatial_vector),
+    contact_body: df.tensor(int),
+    contact_point: df.tensor(df.float3),
+    contact_dist: df.tensor(float),
+    contact_mat: df.tensor(int),
+    materials: df.tensor(float),
+    body_f_s: df.tensor(df.spatial_vector),
+    contact_count: df.tensor(float),
+    contact_f: df.tensor(df.spatial_vector),
+):
+    # same contact model as eval_rigid_contacts_art
+    c_body = df.load(contact_body, i)
+    c_point = df.load(contact_point, i)
+    c_dist = df.load(contact_dist, i)
+    c_mat = df.load(contact_mat, i)
 
-        # register outputs with tape
-        outputs = df.to_strong_list(ctx.outputs)
-        for o in range(len(outputs)):
-            ctx.tape.adjoints[outputs[o]] = adj_outputs[o]
+    # hard coded surface parameter tensor layout (ke, kd, kf, mu)
+    ke = df.load(materials, c_mat * 4 + 0)  # restitution coefficient
+    kd = df.load(materials, c_mat * 4 + 1)  # damping coefficient
+    kf = df.load(materials, c_mat * 4 + 2)  # friction coefficient
+    mu = df.load(materials, c_mat * 4 + 3)  # coulomb friction
 
-        # # NOTE: debugging ##############
-        # tot_norm = 0
-        # for i in outputs:
-        #     if i is not None:
-        #         tot_norm += torch.norm(i.float())
-        # print("Output norm", tot_norm)
-        # #####################################
+    X_s = df.load(body_X_s, c_body)  # position of colliding body
+    v_s = df.load(body_v_s, c_body)  # orientation of colliding body
 
-        # replay launches backwards
-        ctx.tape.replay()
-        # TODO: replay somehow changes the outputs of the function!
+    n = float3(0.0, 1.0, 0.0)
 
-        # NOTE: debugging ##############
-        # tot_norm = 0
-        # for i in outputs:
-        #     if i is not None:
-        #         tot_norm += torch.norm(i.float())
-        # print("Output norm", tot_norm)
-        #####################################
+    # transform point to world space
+    p = (
+        df.spatial_transform_point(X_s, c_point) - n * c_dist
+    )  # add on 'thickness' of shape, e.g.: radius of sphere/capsule
 
-        # find adjoint of inputs
-        adj_inputs = []
-        for i in ctx.inputs:
-            if i in ctx.tape.adjoints:
-                adj_inputs.append(ctx.tape.adjoints[i])
-            else:
-                adj_inputs.append(None)
+    w = df.spatial_top(v_s)
+    v = df.spatial_bottom(v_s)
 
-        # Free the tape if we don't think it would be useful again;
-        #   otherwise just zero it so that we don't accumulate gradients
-        if ctx.reset_tape or ctx.num_backward == 11:  # this should be output dim!
-            ctx.tape.reset()
-        else:
-            ctx.tape.zero()
+    # contact point velocity
+    dpdt = v + df.cross(w, p)
 
-        # filter grads to replace empty tensors / no grad / constant params with None
-        # NOTE: Each none below is for each input parameter of forward!
-        return (None, None, None, None, None, None, None, *df.filter_grads(adj_inputs))
+    # check ground contact
+    c = df.dot(n, p)  # check if we're inside the ground
 
+    # exit if not in contact
+    if c >= 0.0:
+        return 0
 
-class SemiImplicitIntegrator:
-    """A semi-implicit integrator using symplectic Euler
+    vn = dot(n, dpdt)  # velocity component out of the ground
+    vt = dpdt - n * vn  # velocity component not into the ground
 
-    After constructing `Model` and `State` objects this time-integrator
-    may be used to advance the simulation state forward in time.
+    fn = c * ke  # normal force (restitution coefficient * how far inside for ground)
 
-    Semi-implicit time integration is a variational integrator that
-    preserves energy, however it not unconditionally stable, and requires a time-step
-    small enough to support the required stiffness and damping forces.
+    # contact damping
+    fd = df.min(vn, 0.0) * kd * df.step(c) * (0.0 - c)
 
-    See: https://en.wikipedia.org/wiki/Semi-implicit_Euler_method
+    # Coulomb friction (smooth, but gradients are numerically unstable around |vt| = 0)
+    ft = df.normalize(vt) * df.min(kf * df.length(vt), 0.0 - mu * c * ke) * df.step(c)
 
-    Example:
+    f_total = n * (fn + fd) + ft
+    t_total = df.cross(p, f_total)
 
-        >>> integrator = df.SemiImplicitIntegrator()
-        >>>
-        >>> # simulation loop
-        >>> for i in range(100):
-        >>>     state = integrator.forward(model, state, dt)
+    df.atomic_add(body_f_s, c_body, df.spatial_vector(t_total, f_total))
+    df.atomic_add(contact_f, c_body, df.spatial_vector(t_total, f_total))
+    df.atomic_add(contact_count, c_body, 1.0)
 
-    """
+    return 0
 
-    def __init__(self):
-        pass
 
-    def forward(
-        self,
-        model: Model,
-        state_in: State,
-        dt: float,
-        substeps: int,
-        mass_matrix_freq: int,
-        reset_tape: bool = True,
-    ) -> State:
-        """Performs a single integration step forward in time
+@df.func
+def compute_articulation_muscle(
+    i: int,
+    body_X_s: df.tensor(df.spatial_transform),
+    body_v_s: df.tensor(df.spatial_vector),
+    muscle_start: df.tensor(int),
+    muscle_links: df.tensor(int),
+    muscle_points: df.tensor(df.float3),
+    muscle_activation: df.tensor(float),
+    body_f_s: df.tensor(df.spatial_vector),
+):
+    m_start = df.load(muscle_start, i)
+    m_end = df.load(muscle_start, i + 1) - 1
 
-        This method inserts a node into the PyTorch computational graph with
-        references to all model and state tensors such that gradients
-        can be propagrated back through the simulation step.
+    activation = df.load(muscle_activation, i)
 
-        Args:
+    for j in range(m_start, m_end):
+        compute_muscle_force(
+            j, body_X_s, body_v_s, muscle_links, muscle_points, activation, body_f_s
+        )
 
-            model: Simulation model
-            state: Simulation state at the start the time-step
-            dt: The simulation time-step (usually in seconds)
+    return 0
 
-        Returns:
 
-            The state of the system at the end of the time-step
+@df.func
+def compute_link_integrate(
+    i: int,
+    joint_type: df.tensor(int),
+    joint_q_start: df.tensor(int),
+    joint_qd_start: df.tensor(int),
+    joint_q: df.tensor(float),
+    joint_qd: df.tensor(float),
+    joint_qdd: df.tensor(float),
+    dt: float,
+    joint_q_new: df.tensor(float),
+    joint_qd_new: df.tensor(float),
+):
+    type = df.load(joint_type, i)
+    coord_start = df.load(joint_q_start, i)
+    dof_start = df.load(joint_qd_start, i)
 
-        """
+    jcalc_integrate(
+        type,
+        joint_q,
+        joint_qd,
+        joint_qdd,
+        coord_start,
+        dof_start,
+        dt,
+        joint_q_new,
+        joint_qd_new,
+    )
 
-        if dflex.config.no_grad:
-            # if no gradient required then do inplace update
-            for i in range(substeps):
-                self._simulate(
-                    df.Tape(),
-                    model,
-                    state_in,
-                    state_in,
-                    dt / float(substeps),
-                    update_mass_matrix=(i % mass_matrix_freq) == 0,
-                )
+    return 0
 
-            return state_in
+
+@df.func
+def articulation_substep(
+    index: int,
+    substep: int,
+    mass_matrix_freq: int,
+    update_mass_matrix: int,
+    dt: float,
+    articulation_start: df.tensor(int),
+    articulation_J_start: df.tensor(int),
+    articulation_M_start: df.tensor(int),
+    articulation_H_start: df.tensor(int),
+    articulation_M_rows: df.tensor(int),
+    articulation_H_rows: df.tensor(int),
+    articulation_J_rows: df.tensor(int),
+    articulation_J_cols: df.tensor(int),
+    articulation_dof_start: df.tensor(int),
+    articulation_contact_start: df.tensor(int),
+    articulation_muscle_start: df.tensor(int),
+    joint_type: df.tensor(int),
+    joint_parent: df.tensor(int),
+    joint_q_start: df.tensor(int),
+    joint_qd_start: df.tensor(int),
+    joint_X_pj: df.tensor(df.spatial_transform),
+    joint_X_cm: df.tensor(df.spatial_transform),
+    joint_axis: df.tensor(df.float3),
+    joint_target: df.tensor(float),
+    joint_target_ke: df.tensor(float),
+    joint_target_kd: df.tensor(float),
+    joint_limit_lower: df.tensor(float),
+    joint_limit_upper: df.tensor(float),
+    joint_limit_ke: df.tensor(float),
+    joint_limit_kd: df.tensor(float),
+    joint_armature: df.tensor(float),
+    body_I_m: df.tensor(df.spatial_matrix),
+    gravity: df.tensor(df.float3),
+    contact_body: df.tensor(int),
+    contact_point: df.tensor(df.float3),
+    contact_dist: df.tensor(float),
+    contact_mat: df.tensor(int),
+    materials: df.tensor(float),
+    muscle_start: df.tensor(int),
+    muscle_links: df.tensor(int),
+    muscle_points: df.tensor(df.float3),
+    muscle_activation: df.tensor(float),
+    joint_q: df.tensor(float),
+    joint_qd: df.tensor(float),
+    joint_act: df.tensor(float),
+    tmp: df.tensor(float),
+    # outputs
+    body_X_sc: df.tensor(df.spatial_transform),
+    body_X_sm: df.tensor(df.spatial_transform),
+    joint_S_s: df.tensor(df.spatial_vector),
+    body_I_s: df.tensor(df.spatial_matrix),
+    body_v_s: df.tensor(df.spatial_vector),
+    body_f_s: df.tensor(df.spatial_vector),
+    body_a_s: df.tensor(df.spatial_vector),
+    body_ft_s: df.tensor(df.spatial_vector),
+    contact_f: df.tensor(df.spatial_vector),
+    contact_count: df.tensor(float),
+    joint_tau: df.tensor(float),
+    J: df.tensor(float),
+    M: df.tensor(float),
+    P: df.tensor(float),
+    H: df.tensor(float),
+    L: df.tensor(float),
+    joint_qdd: df.tensor(float),
+    joint_q_new: df.tensor(float),
+    joint_qd_new: df.tensor(float),
+):
+    start = df.load(articulation_start, index)
+    end = df.load(articulation_start, index + 1)
+    count = end - start
+
+    for i in range(start, end):
+        clear_link_forces(i, body_ft_s, contact_f, contact_count)
+
+    # body transforms (eval_rigid_fk)
+    for i in range(start, end):
+        compute_link_transform(
+            i,
+            joint_type,
+            joint_parent,
+            joint_q_start,
+            joint_qd_start,
+            joint_q,
+            joint_X_pj,
+            joint_X_cm,
+            joint_axis,
+            body_X_sc,
+            body_X_sm,
+        )
+
+    # joint inertias, motion vectors, and forces (eval_rigid_id)
+    for i in range(start, end):
+        compute_link_velocity(
+            i,
+            joint_type,
+            joint_parent,
+            joint_qd_start,
+            joint_qd,
+            joint_axis,
+            body_I_m,
+            body_X_sc,
+            body_X_sm,
+            joint_X_pj,
+            gravity,
+            joint_S_s,
+            body_I_s,
+            body_v_s,
+            body_f_s,
+            body_a_s,
+        )
+
+    # ground contacts of this articulation (eval_rigid_contacts_art)
+    contact_start = df.load(articulation_contact_start, index)
+    contact_end = df.load(articulation_contact_start, index + 1)
+
+    for i in range(contact_start, contact_end):
+        compute_contact_force_art(
+            i,
+            body_X_sc,
+            body_v_s,
+            contact_body,
+            contact_point,
+            contact_dist,
+            contact_mat,
+            materials,
+            body_f_s,
+            contact_count,
+            contact_f,
+        )
+
+    # muscles attached to this articulation (eval_muscles)
+    muscle_begin = df.load(articulation_muscle_start, index)
+    muscle_end = df.load(articulation_muscle_start, index + 1)
+
+    for i in range(muscle_begin, muscle_end):
+        compute_articulation_muscle(
+            i,
+            body_X_sc,
+            body_v_s,
+            muscle_start,
+            muscle_links,
+            muscle_points,
+            muscle_activation,
+            body_f_s,
+        )
+
+    # joint torques (eval_rigid_tau)
+    for i in range(0, count):
+        compute_link_tau(
+            i,
+            end,
+            joint_type,
+            joint_parent,
+            joint_q_start,
+            joint_qd_start,
+            joint_q,
+            joint_qd,
+            joint_act,
+            joint_target,
+            joint_target_ke,
+            joint_target_kd,
+            joint_limit_lower,
+            joint_limit_upper,
+            joint_limit_ke,
+            joint_limit_kd,
+            joint_S_s,
+            body_f_s,
+            body_ft_s,
+            joint_tau,
+        )
+
+    if update_mass_matrix == 1 and mod(substep, mass_matrix_freq) == 0:
+        J_offset = df.load(articulation_J_start, index)
+        M_offset = df.load(articulation_M_start, index)
+
+        spatial_jacobian(
+            joint_S_s, joint_parent, joint_qd_start, start, count, J_offset, J
+        )
+        spatial_mass(body_I_s, start, count, M_offset, M)
+
+        # P = M*J, H = J^T*P
+        dense_gemm_batched_serial(
+            articulation_M_rows,
+            articulation_J_cols,
+            articulation_J_rows,
+            0,
+            0,
+            articulation_M_start,
+            articulation_J_start,
+            articulation_J_start,
+            M,
+            J,
+            P,
+        )
+        dense_gemm_batched_serial(
+            articulation_J_cols,
+            articulation_J_cols,
+            articulation_J_rows,
+            1,
+            0,
+            articulation_J_start,
+            articulation_J_start,
+            articulation_H_start,
+            J,
+            P,
+            H,
+        )
+
+        dense_chol_batched(articulation_H_start, articulation_H_rows, H, joint_armature, L)
+
+    # solve for qdd
+    dense_solve_batched(
+        articulation_dof_start,
+        articulation_H_start,
+        articulation_H_rows,
+        H,
+        L,
+        joint_tau,
+        tmp,
+        joint_qdd,
+    )
+
+    # integrate joint dofs -> joint coords
+    for i in range(start, end):
+        compute_link_integrate(
+            i,
+            joint_type,
+            joint_q_start,
+            joint_qd_start,
+            joint_q,
+            joint_qd,
+            joint_qdd,
+            dt,
+            joint_q_new,
+            joint_qd_new,
+        )
+
+    return 0
+
+
+@df.kernel
+def eval_articulation_fused(
+    substeps: int,
+    mass_matrix_freq: int,
+    update_mass_matrix: int,
+    dt: float,
+    articulation_start: df.tensor(int),
+    articulation_J_start: df.tensor(int),
+    articulation_M_start: df.tensor(int),
+    articulation_H_start: df.tensor(int),
+    articulation_M_rows: df.tensor(int),
+    articulation_H_rows: df.tensor(int),
+    articulation_J_rows: df.tensor(int),
+    articulation_J_cols: df.tensor(int),
+    articulation_dof_start: df.tensor(int),
+    articulation_contact_start: df.tensor(int),
+    articulation_muscle_start: df.tensor(int),
+    joint_type: df.tensor(int),
+    joint_parent: df.tensor(int),
+    joint_q_start: df.tensor(int),
+    joint_qd_start: df.tensor(int),
+    joint_X_pj: df.tensor(df.spatial_transform),
+    joint_X_cm: df.tensor(df.spatial_transform),
+    joint_axis: df.tensor(df.float3),
+    joint_target: df.tensor(float),
+    joint_target_ke: df.tensor(float),
+    joint_target_kd: df.tensor(float),
+    joint_limit_lower: df.tensor(float),
+    joint_limit_upper: df.tensor(float),
+    joint_limit_ke: df.tensor(float),
+    joint_limit_kd: df.tensor(float),
+    joint_armature: df.tensor(float),
+    body_I_m: df.tensor(df.spatial_matrix),
+    gravity: df.tensor(df.float3),
+    contact_body: df.tensor(int),
+    contact_point: df.tensor(df.float3),
+    contact_dist: df.tensor(float),
+    contact_mat: df.tensor(int),
+    materials: df.tensor(float),
+    muscle_start: df.tensor(int),
+    muscle_links: df.tensor(int),
+    muscle_points: df.tensor(df.float3),
+    muscle_activation: df.tensor(float),
+    joint_q: df.tensor(float),
+    joint_qd: df.tensor(float),
+    joint_act: df.tensor(float),
+    tmp: df.tensor(float),
+    # outputs
+    body_X_sc: df.tensor(df.spatial_transform),
+    body_X_sm: df.tensor(df.spatial_transform),
+    joint_S_s: df.tensor(df.spatial_vector),
+    body_I_s: df.tensor(df.spatial_matrix),
+    body_v_s: df.tensor(df.spatial_vector),
+    body_f_s: df.tensor(df.spatial_vector),
+    body_a_s: df.tensor(df.spatial_vector),
+    body_ft_s: df.tensor(df.spatial_vector),
+    contact_f: df.tensor(df.spatial_vector),
+    contact_count: df.tensor(float),
+    joint_tau: df.tensor(float),
+    J: df.tensor(float),
+    M: df.tensor(float),
+    P: df.tensor(float),
+    H: df.tensor(float),
+    L: df.tensor(float),
+    joint_qdd: df.tensor(float),
+    joint_q_new: df.tensor(float),
+    joint_qd_new: df.tensor(float),
+):
+    # one thread per-articulation, when substeps > 1 the state must be
+    # advanced in-place (joint_q == joint_q_new, joint_qd == joint_qd_new)
+    index = tid()
+
+    for s in range(0, substeps):
+        articulation_substep(
+            index,
+            s,
+            mass_matrix_freq,
+            update_mass_matrix,
+            dt,
+            articulation_start,
+            articulation_J_start,
+            articulation_M_start,
+            articulation_H_start,
+            articulation_M_rows,
+            articulation_H_rows,
+            articulation_J_rows,
+            articulation_J_cols,
+            articulation_dof_start,
+            articulation_contact_start,
+            articulation_muscle_start,
+            joint_type,
+            joint_parent,
+            joint_q_start,
+            joint_qd_start,
+            joint_X_pj,
+            joint_X_cm,
+            joint_axis,
+            joint_target,
+            joint_target_ke,
+            joint_target_kd,
+            joint_limit_lower,
+            joint_limit_upper,
+            joint_limit_ke,
+            joint_limit_kd,
+            joint_armature,
+            body_I_m,
+            gravity,
+            contact_body,
+            contact_point,
+            contact_dist,
+            contact_mat,
+            materials,
+            muscle_start,
+            muscle_links,
+            muscle_points,
+            muscle_activation,
+            joint_q,
+            joint_qd,
+            joint_act,
+            tmp,
+            body_X_sc,
+            body_X_sm,
+            joint_S_s,
+            body_I_s,
+            body_v_s,
+            body_f_s,
+            body_a_s,
+            body_ft_s,
+            contact_f,
+            contact_count,
+            joint_tau,
+            J,
+            M,
+            P,
+            H,
+            L,
+            joint_qdd,
+            joint_q_new,
+            joint_qd_new,
+        )
+
+
+g_state_out = None
+
+# floats per link of the articulated body algorithm workspace, see aba_link in spatial.h
+ABA_LINK_FLOATS = 138
+
+# state attributes stored at step boundaries by checkpointed steps
+CHECKPOINT_ATTRS = ("particle_q", "particle_qd", "joint_q", "joint_qd", "joint_act")
+
+
+def simulate_substeps(
+    tape, integrator, model, state_in, dt, substeps, mass_matrix_freq, intermediates
+):
+    """Runs all substeps of a simulation step and returns the final state
+
+    Intermediate substep states are taken from the model's state pool and appended
+    to `intermediates` so the caller can release them, the final state is always
+    newly allocated since it is handed to the user.
+    """
+
+    actuation = state_in.joint_act
+
+    for i in range(substeps):
+        # ensure actuation is set on all substeps
+        state_in.joint_act = actuation
+
+        if dflex.config.recycle_states and i < substeps - 1:
+            state_out = model.state_pool.acquire()
+            intermediates.append(state_out)
+        else:
+            state_out = model.state()
+
+        integrator._simulate(
+            tape,
+            model,
+            state_in,
+            state_out,
+            dt / float(substeps),
+            update_mass_matrix=((i % mass_matrix_freq) == 0),
+        )
+
+        # swap states
+        state_in = state_out
+
+    return state_out
+
+
+# define PyTorch autograd op to wrap simulate func
+class SimulateFunc(torch.autograd.Function):
+    """PyTorch autograd function representing a simulation stpe
+
+    Note:
+
+        This node will be inserted into the computation graph whenever
+        `forward()` is called on an integrator object. It should not be called
+        directly by the user.
+    """
+
+    @staticmethod
+    def forward(
+        ctx,
+        integrator,
+        model,
+        state_in,
+        dt,
+        substeps,
+        mass_matrix_freq,
+        reset_tape,
+        checkpoint,
+        *tensors
+    ):
+        """
+        ctx: context object that can be used to stash information for backward computation
+        tensors: TODO?
+        """
+
+        # ctx.inputs is the input to the model but what are they?
+        ctx.inputs = tensors
+        ctx.reset_tape = reset_tape
+
+        intermediates = []
+
+        if checkpoint:
+            # only keep the boundary state, the substeps are simulated again in backward()
+            ctx.tape = None
+            ctx.integrator = integrator
+            ctx.model = model
+            ctx.dt = dt
+            ctx.substeps = substeps
+            ctx.mass_matrix_freq = mass_matrix_freq
+            ctx.state_names = [
+                k for k, v in state_in.__dict__.items() if torch.is_tensor(v)
+            ]
+            ctx.checkpoint = {
+                name: getattr(state_in, name).clone()
+                for name in CHECKPOINT_ATTRS
+                if hasattr(state_in, name)
+            }
+
+            state_out = simulate_substeps(
+                df.NullTape(),
+                integrator,
+                model,
+                state_in,
+                dt,
+                substeps,
+                mass_matrix_freq,
+                intermediates,
+            )
+            model.state_pool.release(intermediates)
+
+        else:
+            # record launches
+            ctx.tape = df.Tape(record=True)
+            ctx.checkpoint = None
+
+            # intermediate substep states are only referenced by the tape, so they
+            # can be recycled once the tape has been replayed and reset, or freed
+            if dflex.config.recycle_states:
+                ctx.tape.on_reset.append(
+                    functools.partial(model.state_pool.release, intermediates)
+                )
+                weakref.finalize(ctx.tape, model.state_pool.release, intermediates)
+
+            state_out = simulate_substeps(
+                ctx.tape,
+                integrator,
+                model,
+                state_in,
+                dt,
+                substeps,
+                mass_matrix_freq,
+                intermediates,
+            )
+
+            # ctx.outputs is simple the output of a single step simulation
+            ctx.outputs = df.to_weak_list(state_out.flatten())
+
+        # use global to pass state object back to caller
+        global g_state_out
+        g_state_out = state_out
+
+        return tuple(state_out.flatten())
+
+    @staticmethod
+    def backward(ctx, *grad_output):
+        # NOTE: debugging code below
+        # print("calling backwards!")
+        # tot_norm = 0
+        # for i in ctx.inputs:
+        #     tot_norm += torch.norm(i.float())
+        # print("Input norm", tot_norm)
+
+        # ensure grads are contiguous in memory
+        # TODO why call gradients adjoints?
+        adj_outputs = df.make_contiguous(grad_output)
+
+        if ctx.checkpoint is not None:
+            return SimulateFunc._backward_checkpoint(ctx, adj_outputs)
+
+        # register outputs with tape
+        outputs = df.to_strong_list(ctx.outputs)
+        for o in range(len(outputs)):
+            ctx.tape.adjoints[outputs[o]] = adj_outputs[o]
+
+        # # NOTE: debugging ##############
+        # tot_norm = 0
+        # for i in outputs:
+        #     if i is not None:
+        #         tot_norm += torch.norm(i.float())
+        # print("Output norm", tot_norm)
+        # #####################################
+
+        # replay launches backwards, a tape that is kept for further backward passes
+        # must leave the outputs of the step as they were after the forward pass
+        ctx.tape.replay(restore_outputs=not ctx.reset_tape)
+
+        # NOTE: debugging ##############
+        # tot_norm = 0
+        # for i in outputs:
+        #     if i is not None:
+        #         tot_norm += torch.norm(i.float())
+        # print("Output norm", tot_norm)
+        #####################################
+
+        # find adjoint of inputs
+        adj_inputs = []
+        for i in ctx.inputs:
+            if i in ctx.tape.adjoints:
+                adj_inputs.append(ctx.tape.adjoints[i])
+            else:
+                adj_inputs.append(None)
+
+        # Free the tape if we don't think it would be useful again, otherwise just zero it
+        # so that we don't accumulate gradients over repeated backward passes (e.g. one per
+        # jacobian row), the tape is then released together with the autograd graph
+        if ctx.reset_tape:
+            ctx.tape.reset()
+        else:
+            ctx.tape.zero()
+
+        # filter grads to replace empty tensors / no grad / constant params with None
+        # NOTE: Each none below is for each input parameter of forward!
+        return (
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            *df.filter_grads(adj_inputs),
+        )
+
+    @staticmethod
+    def _backward_checkpoint(ctx, adj_outputs):
+        """Simulates the step again from the stored boundary state and replays it
+
+        Gradients are only returned for the checkpointed state attributes and the
+        model tensors, other state inputs are treated as constants.
+        """
+
+        model = ctx.model
+        tape = df.Tape(record=True)
+
+        intermediates = []
+        if dflex.config.recycle_states:
+            tape.on_reset.append(
+                functools.partial(model.state_pool.release, intermediates)
+            )
+
+        state_in = model.state()
+        for name, value in ctx.checkpoint.items():
+            setattr(state_in, name, value.requires_grad_(True))
+
+        state_out = simulate_substeps(
+            tape,
+            ctx.integrator,
+            model,
+            state_in,
+            ctx.dt,
+            ctx.substeps,
+            ctx.mass_matrix_freq,
+            intermediates,
+        )
+
+        # register outputs with tape
+        outputs = state_out.flatten()
+        for o in range(len(outputs)):
+            tape.adjoints[outputs[o]] = adj_outputs[o]
+
+        tape.replay()
+
+        # map the inputs of the original step onto the simulated state
+        adj_inputs = []
+        for i, t in enumerate(ctx.inputs):
+            if i < len(ctx.state_names):
+                name = ctx.state_names[i]
+                t = ctx.checkpoint.get(name)
+
+            if t is not None and t in tape.adjoints:
+                adj_inputs.append(tape.adjoints[t])
+            else:
+                adj_inputs.append(None)
+
+        tape.reset()
+
+        return (
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            *df.filter_grads(adj_inputs),
+        )
+
+
+class SemiImplicitIntegrator:
+    """A semi-implicit integrator using symplectic Euler
+
+    After constructing `Model` and `State` objects this time-integrator
+    may be used to advance the simulation state forward in time.
+
+    Semi-implicit time integration is a variational integrator that
+    preserves energy, however it not unconditionally stable, and requires a time-step
+    small enough to support the required stiffness and damping forces.
+
+    See: https://en.wikipedia.org/wiki/Semi-implicit_Euler_method
+
+    Example:
+
+        >>> integrator = df.SemiImplicitIntegrator()
+        >>>
+        >>> # simulation loop
+        >>> for i in range(100):
+        >>>     state = integrator.forward(model, state, dt)
+
+    """
+
+    def __init__(self, dynamics="dense"):
+        """
+        Args:
+            dynamics: How joint accelerations are solved for. "dense" forms and
+                factorizes the joint space mass matrix H = J^T*M*J, which may be
+                reused across substeps through mass_matrix_freq. "aba" uses the
+                articulated body algorithm, which is O(n) in the number of links
+                and never forms H, but refactorizes on every substep.
+        """
+
+        if dynamics not in ("dense", "aba"):
+            raise ValueError("Unknown articulation dynamics: {}".format(dynamics))
+
+        self.dynamics = dynamics
+
+        # ground contact points evaluated by the narrowphase vs. all contact points,
+        # summed over substeps until reset_contact_stats()
+        self.contact_stats = {"active": 0, "total": 0}
+
+    def reset_contact_stats(self):
+        self.contact_stats = {"active": 0, "total": 0}
+
+    def forward(
+        self,
+        model: Model,
+        state_in: State,
+        dt: float,
+        substeps: int,
+        mass_matrix_freq: int,
+        reset_tape: bool = True,
+        checkpoint: bool = False,
+    ) -> State:
+        """Performs a single integration step forward in time
+
+        This method inserts a node into the PyTorch computational graph with
+        references to all model and state tensors such that gradients
+        can be propagrated back through the simulation step.
+
+        Args:
+
+            model: Simulation model
+            state: Simulation state at the start the time-step
+            dt: The simulation time-step (usually in seconds)
+            reset_tape: If False the recorded launches are kept after the backward pass so
+                the step can be differentiated several times, e.g. once per jacobian row
+            checkpoint: If True only the joint state at the start of the step is
+                kept for the backward pass and the substeps are simulated again
+                when gradients are requested, trading compute for memory. Only the
+                state attributes in CHECKPOINT_ATTRS and the model tensors receive
+                gradients, other state inputs are treated as constants
+
+        Returns:
+
+            The state of the system at the end of the time-step
+
+        """
+
+        if not model.grad_enabled():
+            return self._forward_no_grad(
+                model, state_in, dt, substeps, mass_matrix_freq
+            )
 
         else:
             # get list of inputs and outputs for PyTorch tensor tracking
@@ -2476,6 +3232,7 @@ class SemiImplicitIntegrator:
                 substeps,
                 mass_matrix_freq,
                 reset_tape,
+                checkpoint,
                 *inputs
             )
 
@@ -2485,25 +3242,66 @@ class SemiImplicitIntegrator:
 
             return state_out
 
-    def _simulate(self, tape, model, state_in, state_out, dt, update_mass_matrix=True):
+    def _forward_no_grad(self, model, state, dt, substeps, mass_matrix_freq):
+        """Advances the state in-place without recording any kernel launches
+
+        No tape is created and all temporaries (joint forces, mass matrix buffers,
+        solver scratch) are taken from persistent buffers on the model, so
+        no autograd tracked tensors are allocated per substep.
+        """
+
+        tape = df.NullTape()
+
+        with torch.no_grad():
+            for i in range(substeps):
+                self._simulate(
+                    tape,
+                    model,
+                    state,
+                    state,
+                    dt / float(substeps),
+                    update_mass_matrix=(i % mass_matrix_freq) == 0,
+                    requires_grad=False,
+                )
+
+        return state
+
+    def _simulate(
+        self,
+        tape,
+        model,
+        state_in,
+        state_out,
+        dt,
+        update_mass_matrix=True,
+        requires_grad=True,
+    ):
         with dflex.util.ScopedTimer("simulate", False):
             # alloc particle force buffer
             if model.particle_count:
                 state_out.particle_f.zero_()
 
             if model.link_count:
-                state_out.body_ft_s = torch.zeros(
-                    (model.link_count, 6),
-                    dtype=torch.float32,
-                    device=model.adapter,
-                    requires_grad=True,
-                )
-                state_out.body_f_ext_s = torch.zeros(
-                    (model.link_count, 6),
-                    dtype=torch.float32,
-                    device=model.adapter,
-                    requires_grad=True,
-                )
+                if requires_grad:
+                    state_out.body_ft_s = torch.zeros(
+                        (model.link_count, 6),
+                        dtype=torch.float32,
+                        device=model.adapter,
+                        requires_grad=True,
+                    )
+                    state_out.body_f_ext_s = torch.zeros(
+                        (model.link_count, 6),
+                        dtype=torch.float32,
+                        device=model.adapter,
+                        requires_grad=True,
+                    )
+                else:
+                    state_out.body_ft_s = model.scratch(
+                        "body_ft_s", (model.link_count, 6)
+                    )
+                    state_out.body_f_ext_s = model.scratch(
+                        "body_f_ext_s", (model.link_count, 6)
+                    )
 
             # damped springs
             if model.spring_count:
@@ -2672,20 +3470,60 @@ class SemiImplicitIntegrator:
                     preserve_output=True,
                 )
 
-                prev_body_f_s = state_out.body_f_s.clone()
+                if requires_grad:
+                    prev_body_f_s = state_out.body_f_s.clone()
+                else:
+                    prev_body_f_s = model.scratch(
+                        "prev_body_f_s", (model.link_count, 6)
+                    )
+                    prev_body_f_s.copy_(state_out.body_f_s)
 
                 if model.ground and model.contact_count > 0:
+                    contacts = [
+                        model.contact_body0,
+                        model.contact_point0,
+                        model.contact_dist,
+                        model.contact_material,
+                    ]
+                    active_count = model.contact_count
+
+                    if dflex.config.contact_compaction:
+                        # broadphase, not recorded since the active set is piecewise constant
+                        depth = model.scratch("contact_depth", (model.contact_count,))
+
+                        df.launch(
+                            func=eval_rigid_contacts_broadphase,
+                            dim=model.contact_count,
+                            inputs=[
+                                state_out.body_X_sc.detach(),
+                                model.contact_body0,
+                                model.contact_point0,
+                                model.contact_dist,
+                            ],
+                            outputs=[depth],
+                            adapter=model.adapter,
+                        )
+
+                        # gather the active contacts, the tape keeps the compacted
+                        # arrays so the adjoint replays over the same set, nonzero()
+                        # waits for the device which is why compaction is opt-in
+                        active = torch.nonzero(
+                            depth < dflex.config.contact_margin
+                        ).view(-1)
+                        contacts = [c.index_select(0, active) for c in contacts]
+                        active_count = len(active)
+
+                    self.contact_stats["active"] += active_count
+                    self.contact_stats["total"] += model.contact_count
+
                     # evaluate contact forces
                     tape.launch(
                         func=eval_rigid_contacts_art,
-                        dim=model.contact_count,
+                        dim=active_count,
                         inputs=[
                             state_out.body_X_sc,
                             state_out.body_v_s,
-                            model.contact_body0,
-                            model.contact_point0,
-                            model.contact_dist,
-                            model.contact_material,
+                            *contacts,
                             model.shape_materials,
                         ],
                         outputs=[state_out.body_f_s, state_out.contact_count],
@@ -2693,9 +3531,14 @@ class SemiImplicitIntegrator:
                         preserve_output=True,
                     )
 
-                    state_out.contact_f = (
-                        state_out.body_f_s.clone() - prev_body_f_s
-                    ).detach()
+                    if requires_grad:
+                        state_out.contact_f = (
+                            state_out.body_f_s.clone() - prev_body_f_s
+                        ).detach()
+                    else:
+                        torch.sub(
+                            state_out.body_f_s, prev_body_f_s, out=state_out.contact_f
+                        )
 
                 # particle shape contact
                 if model.particle_count:
@@ -2777,112 +3620,141 @@ class SemiImplicitIntegrator:
                     preserve_output=True,
                 )
 
-                if update_mass_matrix:
-                    model.alloc_mass_matrix()
-
-                    # build J
+                if self.dynamics == "aba":
+                    # the factorization is rebuilt from the current inertias on every
+                    # substep (mass_matrix_freq does not apply) and again by the adjoint,
+                    # so the workspace is scratch in both the grad and no-grad paths
                     tape.launch(
-                        func=eval_rigid_jacobian,
+                        func=eval_rigid_aba,
                         dim=model.articulation_count,
                         inputs=[
-                            # inputs
                             model.articulation_joint_start,
-                            model.articulation_J_start,
                             model.joint_parent,
                             model.joint_qd_start,
                             state_out.joint_S_s,
-                        ],
-                        outputs=[model.J],
-                        adapter=model.adapter,
-                        preserve_output=True,
-                    )
-
-                    # build M
-                    tape.launch(
-                        func=eval_rigid_mass,
-                        dim=model.articulation_count,
-                        inputs=[
-                            # inputs
-                            model.articulation_joint_start,
-                            model.articulation_M_start,
                             state_out.body_I_s,
+                            model.joint_armature,
+                            state_out.joint_tau,
+                            model.scratch("tmp", state_out.joint_tau.shape),
+                            model.scratch("aba_work", (model.link_count, ABA_LINK_FLOATS)),
                         ],
-                        outputs=[model.M],
-                        adapter=model.adapter,
-                        preserve_output=True,
-                    )
-
-                    # form P = M*J
-                    df.matmul_batched(
-                        tape,
-                        model.articulation_count,
-                        model.articulation_M_rows,
-                        model.articulation_J_cols,
-                        model.articulation_J_rows,
-                        0,
-                        0,
-                        model.articulation_M_start,
-                        model.articulation_J_start,
-                        model.articulation_J_start,  # P start is the same as J start since it has the same dims as J
-                        model.M,
-                        model.J,
-                        model.P,
-                        adapter=model.adapter,
-                    )
-
-                    # form H = J^T*P
-                    df.matmul_batched(
-                        tape,
-                        model.articulation_count,
-                        model.articulation_J_cols,
-                        model.articulation_J_cols,
-                        model.articulation_J_rows,  # P rows is the same as J rows
-                        1,
-                        0,
-                        model.articulation_J_start,
-                        model.articulation_J_start,  # P start is the same as J start since it has the same dims as J
-                        model.articulation_H_start,
-                        model.J,
-                        model.P,
-                        model.H,
+                        outputs=[state_out.joint_qdd],
                         adapter=model.adapter,
+                        skip_check_grad=True,
                     )
 
-                    # compute decomposition
+                else:
+                    model.mass_matrix_cache.record(update_mass_matrix)
+
+                    if update_mass_matrix:
+                        model.alloc_mass_matrix(requires_grad, tape)
+
+                        # build J
+                        tape.launch(
+                            func=eval_rigid_jacobian,
+                            dim=model.articulation_count,
+                            inputs=[
+                                # inputs
+                                model.articulation_joint_start,
+                                model.articulation_J_start,
+                                model.joint_parent,
+                                model.joint_qd_start,
+                                state_out.joint_S_s,
+                            ],
+                            outputs=[model.J],
+                            adapter=model.adapter,
+                            preserve_output=True,
+                        )
+
+                        # build M
+                        tape.launch(
+                            func=eval_rigid_mass,
+                            dim=model.articulation_count,
+                            inputs=[
+                                # inputs
+                                model.articulation_joint_start,
+                                model.articulation_M_start,
+                                state_out.body_I_s,
+                            ],
+                            outputs=[model.M],
+                            adapter=model.adapter,
+                            preserve_output=True,
+                        )
+
+                        # form P = M*J
+                        df.matmul_batched(
+                            tape,
+                            model.articulation_count,
+                            model.articulation_M_rows,
+                            model.articulation_J_cols,
+                            model.articulation_J_rows,
+                            0,
+                            0,
+                            model.articulation_M_start,
+                            model.articulation_J_start,
+                            model.articulation_J_start,  # P start is the same as J start since it has the same dims as J
+                            model.M,
+                            model.J,
+                            model.P,
+                            adapter=model.adapter,
+                        )
+
+                        # form H = J^T*P
+                        df.matmul_batched(
+                            tape,
+                            model.articulation_count,
+                            model.articulation_J_cols,
+                            model.articulation_J_cols,
+                            model.articulation_J_rows,  # P rows is the same as J rows
+                            1,
+                            0,
+                            model.articulation_J_start,
+                            model.articulation_J_start,  # P start is the same as J start since it has the same dims as J
+                            model.articulation_H_start,
+                            model.J,
+                            model.P,
+                            model.H,
+                            adapter=model.adapter,
+                        )
+
+                        # compute decomposition
+                        tape.launch(
+                            func=eval_dense_cholesky_batched,
+                            dim=model.articulation_count,
+                            inputs=[
+                                model.articulation_H_start,
+                                model.articulation_H_rows,
+                                model.H,
+                                model.joint_armature,
+                            ],
+                            outputs=[model.L],
+                            adapter=model.adapter,
+                            skip_check_grad=True,
+                        )
+
+                    if requires_grad:
+                        tmp = torch.zeros_like(state_out.joint_tau)
+                    else:
+                        tmp = model.scratch("tmp", state_out.joint_tau.shape)
+
+                    # solve for qdd
                     tape.launch(
-                        func=eval_dense_cholesky_batched,
+                        func=eval_dense_solve_batched,
                         dim=model.articulation_count,
                         inputs=[
+                            model.articulation_dof_start,
                             model.articulation_H_start,
                             model.articulation_H_rows,
                             model.H,
-                            model.joint_armature,
+                            model.L,
+                            state_out.joint_tau,
+                            tmp,
                         ],
-                        outputs=[model.L],
+                        outputs=[state_out.joint_qdd],
                         adapter=model.adapter,
                         skip_check_grad=True,
                     )
 
-                tmp = torch.zeros_like(state_out.joint_tau)
-
-                # solve for qdd
-                tape.launch(
-                    func=eval_dense_solve_batched,
-                    dim=model.articulation_count,
-                    inputs=[
-                        model.articulation_dof_start,
-                        model.articulation_H_start,
-                        model.articulation_H_rows,
-                        model.H,
-                        model.L,
-                        state_out.joint_tau,
-                        tmp,
-                    ],
-                    outputs=[state_out.joint_qdd],
-                    adapter=model.adapter,
-                    skip_check_grad=True,
-                )
-
                 # integrate joint dofs -> joint coords
                 tape.launch(
                     func=eval_rigid_integrate,
@@ -2922,6 +3794,271 @@ class SemiImplicitIntegrator:
             return state_out
 
 
+class FusedArticulationIntegrator(SemiImplicitIntegrator):
+    """Semi-implicit integrator that evaluates each articulation substep in a single kernel
+
+    Forward kinematics, inverse dynamics, ground contacts, muscles, joint torques,
+    the mass matrix build and factorization, the solve and the joint integration
+    of an articulation are all evaluated by one thread, so a substep costs one
+    kernel launch instead of ~10 launches and several temporaries.
+
+    When no gradients are required, i.e. when ``model.grad_enabled()`` is False,
+    all substeps of a step run inside a single launch and the state is
+    advanced in-place.
+    Differentiable steps record one launch per substep on the tape.
+
+    Models with particles, or whose contacts / muscles are not grouped by
+    articulation, and integrators created with ``dynamics="aba"`` fall back
+    to `SemiImplicitIntegrator`.
+
+    Example:
+
+        >>> integrator = df.sim.FusedArticulationIntegrator()
+        >>>
+        >>> # simulation loop
+        >>> for i in range(100):
+        >>>     state = integrator.forward(model, state, dt, substeps, mass_matrix_freq)
+
+    """
+
+    def _articulation_ranges(self, model):
+        """Returns per-articulation [start, end) ranges into the contact and muscle arrays
+
+        Returns None if the contacts or muscles are not ordered by articulation,
+        the result is cached on the model and recomputed when the contacts change.
+        """
+
+        cache = getattr(model, "_fused_ranges", None)
+
+        if cache is not None and cache[0] is model.contact_body0:
+            return cache[1]
+
+        joint_start = model.articulation_joint_start.cpu().long()
+        count = model.articulation_count
+
+        def ranges(body):
+            # articulation that owns each element, elements must be sorted by it
+            art = torch.searchsorted(joint_start, body, right=True) - 1
+
+            if len(art) > 1 and bool((art[1:] < art[:-1]).any()):
+                return None
+
+            offsets = torch.searchsorted(art, torch.arange(count + 1))
+            return offsets.to(dtype=torch.int32, device=model.adapter)
+
+        if model.ground and model.contact_count > 0:
+            contact_start = ranges(model.contact_body0.cpu().long())
+        else:
+            contact_start = torch.zeros(
+                count + 1, dtype=torch.int32, device=model.adapter
+            )
+
+        if model.muscle_count > 0:
+            muscle_body = model.muscle_links.cpu().long()[
+                model.muscle_start.cpu().long()[:-1]
+            ]
+            muscle_start = ranges(muscle_body)
+        else:
+            muscle_start = torch.zeros(count + 1, dtype=torch.int32, device=model.adapter)
+
+        result = None
+        if contact_start is not None and muscle_start is not None:
+            result = (contact_start, muscle_start)
+
+        # stored as a tuple so the ranges are not picked up by Model.flatten()
+        model._fused_ranges = (model.contact_body0, result)
+
+        return result
+
+    def _launch_fused(
+        self,
+        tape,
+        model,
+        state_in,
+        state_out,
+        dt,
+        substeps,
+        mass_matrix_freq,
+        update_mass_matrix,
+        ranges,
+        tmp,
+    ):
+        contact_start, muscle_start = ranges
+
+        tape.launch(
+            func=eval_articulation_fused,
+            dim=model.articulation_count,
+            inputs=[
+                substeps,
+                mass_matrix_freq,
+                int(update_mass_matrix),
+                dt,
+                model.articulation_joint_start,
+                model.articulation_J_start,
+                model.articulation_M_start,
+                model.articulation_H_start,
+                model.articulation_M_rows,
+                model.articulation_H_rows,
+                model.articulation_J_rows,
+                model.articulation_J_cols,
+                model.articulation_dof_start,
+                contact_start,
+                muscle_start,
+                model.joint_type,
+                model.joint_parent,
+                model.joint_q_start,
+                model.joint_qd_start,
+                model.joint_X_pj,
+                model.joint_X_cm,
+                model.joint_axis,
+                model.joint_target,
+                model.joint_target_ke,
+                model.joint_target_kd,
+                model.joint_limit_lower,
+                model.joint_limit_upper,
+                model.joint_limit_ke,
+                model.joint_limit_kd,
+                model.joint_armature,
+                model.body_I_m,
+                model.gravity,
+                model.contact_body0,
+                model.contact_point0,
+                model.contact_dist,
+                model.contact_material,
+                model.shape_materials,
+                model.muscle_start,
+                model.muscle_links,
+                model.muscle_points,
+                model.muscle_activation,
+                state_in.joint_q,
+                state_in.joint_qd,
+                state_in.joint_act,
+                tmp,
+            ],
+            outputs=[
+                state_out.body_X_sc,
+                state_out.body_X_sm,
+                state_out.joint_S_s,
+                state_out.body_I_s,
+                state_out.body_v_s,
+                state_out.body_f_s,
+                state_out.body_a_s,
+                state_out.body_ft_s,
+                state_out.contact_f,
+                state_out.contact_count,
+                state_out.joint_tau,
+                model.J,
+                model.M,
+                model.P,
+                model.H,
+                model.L,
+                state_out.joint_qdd,
+                state_out.joint_q,
+                state_out.joint_qd,
+            ],
+            adapter=model.adapter,
+            preserve_output=True,
+            skip_check_grad=True,
+        )
+
+    def _forward_no_grad(self, model, state, dt, substeps, mass_matrix_freq):
+        """Advances the state in-place with a single launch for all substeps"""
+
+        ranges = None
+        if self.dynamics == "dense" and model.link_count and not model.particle_count:
+            ranges = self._articulation_ranges(model)
+
+        if ranges is None:
+            return super()._forward_no_grad(
+                model, state, dt, substeps, mass_matrix_freq
+            )
+
+        with torch.no_grad():
+            state.body_ft_s = model.scratch("body_ft_s", (model.link_count, 6))
+            tmp = model.scratch("tmp", state.joint_tau.shape)
+
+            model.alloc_mass_matrix(False)
+
+            updates = (substeps + mass_matrix_freq - 1) // mass_matrix_freq
+            model.mass_matrix_cache.record(True, updates)
+            model.mass_matrix_cache.record(False, substeps - updates)
+
+            self._launch_fused(
+                df.NullTape(),
+                model,
+                state,
+                state,
+                dt / float(substeps),
+                substeps,
+                mass_matrix_freq,
+                True,
+                ranges,
+                tmp,
+            )
+
+        return state
+
+    def _simulate(
+        self,
+        tape,
+        model,
+        state_in,
+        state_out,
+        dt,
+        update_mass_matrix=True,
+        requires_grad=True,
+    ):
+        ranges = None
+        if self.dynamics == "dense" and model.link_count and not model.particle_count:
+            ranges = self._articulation_ranges(model)
+
+        if ranges is None:
+            return super()._simulate(
+                tape,
+                model,
+                state_in,
+                state_out,
+                dt,
+                update_mass_matrix=update_mass_matrix,
+                requires_grad=requires_grad,
+            )
+
+        with dflex.util.ScopedTimer("simulate", False):
+            if requires_grad:
+                state_out.body_ft_s = torch.zeros(
+                    (model.link_count, 6),
+                    dtype=torch.float32,
+                    device=model.adapter,
+                    requires_grad=True,
+                )
+                tmp = torch.zeros_like(state_out.joint_tau)
+            else:
+                state_out.body_ft_s = model.scratch("body_ft_s", (model.link_count, 6))
+                tmp = model.scratch("tmp", state_out.joint_tau.shape)
+
+            model.mass_matrix_cache.record(update_mass_matrix)
+
+            if update_mass_matrix:
+                model.alloc_mass_matrix(requires_grad, tape)
+
+            # one substep per launch, the kernel's reverse pass can not restore
+            # intermediate joint states so multiple substeps are not differentiable
+            self._launch_fused(
+                tape,
+                model,
+                state_in,
+                state_out,
+                dt,
+                1,
+                1,
+                update_mass_matrix,
+                ranges,
+                tmp,
+            )
+
+            return state_out
+
+
 @df.kernel
 def solve_springs(
     x: df.tensor(df.float3),
@@ -3236,9 +4373,9 @@ class XPBDIntegrator:
 
         """
 
-        if dflex.config.no_grad:
+        if not model.grad_enabled():
             # if no gradient required then do inplace update
-            self._simulate(df.Tape(), model, state_in, state_in, dt)
+            self._simulate(df.NullTape(), model, state_in, state_in, dt)
             return state_in
 
         else:
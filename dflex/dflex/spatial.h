@@ -152,13 +152,11 @@ CUDA_CALLABLE inline void adj_spatial_bottom(const spatial_vector& a, spatial_ve
     adj_a.v += adj_ret;
 }
 
-#ifdef CUDA
 inline __device__ void atomic_add(spatial_vector* addr, const spatial_vector& value) {
     
     atomic_add(&addr->w, value.w);
     atomic_add(&addr->v, value.v);
 }
-#endif
 
 //---------------------------------------------------------------------------------
 // Represents a rigid body transformation
@@ -263,13 +261,11 @@ CUDA_CALLABLE inline void adj_mul(const spatial_transform& a, float s, spatial_t
     adj_mul(a.q, s, adj_a.q, adj_s, adj_ret.q);
 }
 
-#ifdef CUDA
 inline __device__ void atomic_add(spatial_transform* addr, const spatial_transform& value) {
     
     atomic_add(&addr->p, value.p);
     atomic_add(&addr->q, value.q);
 }
-#endif
 
 CUDA_CALLABLE inline void adj_spatial_transform(const float3& p, const quat& q, float3& adj_p, quat& adj_q, const spatial_transform& adj_ret)
 {
@@ -668,7 +664,6 @@ inline void CUDA_CALLABLE adj_index(const spatial_matrix& m, int row, int col, s
     adj_m.data[row][col] += adj_ret;
 }
 
-#ifdef CUDA
 inline __device__ void atomic_add(spatial_matrix* addr, const spatial_matrix& value) 
 {
     for (int i=0; i < 6; ++i)
@@ -679,7 +674,6 @@ inline __device__ void atomic_add(spatial_matrix* addr, const spatial_matrix& va
         }
     }
 }
-#endif
 
 
 CUDA_CALLABLE inline int row_index(int stride, int i, int j)
@@ -839,3 +833,285 @@ CUDA_CALLABLE inline void adj_spatial_mass(
         }
     } 
 }
+
+
+//---------------------------------------------------------------------------------
+// Articulated body algorithm, solves H*qdd = tau with H = J^T*M*J in O(n)
+// using the world space motion subspaces S and body inertias I
+
+// per-link workspace, indexed by the global joint index
+struct aba_link
+{
+    spatial_matrix IA;      // articulated body inertia
+    spatial_matrix D;       // Cholesky factor of S^T*IA*S + armature (dof_count x dof_count)
+    spatial_vector U[6];    // IA*S for each joint dof
+    spatial_vector pA;      // articulated bias force
+    spatial_vector a;       // J*x of the last solve
+    spatial_vector v;       // adjoint only, J*x of the forward solution
+    spatial_vector h;       // adjoint only, subtree momentum of the forward solution
+    spatial_vector g;       // adjoint only, subtree momentum of the adjoint solution
+};
+
+// keep in sync with ABA_LINK_FLOATS in sim.py
+static_assert(sizeof(aba_link) == 138*sizeof(float), "aba_link layout");
+
+
+CUDA_CALLABLE inline void aba_factor(
+    const int* __restrict__ joint_parent,
+    const int* __restrict__ joint_qd_start,
+    const spatial_vector* __restrict__ S,
+    const spatial_matrix* __restrict__ I,
+    const float* __restrict__ armature,
+    int joint_start,
+    int joint_end,
+    aba_link* __restrict__ work)
+{
+    for (int i=joint_start; i < joint_end; ++i)
+        work[i].IA = I[i];
+
+    // leaves to root, children always have a higher index than their parent
+    for (int i=joint_end-1; i >= joint_start; --i)
+    {
+        aba_link& l = work[i];
+
+        const int dof_start = joint_qd_start[i];
+        const int dof_count = joint_qd_start[i+1] - dof_start;
+
+        // fixed joints pass their inertia straight through to the parent
+        spatial_matrix Ia = l.IA;
+
+        if (dof_count > 0)
+        {
+            float Dm[36];
+
+            for (int j=0; j < dof_count; ++j)
+                l.U[j] = mul(l.IA, S[dof_start + j]);
+
+            for (int j=0; j < dof_count; ++j)
+                for (int k=0; k < dof_count; ++k)
+                    Dm[dense_index(dof_count, j, k)] = spatial_dot(S[dof_start + j], l.U[k]);
+
+            dense_chol(dof_count, Dm, armature + dof_start, &l.D.data[0][0]);
+
+            // Ia = IA - U*D^-1*U^T
+            for (int r=0; r < 6; ++r)
+            {
+                float b[6];
+                float w[6];
+
+                for (int j=0; j < dof_count; ++j)
+                    b[j] = l.U[j][r];
+
+                dense_subs(dof_count, &l.D.data[0][0], b, w);
+
+                for (int c=0; c < 6; ++c)
+                    for (int j=0; j < dof_count; ++j)
+                        Ia.data[c][r] -= l.U[j][c]*w[j];
+            }
+        }
+
+        const int parent = joint_parent[i];
+
+        if (parent >= 0)
+            work[parent].IA = add(work[parent].IA, Ia);
+    }
+}
+
+// solves H*x = b using the factorization from aba_factor(), leaves J*x in work[i].a
+CUDA_CALLABLE inline void aba_solve(
+    const int* __restrict__ joint_parent,
+    const int* __restrict__ joint_qd_start,
+    const spatial_vector* __restrict__ S,
+    int joint_start,
+    int joint_end,
+    const float* __restrict__ b,
+    float* __restrict__ x,
+    aba_link* __restrict__ work)
+{
+    for (int i=joint_start; i < joint_end; ++i)
+        work[i].pA = spatial_vector();
+
+    // leaves to root, accumulate bias forces
+    for (int i=joint_end-1; i >= joint_start; --i)
+    {
+        aba_link& l = work[i];
+
+        const int dof_start = joint_qd_start[i];
+        const int dof_count = joint_qd_start[i+1] - dof_start;
+
+        spatial_vector pa = l.pA;
+
+        if (dof_count > 0)
+        {
+            float u[6];
+            float z[6];
+
+            for (int j=0; j < dof_count; ++j)
+                u[j] = b[dof_start + j] - spatial_dot(S[dof_start + j], l.pA);
+
+            dense_subs(dof_count, &l.D.data[0][0], u, z);
+
+            for (int j=0; j < dof_count; ++j)
+                pa = add(pa, mul(l.U[j], z[j]));
+        }
+
+        const int parent = joint_parent[i];
+
+        if (parent >= 0)
+            work[parent].pA = add(work[parent].pA, pa);
+    }
+
+    // root to leaves, propagate accelerations
+    for (int i=joint_start; i < joint_end; ++i)
+    {
+        aba_link& l = work[i];
+
+        const int dof_start = joint_qd_start[i];
+        const int dof_count = joint_qd_start[i+1] - dof_start;
+
+        const int parent = joint_parent[i];
+
+        spatial_vector a;
+
+        if (parent >= 0)
+            a = work[parent].a;
+
+        if (dof_count > 0)
+        {
+            float u[6];
+            float z[6];
+
+            for (int j=0; j < dof_count; ++j)
+                u[j] = b[dof_start + j] - spatial_dot(S[dof_start + j], l.pA) - spatial_dot(l.U[j], a);
+
+            dense_subs(dof_count, &l.D.data[0][0], u, z);
+
+            for (int j=0; j < dof_count; ++j)
+            {
+                x[dof_start + j] = z[j];
+                a = add(a, mul(S[dof_start + j], z[j]));
+            }
+        }
+
+        l.a = a;
+    }
+}
+
+// one thread per-articulation, work holds an aba_link per joint
+CUDA_CALLABLE inline void aba_solve_batched(
+    const int* __restrict__ articulation_start,
+    const int* __restrict__ joint_parent,
+    const int* __restrict__ joint_qd_start,
+    const spatial_vector* __restrict__ S,
+    const spatial_matrix* __restrict__ I,
+    const float* __restrict__ armature,
+    const float* __restrict__ tau,
+    float* __restrict__ tmp,
+    float* __restrict__ work,
+    float* __restrict__ qdd)
+{
+    const int batch = tid();
+
+    const int joint_start = articulation_start[batch];
+    const int joint_end = articulation_start[batch+1];
+
+    aba_link* links = (aba_link*)work;
+
+    aba_factor(joint_parent, joint_qd_start, S, I, armature, joint_start, joint_end, links);
+    aba_solve(joint_parent, joint_qd_start, S, joint_start, joint_end, tau, qdd, links);
+}
+
+// with x = H^-1*tau and y = H^-1*adj_x the adjoints are adj_tau = y, adj_H = -y*x^T,
+// which map back onto the per-body inertias and motion subspaces without forming H:
+//
+//   adj_I_b = -(J_b*y)*(J_b*x)^T
+//   adj_S_c = -(h^x_c*y_c + h^y_c*x_c), h the momentum of the subtree rooted at c's body
+//
+// the factorization is recomputed so the workspace need not be kept between passes,
+// armature is treated as a constant as in the dense path (adj_armature is not allocated)
+CUDA_CALLABLE inline void adj_aba_solve_batched(
+    const int* __restrict__ articulation_start,
+    const int* __restrict__ joint_parent,
+    const int* __restrict__ joint_qd_start,
+    const spatial_vector* __restrict__ S,
+    const spatial_matrix* __restrict__ I,
+    const float* __restrict__ armature,
+    const float* __restrict__ tau,
+    float* __restrict__ tmp,
+    float* __restrict__ work,
+    float* __restrict__ qdd,
+    // adj
+    int* __restrict__ adj_articulation_start,
+    int* __restrict__ adj_joint_parent,
+    int* __restrict__ adj_joint_qd_start,
+    spatial_vector* __restrict__ adj_S,
+    spatial_matrix* __restrict__ adj_I,
+    float* __restrict__ adj_armature,
+    float* __restrict__ adj_tau,
+    float* __restrict__ adj_tmp,
+    float* __restrict__ adj_work,
+    const float* __restrict__ adj_qdd)
+{
+    const int batch = tid();
+
+    const int joint_start = articulation_start[batch];
+    const int joint_end = articulation_start[batch+1];
+
+    aba_link* links = (aba_link*)work;
+
+    aba_factor(joint_parent, joint_qd_start, S, I, armature, joint_start, joint_end, links);
+
+    // y = H^-1*adj_x, leaves J*y in links[i].a
+    aba_solve(joint_parent, joint_qd_start, S, joint_start, joint_end, adj_qdd, tmp, links);
+
+    // J*x of the forward solution
+    for (int i=joint_start; i < joint_end; ++i)
+    {
+        aba_link& l = links[i];
+
+        const int dof_start = joint_qd_start[i];
+        const int dof_count = joint_qd_start[i+1] - dof_start;
+
+        const int parent = joint_parent[i];
+
+        spatial_vector v;
+
+        if (parent >= 0)
+            v = links[parent].v;
+
+        for (int j=0; j < dof_count; ++j)
+            v = add(v, mul(S[dof_start + j], qdd[dof_start + j]));
+
+        l.v = v;
+        l.h = mul(I[i], v);
+        l.g = mul(I[i], l.a);
+
+        adj_I[i] = add(adj_I[i], outer(-l.a, v));
+    }
+
+    // leaves to root, subtree momenta are complete once all children are visited
+    for (int i=joint_end-1; i >= joint_start; --i)
+    {
+        aba_link& l = links[i];
+
+        const int dof_start = joint_qd_start[i];
+        const int dof_count = joint_qd_start[i+1] - dof_start;
+
+        for (int j=0; j < dof_count; ++j)
+        {
+            const int dof = dof_start + j;
+
+            adj_S[dof] = sub(adj_S[dof], add(mul(l.h, tmp[dof]), mul(l.g, qdd[dof])));
+
+            adj_tau[dof] += tmp[dof];
+        }
+
+        const int parent = joint_parent[i];
+
+        if (parent >= 0)
+        {
+            links[parent].h = add(links[parent].h, l.h);
+            links[parent].g = add(links[parent].g, l.g);
+        }
+    }
+}
@@ -182,14 +182,12 @@ inline CUDA_CALLABLE void adj_cross(float3 a, float3 b, float3& adj_a, float3& a
 }
 
 
-#ifdef CUDA
 inline __device__ void atomic_add(float3 * addr, float3 value) {
     // *addr += value;
     atomicAdd(&(addr -> x), value.x);
     atomicAdd(&(addr -> y), value.y);
     atomicAdd(&(addr -> z), value.z);
 }
-#endif
 
 inline CUDA_CALLABLE void adj_length(float3 a, float3& adj_a, const float adj_ret)
 {
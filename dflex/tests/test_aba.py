@@ -0,0 +1,134 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Simulates a chain and a branched tree (with ball joints) using the articulated
+# body algorithm, SemiImplicitIntegrator(dynamics="aba"), and the dense mass
+# matrix solve and checks joint accelerations, states and gradients with respect
+# to the initial state and joint forces match
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dflex as df
+
+device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+num_envs = 3
+steps = 8
+substeps = 4
+dt = (1.0 / 60.0) / substeps
+
+
+def add_body(builder, parent, offset, type, axis=(0.0, 0.0, 1.0)):
+    link = builder.add_link(
+        parent,
+        df.transform(offset, df.quat_identity()),
+        axis,
+        type,
+        armature=0.01,
+        damping=0.1,
+    )
+    builder.add_shape_capsule(
+        link, pos=(0.25, 0.0, 0.0), radius=0.05, half_width=0.2, density=1000.0
+    )
+
+    return link
+
+
+def build_chain(builder):
+    parent = -1
+    for i in range(5):
+        offset = (0.5, 0.0, 0.0) if parent >= 0 else (0.0, 0.0, 0.0)
+        axis = (0.0, 0.0, 1.0) if i % 2 == 0 else (0.0, 1.0, 0.0)
+        parent = add_body(builder, parent, offset, df.JOINT_REVOLUTE, axis)
+
+
+def build_tree(builder):
+    root = add_body(builder, -1, (0.0, 0.0, 0.0), df.JOINT_REVOLUTE)
+
+    for side in (-1.0, 1.0):
+        link = add_body(builder, root, (0.5, 0.2 * side, 0.0), df.JOINT_BALL)
+        link = add_body(builder, link, (0.5, 0.0, 0.0), df.JOINT_REVOLUTE)
+        add_body(builder, link, (0.5, 0.0, 0.0), df.JOINT_REVOLUTE, (0.0, 1.0, 0.0))
+
+    add_body(builder, root, (0.5, 0.0, 0.0), df.JOINT_REVOLUTE, (1.0, 0.0, 0.0))
+
+
+def build_model(build):
+    builder = df.sim.ModelBuilder()
+
+    for i in range(num_envs):
+        builder.add_articulation()
+        build(builder)
+
+    model = builder.finalize(device)
+    model.ground = False
+
+    return model
+
+
+def rollout(model, dynamics, joint_qd, joint_act):
+    integrator = df.sim.SemiImplicitIntegrator(dynamics=dynamics)
+
+    joint_q = model.joint_q.clone().requires_grad_(True)
+    joint_qd = joint_qd.clone().requires_grad_(True)
+    joint_act = joint_act.clone().requires_grad_(True)
+
+    state = model.state()
+    state.joint_q = joint_q
+    state.joint_qd = joint_qd
+
+    qdd = []
+    for i in range(steps):
+        state.joint_act = joint_act[i]
+        state = integrator.forward(model, state, dt, substeps, 1)
+        qdd.append(state.joint_qdd.detach().clone())
+
+    final = torch.cat([state.joint_q, state.joint_qd])
+    (final**2).sum().backward()
+
+    return (
+        torch.stack(qdd),
+        final.detach(),
+        (joint_q.grad, joint_qd.grad, joint_act.grad),
+    )
+
+
+def check(name, build):
+    model = build_model(build)
+
+    joint_qd = torch.randn(model.joint_qd.shape, device=device)
+    joint_act = torch.randn((steps, *model.joint_qd.shape), device=device)
+
+    dense_qdd, dense_final, dense_grads = rollout(model, "dense", joint_qd, joint_act)
+    aba_qdd, aba_final, aba_grads = rollout(model, "aba", joint_qd, joint_act)
+
+    assert torch.isfinite(aba_qdd).all()
+    assert torch.allclose(aba_qdd, dense_qdd, rtol=1e-3, atol=1e-3), name
+    assert torch.allclose(aba_final, dense_final, rtol=1e-3, atol=1e-4), name
+
+    for aba_grad, dense_grad in zip(aba_grads, dense_grads):
+        assert torch.isfinite(aba_grad).all()
+        assert torch.allclose(aba_grad, dense_grad, rtol=1e-2, atol=1e-3), name
+
+
+def test_aba():
+    torch.manual_seed(0)
+
+    check("chain", build_chain)
+    check("tree", build_tree)
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_aba()
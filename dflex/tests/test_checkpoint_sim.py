@@ -0,0 +1,79 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Differentiates the same env rollout with checkpointed steps, which keep only
+# the state in CHECKPOINT_ATTRS and simulate the substeps again in backward, and
+# with every kernel launch recorded, and checks the gradients match
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dflex.envs import AntEnv
+
+device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+num_envs = 4
+steps = 16
+
+
+def rollout(env, checkpoint, actions):
+    env.checkpoint_sim = checkpoint
+    env.reset()
+    env.initialize_trajectory()
+
+    # the initial joint state is checkpointed, so it receives gradients in both modes
+    joint_q = env.state.joint_q.clone().requires_grad_(True)
+    joint_qd = env.state.joint_qd.clone().requires_grad_(True)
+    env.state.joint_q = joint_q
+    env.state.joint_qd = joint_qd
+    env.obs_buf = env.observation_from_state(env.state)
+
+    actions = actions.clone().requires_grad_(True)
+
+    loss = torch.zeros((), device=device)
+    for a in actions:
+        obs, rew, done, info = env.step(a)
+        loss = loss - rew.sum()
+
+    loss.backward()
+
+    return loss.detach(), (joint_q.grad, joint_qd.grad, actions.grad)
+
+
+def test_checkpoint_sim():
+    torch.manual_seed(0)
+
+    env = AntEnv(
+        num_envs=num_envs,
+        device=device,
+        no_grad=False,
+        stochastic_init=False,
+        early_termination=False,
+        MM_caching_frequency=1,
+    )
+
+    actions = torch.rand((steps, num_envs, env.num_actions), device=device) * 2.0 - 1.0
+
+    loss, grads = rollout(env, False, actions)
+    checkpoint_loss, checkpoint_grads = rollout(env, True, actions)
+
+    assert torch.allclose(checkpoint_loss, loss, rtol=1e-5)
+
+    for checkpoint_grad, grad in zip(checkpoint_grads, grads):
+        assert grad.abs().sum() > 0.0
+        assert torch.allclose(checkpoint_grad, grad, rtol=1e-3, atol=1e-4)
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_checkpoint_sim()
@@ -0,0 +1,98 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Simulates the same differentiable ant rollout with and without ground contact
+# compaction (dflex.config.contact_compaction) and checks the contact forces,
+# states and gradients with respect to the actions match
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dflex as df
+from dflex.envs import AntEnv
+
+device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+num_envs = 4
+steps = 32
+
+
+def rollout(env, actions):
+    env.reset()
+    env.initialize_trajectory()
+
+    actions = actions.clone().requires_grad_(True)
+
+    state = env.state
+    contact_forces = []
+    loss = torch.zeros((), device=device)
+
+    for a in actions:
+        env.state = state
+        env.set_act(env.unscale_act(a))
+        state = env.integrator.forward(
+            env.model, state, env.sim_dt, env.sim_substeps, env.MM_caching_frequency
+        )
+
+        contact_forces.append(state.contact_f.clone())
+        loss = loss + (state.joint_qd**2).sum()
+
+    loss.backward()
+
+    return (
+        torch.stack(contact_forces),
+        torch.cat([state.joint_q, state.joint_qd]).detach(),
+        actions.grad,
+    )
+
+
+def test_compaction():
+    torch.manual_seed(0)
+
+    env = AntEnv(
+        num_envs=num_envs,
+        device=device,
+        no_grad=False,
+        stochastic_init=False,
+        early_termination=False,
+        MM_caching_frequency=1,
+    )
+
+    actions = torch.rand((steps, num_envs, env.num_actions), device=device) * 2.0 - 1.0
+
+    compaction = df.config.contact_compaction
+    try:
+        df.config.contact_compaction = False
+        env.integrator.reset_contact_stats()
+        forces, final, grad = rollout(env, actions)
+        total = env.integrator.contact_stats["active"]
+
+        df.config.contact_compaction = True
+        env.integrator.reset_contact_stats()
+        compact_forces, compact_final, compact_grad = rollout(env, actions)
+        active = env.integrator.contact_stats["active"]
+    finally:
+        df.config.contact_compaction = compaction
+
+    # the ant touches the ground, but not with every contact point
+    assert forces.abs().sum() > 0.0
+    assert 0 < active < total
+
+    assert torch.allclose(compact_forces, forces, rtol=1e-5, atol=1e-5)
+    assert torch.allclose(compact_final, final, rtol=1e-5, atol=1e-5)
+    assert torch.allclose(compact_grad, grad, rtol=1e-4, atol=1e-4)
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_compaction()
@@ -0,0 +1,134 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Checks the weighted critic loss on a StackedCriticDataset with non-finite
+# samples and that train_critic fits a critic without non-finite gradients
+# reaching its weights
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+)
+
+from shac.models.critic import CriticMLP
+from shac.utils.critic_trainer import critic_loss, train_critic
+from shac.utils.dataset import StackedCriticDataset
+
+device = "cpu"
+
+steps = 8
+num_envs = 16
+obs_dim = 6
+
+
+def make_data():
+    obs = torch.randn((steps, num_envs, obs_dim), device=device)
+    target_values = obs.sum(dim=-1)
+
+    return obs, target_values
+
+
+def make_critic():
+    critic = CriticMLP(obs_dim, [32, 32], "elu", device=device)
+    optimizer = torch.optim.Adam(critic.parameters(), 2e-3, (0.7, 0.95))
+
+    return critic, optimizer
+
+
+def test_weighted_loss():
+    torch.manual_seed(0)
+
+    obs, target_values = make_data()
+    obs[1, 3, 2] = float("nan")
+    target_values[5, 7] = float("inf")
+
+    valid = torch.isfinite(obs).all(dim=-1) & torch.isfinite(target_values)
+
+    critic, _ = make_critic()
+
+    # 3 minibatches do not divide the 128 samples, the last one is padded
+    dataset = StackedCriticDataset(3, obs, target_values, shuffle=False)
+    assert len(dataset) == 3
+    assert dataset.weights.sum().item() == valid.sum().item()
+
+    with torch.no_grad():
+        losses = [critic_loss(critic, dataset[i]) for i in range(len(dataset))]
+
+        assert all(torch.isfinite(loss) for loss in losses)
+
+        # minibatch losses are means over their valid samples only
+        flat_obs = obs.view(-1, obs_dim)
+        flat_targets = target_values.view(-1)
+        flat_valid = valid.view(-1)
+
+        batch_size = dataset.batch_size
+        for i, loss in enumerate(losses):
+            idx = torch.arange(
+                i * batch_size, min((i + 1) * batch_size, flat_obs.shape[0])
+            )
+            idx = idx[flat_valid[idx]]
+            error = (critic.predict(flat_obs[idx]).squeeze(-1) - flat_targets[idx]) ** 2
+
+            assert torch.allclose(loss, error.mean(), rtol=1e-5, atol=1e-6), i
+
+    print("passed")
+
+
+def test_train_critic():
+    torch.manual_seed(0)
+
+    obs, target_values = make_data()
+    dataset = StackedCriticDataset(4, obs, target_values)
+    critic, optimizer = make_critic()
+
+    with torch.no_grad():
+        initial = sum(critic_loss(critic, dataset[i]) for i in range(len(dataset)))
+        initial = initial.item() / len(dataset)
+
+    loss, epochs = train_critic(critic, optimizer, dataset, 64, grad_norm=1.0)
+
+    assert epochs == 64
+    assert isinstance(loss, float)
+    assert loss < 0.5 * initial
+
+    print("passed")
+
+
+def test_non_finite_grads():
+    torch.manual_seed(0)
+
+    obs, target_values = make_data()
+    dataset = StackedCriticDataset(4, obs, target_values)
+    critic, optimizer = make_critic()
+
+    # gradients of the first layer weights turn NaN, as with an overflow inside the critic
+    weight = critic.critic[0].weight
+    weight.register_hook(lambda grad: torch.full_like(grad, float("nan")))
+
+    before = [p.detach().clone() for p in critic.parameters()]
+
+    train_critic(critic, optimizer, dataset, 4, grad_norm=1.0)
+
+    for p in critic.parameters():
+        assert torch.isfinite(p).all()
+
+    # the NaN gradients are zeroed, the other parameters are still trained
+    assert torch.equal(weight, before[0])
+    assert not torch.equal(critic.critic[-1].weight, before[-2])
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_weighted_loss()
+    test_train_critic()
+    test_non_finite_grads()
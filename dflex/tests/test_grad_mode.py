@@ -0,0 +1,98 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Steps a differentiable training env and a no-grad evaluation env interleaved in
+# the same process and checks each keeps its own gradient mode, see Model.grad_enabled()
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dflex as df
+from dflex.envs import AntEnv
+
+device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+num_envs = 4
+steps = 8
+
+
+def make_env(no_grad):
+    env = AntEnv(
+        num_envs=num_envs,
+        device=device,
+        no_grad=no_grad,
+        early_termination=False,
+        MM_caching_frequency=1,
+    )
+    env.reset()
+
+    return env
+
+
+def rollout_eval(env, actions):
+    obs = []
+    with torch.no_grad():
+        for a in actions:
+            obs.append(env.step(a)[0].clone())
+
+    return obs
+
+
+def test_interleaved():
+    torch.manual_seed(0)
+
+    actions = [
+        torch.rand((num_envs, 8), device=device) * 2.0 - 1.0 for _ in range(steps)
+    ]
+
+    # reference rollout of the eval env on its own
+    reference = rollout_eval(make_env(no_grad=True), actions)
+
+    train_env = make_env(no_grad=False)
+    eval_env = make_env(no_grad=True)
+
+    # constructing either env must not change the global mode
+    assert df.config.no_grad == False
+
+    assert train_env.model.grad_enabled()
+    assert not eval_env.model.grad_enabled()
+
+    train_env.initialize_trajectory()
+    train_actions = [a.clone().requires_grad_(True) for a in actions]
+
+    loss = torch.zeros((), device=device)
+
+    for i in range(steps):
+        obs, rew, done, extras = train_env.step(train_actions[i])
+        loss = loss - rew.sum()
+
+        with torch.no_grad():
+            eval_obs = eval_env.step(actions[i])[0]
+
+        # the training step is recorded, the eval step takes the no-tape path
+        assert obs.grad_fn is not None
+        assert eval_obs.grad_fn is None
+        assert torch.allclose(eval_obs, reference[i], atol=1e-5)
+
+    loss.backward()
+
+    for a in train_actions:
+        assert a.grad is not None
+        assert torch.isfinite(a.grad).all()
+
+    assert train_actions[0].grad.abs().sum() > 0.0
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_interleaved()
@@ -0,0 +1,129 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Checks every row of the dynamics jacobian of DFlexEnv(jacobian=True), which
+# replays the tape of one step once per row, against rows taken from a freshly
+# simulated step each, and that the replays leave the step and its gradients intact
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dflex.envs import HopperEnv
+from dflex.envs.dflex_env import jacobian_input
+
+device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+num_envs = 4
+warmup_steps = 16
+
+
+def make_env(jacobian):
+    env = HopperEnv(
+        num_envs=num_envs,
+        device=device,
+        no_grad=False,
+        stochastic_init=False,
+        early_termination=False,
+        MM_caching_frequency=1,
+        jacobian=jacobian,
+    )
+    env.reset()
+
+    return env
+
+
+def simulate(env, checkpoint, unscaled_actions):
+    """Simulates one step from the checkpoint on a fresh tape"""
+
+    env.clear_grad({k: v.clone() for k, v in checkpoint.items()})
+
+    env.state.joint_q = jacobian_input(env.state.joint_q)
+    env.state.joint_qd = jacobian_input(env.state.joint_qd)
+    unscaled_actions = jacobian_input(unscaled_actions)
+    env.set_act(unscaled_actions)
+
+    next_state = env.integrator.forward(
+        env.model,
+        env.state,
+        env.sim_dt,
+        env.sim_substeps,
+        env.MM_caching_frequency,
+    )
+
+    inputs = (env.state.joint_q, env.state.joint_qd, unscaled_actions)
+
+    return env.observation_from_state(next_state), inputs
+
+
+def test_jacobian():
+    torch.manual_seed(0)
+
+    env = make_env(jacobian=True)
+
+    # settle onto the ground so the step has active contacts
+    with torch.no_grad():
+        for _ in range(warmup_steps):
+            env.step(torch.zeros((num_envs, env.num_actions), device=device))
+
+    env.initialize_trajectory()
+    checkpoint = env.get_checkpoint()
+
+    actions = torch.rand((num_envs, env.num_actions), device=device) * 1.6 - 0.8
+    actions.requires_grad_(True)
+
+    obs, rew, done, extras = env.step(actions)
+    jac = torch.from_numpy(extras["jacobian"]).to(device)
+
+    assert jac.shape == (
+        num_envs,
+        env.num_obs,
+        env.state.joint_q.numel() // num_envs
+        + env.state.joint_qd.numel() // num_envs
+        + env.num_actions,
+    )
+    assert torch.isfinite(jac).all()
+
+    # the training graph of the step is kept and still differentiable
+    obs.sum().backward()
+    act_grad = actions.grad.clone()
+
+    ref = make_env(jacobian=False)
+    unscaled_actions = ref.unscale_act(actions.detach())
+
+    for i in range(env.num_obs):
+        ref_obs, inputs = simulate(ref, checkpoint, unscaled_actions)
+        grads = torch.autograd.grad(ref_obs[:, i].sum(), inputs, allow_unused=True)
+        row = torch.cat(
+            [
+                (torch.zeros_like(x) if g is None else g).view(num_envs, -1)
+                for x, g in zip(inputs, grads)
+            ],
+            dim=1,
+        )
+
+        assert torch.allclose(jac[:, i], row, rtol=1e-3, atol=1e-4), i
+
+    # replaying the tape once per row must not change the simulated step
+    assert torch.allclose(obs.detach(), ref_obs.detach(), atol=1e-6)
+
+    # nor the gradient of the training backward pass afterwards
+    ref_actions = actions.detach().clone().requires_grad_(True)
+    ref_obs, _ = simulate(ref, checkpoint, ref.unscale_act(ref_actions))
+    ref_obs.sum().backward()
+
+    assert torch.allclose(act_grad, ref_actions.grad, rtol=1e-3, atol=1e-4)
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_jacobian()
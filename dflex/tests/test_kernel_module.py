@@ -0,0 +1,54 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Generates the module source of every simulation kernel and checks it contains
+# exactly the user functions the kernel calls, directly or through other user
+# functions, rather than every registered user function
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dflex as df
+from dflex import adjoint
+
+
+def defines(source, name):
+    return "void adj_{}_cpu_func(".format(name) in source
+
+
+def test_kernel_module_functions():
+    kernels = list(adjoint.user_kernels.values())
+    assert len(kernels) > 0
+
+    smaller = 0
+
+    for k in kernels:
+        k.prepare()
+
+        used = adjoint.referenced_functions(k.func)
+
+        for name in adjoint.user_funcs:
+            assert defines(k.cpp_source, name) == (name in used), (k.func.__name__, name)
+
+        # callees of the emitted functions are emitted before their callers
+        for i, name in enumerate(used):
+            for callee in adjoint.referenced_functions(adjoint.user_funcs[name]):
+                assert callee in used[:i], (k.func.__name__, name, callee)
+
+        if len(used) < len(adjoint.user_funcs):
+            smaller += 1
+
+    assert smaller > 0
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_kernel_module_functions()
@@ -0,0 +1,147 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+# Trains SHAC on the cart pole without interruption and again resumed from a
+# periodic checkpoint of the first run, the final training state must match exactly
+
+import tempfile
+
+import torch
+
+# include parent path
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+)
+
+from omegaconf import OmegaConf
+
+from shac.algorithms.shac import SHAC
+from shac.utils.checkpoint import periodic_checkpoints
+from shac.utils.common import seeding
+
+device = "cpu"
+
+max_epochs = 6
+save_interval = 3
+
+
+def make_shac(logdir, seed=0, resume=False):
+    seeding(seed, torch_deterministic=True)
+
+    env_config = OmegaConf.create(
+        {
+            "_target_": "dflex.envs.CartPoleSwingUpEnv",
+            "render": False,
+            "device": device,
+            "num_envs": 16,
+            "episode_length": 24,
+            "no_grad": False,
+            "stochastic_init": True,
+            "MM_caching_frequency": 4,
+            "early_termination": False,
+        }
+    )
+    actor_config = OmegaConf.create(
+        {
+            "_target_": "shac.models.actor.ActorStochasticMLP",
+            "units": [32, 32],
+            "activation": "elu",
+        }
+    )
+    critic_config = OmegaConf.create(
+        {
+            "_target_": "shac.models.critic.CriticMLP",
+            "units": [32, 32],
+            "activation": "elu",
+        }
+    )
+
+    return SHAC(
+        env_config,
+        actor_config,
+        critic_config,
+        steps_num=8,
+        max_epochs=max_epochs,
+        train=True,
+        logdir=logdir,
+        obs_rms=True,
+        critic_iterations=4,
+        critic_method="td-lambda",
+        target_critic_alpha=0.2,
+        save_interval=save_interval,
+        eval_runs=2,
+        resume=resume,
+        device=device,
+    )
+
+
+def training_state(algo):
+    state = {}
+    for name in ("actor", "critic", "target_critic"):
+        for k, v in getattr(algo, name).state_dict().items():
+            state[name + "." + k] = v.clone()
+
+    state["obs_rms.mean"] = algo.obs_rms.mean.clone()
+    state["obs_rms.var"] = algo.obs_rms.var.clone()
+    state["env.joint_q"] = algo.env.state.joint_q.detach().clone()
+    state["env.joint_qd"] = algo.env.state.joint_qd.detach().clone()
+
+    return state
+
+
+def test_resume():
+    with tempfile.TemporaryDirectory() as root:
+        full = make_shac(os.path.join(root, "full"))
+        full.train()
+        expected = training_state(full)
+        expected_counts = (full.iter_count, full.step_count)
+
+        checkpoints = periodic_checkpoints(os.path.join(root, "full"))
+        assert len(checkpoints) == max_epochs // save_interval
+
+        resumed = make_shac(os.path.join(root, "resumed"))
+        resumed.load(checkpoints[0])
+        assert resumed.iter_count == save_interval
+
+        resumed.train()
+        result = training_state(resumed)
+
+        assert (resumed.iter_count, resumed.step_count) == expected_counts
+
+        for name, value in expected.items():
+            assert torch.equal(value, result[name]), name
+
+    print("passed")
+
+
+def test_resume_keeps_init_policy():
+    with tempfile.TemporaryDirectory() as logdir:
+        full = make_shac(logdir)
+        full.train()
+
+        init_policy = os.path.join(logdir, "init_policy.pt")
+        with open(init_policy, "rb") as f:
+            expected = f.read()
+
+        # a different seed, so a fresh initialization would not match the saved one
+        resumed = make_shac(logdir, seed=1, resume=True)
+        resumed.load(periodic_checkpoints(logdir)[-1])
+        resumed.close()
+
+        with open(init_policy, "rb") as f:
+            assert f.read() == expected
+
+    print("passed")
+
+
+if __name__ == "__main__":
+    test_resume()
+    test_resume_keeps_init_policy()
@@ -5,6 +5,7 @@ from hydra.core.hydra_config import HydraConfig
 from shac.utils import hydra_utils
 from hydra.utils import instantiate
 from shac.utils.common import *
+from shac.utils.checkpoint import periodic_checkpoints
 from shac.utils.rlgames_utils import (
     RLGPUEnvAlgoObserver,
     RLGPUEnv,
@@ -133,10 +134,24 @@ def train(cfg: DictConfig):
     if "_target_" in cfg.alg:
         cfg.env.config.no_grad = not cfg.general.train
 
-        algo = instantiate(cfg.alg, env_config=cfg.env.config, logdir=logdir)
+        kwargs = {}
+        # resumed runs keep writing to the log directory of the run they continue
+        if cfg.general.resume:
+            logdir = cfg.general.resume
+            kwargs["resume"] = True
 
-        if cfg.general.checkpoint:
-            algo.load(cfg.general.checkpoint)
+        algo = instantiate(cfg.alg, env_config=cfg.env.config, logdir=logdir, **kwargs)
+
+        checkpoint = cfg.general.checkpoint
+        if cfg.general.resume:
+            periodic = periodic_checkpoints(logdir)
+            if periodic:
+                checkpoint = periodic[-1]
+            else:
+                print_warning("No checkpoint to resume from in", logdir)
+
+        if checkpoint:
+            algo.load(checkpoint)
 
         if cfg.general.train:
             algo.train()
@@ -26,17 +26,44 @@ from tensorboardX import SummaryWriter
 from omegaconf import DictConfig
 from hydra.utils import instantiate
 from typing import Optional, List, Tuple
-from collections import deque
 
 from shac.utils.common import *
 import shac.utils.torch_utils as tu
 from shac.utils.running_mean_std import RunningMeanStd
-from shac.utils.dataset import CriticDataset
+from shac.utils.dataset import StackedCriticDataset
+from shac.utils.critic_trainer import train_critic
+from shac.utils.evaluator import PolicyEvaluationMixin
+from shac.utils.checkpoint import (
+    CheckpointWriter,
+    CHECKPOINT_VERSION,
+    rng_state,
+    set_rng_state,
+)
+from shac.utils.sim_memory import SimStateMemory
 from shac.utils.time_report import TimeReport
 from shac.utils.average_meter import AverageMeter
 
 
-class AHAC:
+class AHAC(PolicyEvaluationMixin):
+    # per-env episode accumulators, histories and counters carried across epochs,
+    # saved with every checkpoint so a resumed run continues exactly, see resume_dict()
+    EPISODE_ATTRS = (
+        "episode_loss",
+        "episode_discounted_loss",
+        "episode_length",
+        "episode_gamma",
+    )
+    HISTORY_ATTRS = ("episode_loss_his", "episode_discounted_loss_his", "episode_length_his")
+    RESUME_COUNTERS = (
+        "early_termination",
+        "episode_end",
+        "contact_trunc",
+        "horizon_trunc",
+        "last_steps",
+        "last_log_steps",
+        "episode",
+    )
+
     def __init__(
         self,
         env_config: DictConfig,
@@ -65,10 +92,16 @@ class AHAC:
         critic_batches: int = 4,
         critic_method: str = "one-step",
         save_interval: int = 500,  # how often to save policy
+        keep_checkpoints: int = 5,  # periodic checkpoints kept on disk, best/init/final are always kept
+        resume: bool = False,  # continues the run in logdir, whose init_policy is kept
         stochastic_eval: bool = False,  # Whether to use stochastic actor in eval
         score_keys: List[str] = [],
         eval_runs: int = 12,
+        eval_interval: int = 0,  # evaluate on a separate no-grad env every n epochs, 0 disables
+        eval_envs: Optional[int] = None,  # size of the eval env, defaults to eval_runs
         log_jacobians: bool = False,  # expensive and messes up wandb
+        checkpoint_sim: bool = False,  # re-simulate steps in backward to save memory
+        count_syncs: bool = False,  # log device->host syncs of the rollout (CUDA only)
         device: str = "cuda",
     ):
         # sanity check parameters
@@ -86,9 +119,11 @@ class AHAC:
         assert critic_method in ["one-step", "td-lambda"]
         assert save_interval > 0
         assert eval_runs >= 0
+        assert eval_interval >= 0
 
         # Create environment
         self.env = instantiate(env_config, logdir=logdir)
+        self.env_config = env_config
         print("num_envs = ", self.env.num_envs)
         print("num_actions = ", self.env.num_actions)
         print("num_obs = ", self.env.num_obs)
@@ -99,6 +134,11 @@ class AHAC:
         self.max_episode_length = self.env.episode_length
         self.device = torch.device(device)
 
+        # only keep joint states between steps and re-simulate them in backward
+        self.env.checkpoint_sim = checkpoint_sim
+
+        self.sim_memory = SimStateMemory(self.env)
+
         self.steps_min = steps_min
         self.steps_max = steps_max
         self.H = torch.tensor(steps_min, dtype=torch.float32, device=self.device)
@@ -138,6 +178,7 @@ class AHAC:
             self.log_dir = logdir
             os.makedirs(self.log_dir, exist_ok=True)
             self.writer = SummaryWriter(os.path.join(self.log_dir, "log"))
+            self.checkpoints = CheckpointWriter(self.log_dir, keep_checkpoints)
 
         # Create actor and critic
         self.actor = instantiate(
@@ -164,9 +205,6 @@ class AHAC:
         self.episode_ends = []
         self.episode = 0
 
-        if train:
-            self.save("init_policy")
-
         # initialize optimizers
         self.actor_optimizer = torch.optim.Adam(
             self.actor.parameters(),
@@ -177,6 +215,7 @@ class AHAC:
             self.critic.parameters(),
             self.critic_lr,
             betas,
+            foreach=True,
         )
         self.lambd_lr = lambd_lr
 
@@ -215,6 +254,10 @@ class AHAC:
         self.acc_jacobians = accumulate_jacobians
         self.log_jacobians = log_jacobians
         self.eval_runs = eval_runs
+        self.eval_interval = eval_interval
+        self.eval_envs = eval_envs
+        self.evaluator = None  # created on first use, see make_evaluator()
+        self.resume_state = None  # env, episode and RNG state applied when train() starts
         self.last_steps = 0
         self.last_log_steps = 0
 
@@ -231,6 +274,11 @@ class AHAC:
 
         # timer
         self.time_report = TimeReport()
+        self.sync_counter = tu.SyncCounter(self.device, enabled=count_syncs)
+
+        # only a fresh run saves its initialization, a resumed one keeps the original
+        if train and not resume:
+            self.save("init_policy")
 
     @property
     def mean_horizon(self):
@@ -269,8 +317,25 @@ class AHAC:
 
         # keeps track of the current length of the rollout
         rollout_len = torch.zeros((self.num_envs,), device=self.device)
+
+        # H is a tensor, read it once rather than on every step
+        steps_num = self.steps_num
+
+        # bookkeeping stays on device during the rollout and is flushed once at the end
+        early_terms = []
+        episode_ends = []
+        done_masks = []
+        done_episode_loss = []
+        done_episode_discounted_loss = []
+        done_episode_length = []
+        term_count = torch.zeros((), dtype=torch.int64, device=self.device)
+        trunc_count = torch.zeros((), dtype=torch.int64, device=self.device)
+        inf_obs = torch.zeros((), dtype=torch.bool, device=self.device)
+        value_error = torch.zeros((), dtype=torch.bool, device=self.device)
+        loss_error = torch.zeros((), dtype=torch.bool, device=self.device)
+
         # Start short horizon rollout
-        for i in range(self.steps_num):
+        for i in range(steps_num):
             # collect data for critic training
             with torch.no_grad():
                 self.obs_buf[i] = obs.clone()
@@ -310,8 +375,9 @@ class AHAC:
             # uses contact forces since they are always available
             cfs = info["contact_forces"]
             acc = info["accelerations"]
-            acc[acc >= 0] = torch.maximum(acc[acc>=0], torch.ones_like(acc[acc>=0]))
-            acc[acc < 0] = torch.maximum(acc[acc<0], torch.ones_like(acc[acc<0]))
+            # same as clamping the positive and negative entries to >= 1 separately,
+            # without the two boolean mask indexings that sync with the host
+            acc.clamp_(min=1.0)
             # cfs_normalised = torch.where(acc != 0.0, cfs / acc, torch.zeros_like(cfs))
             cfs_normalised = cfs / acc
             self.cfs[i] = torch.norm(cfs_normalised, dim=(1, 2))
@@ -327,67 +393,50 @@ class AHAC:
 
             real_obs = info["obs_before_reset"]
             # sanity check
-            if (~torch.isfinite(real_obs)).sum() > 0:
-                print_warning("Got inf obs")
-                # raise ValueError # it's ok to have this for humanoid
+            with torch.no_grad():
+                inf_obs |= (~torch.isfinite(real_obs)).any()
 
             if self.obs_rms is not None:
                 real_obs = obs_rms.normalize(real_obs)
 
-            next_values[i + 1] = self.critic(real_obs).squeeze(-1)
-
             # handle terminated environments which stopped for some bad reason
             # since the reason is bad we set their value to 0
-            term_env_ids = term.nonzero(as_tuple=False).squeeze(-1)
-            for id in term_env_ids:
-                next_values[i + 1, id] = 0.0
+            next_values[i + 1] = self.critic(real_obs).squeeze(-1).masked_fill(term, 0.0)
 
             # sanity check
-            if (next_values > 1e6).sum() > 0 or (next_values < -1e6).sum() > 0:
-                print_error("next value error")
-                raise ValueError
+            with torch.no_grad():
+                value_error |= (next_values[i + 1].abs() > 1e6).any()
 
             rew_acc[i + 1, :] = rew_acc[i, :] + gamma * rew
 
-            self.early_terms.append(torch.all(term).item())
-            self.horizon_truncs.append(i == self.steps_num - 1)
-            self.episode_ends.append(torch.all(trunc).item())
+            early_terms.append(torch.all(term))
+            self.horizon_truncs.append(i == steps_num - 1)
+            episode_ends.append(torch.all(trunc))
 
             done = term | trunc
-            done_env_ids = done.nonzero(as_tuple=False).squeeze(-1)
-
-            self.early_termination += torch.sum(term).item()
-            self.episode_end += torch.sum(trunc).item()
-
-            if i < self.steps_num - 1:
-                # first terminate all rollouts which are 'done'
-                retrn = (
-                    -rew_acc[i + 1, done_env_ids]
-                    - self.gamma
-                    * gamma[done_env_ids]
-                    * next_values[i + 1, done_env_ids]
-                )
-                actor_loss += retrn.sum()
-                with torch.no_grad():
-                    self.ret[done_env_ids] += retrn
-            else:
-                # terminate all envs because we reached the end of our rollout
-                retrn = -rew_acc[i + 1, :] - self.gamma * gamma * next_values[i + 1, :]
-                actor_loss += retrn.sum()
-                with torch.no_grad():
-                    self.ret += retrn
+
+            term_count += term.sum()
+            trunc_count += trunc.sum()
+
+            # terminate all rollouts which are 'done', or all of them at the end of our rollout
+            retrn = -rew_acc[i + 1, :] - self.gamma * gamma * next_values[i + 1, :]
+            if i < steps_num - 1:
+                retrn = torch.where(done, retrn, torch.zeros_like(retrn))
+            actor_loss += retrn.sum()
+            with torch.no_grad():
+                self.ret += retrn
 
             # compute gamma for next step
             gamma = gamma * self.gamma
 
             # clear up gamma and rew_acc for done envs
-            gamma[done_env_ids] = 1.0
-            rew_acc[i + 1, done_env_ids] = 0.0
+            gamma = gamma.masked_fill(done, 1.0)
+            rew_acc[i + 1, :] = rew_acc[i + 1, :].masked_fill(done, 0.0)
 
             # collect data for critic training
             with torch.no_grad():
                 self.rew_buf[i] = rew.clone()
-                if i < self.steps_num - 1:
+                if i < steps_num - 1:
                     self.done_mask[i] = done.clone().to(torch.float32)
                 else:
                     self.done_mask[i, :] = 1.0
@@ -398,43 +447,101 @@ class AHAC:
                 self.episode_loss -= raw_rew
                 self.episode_discounted_loss -= self.episode_gamma * raw_rew
                 self.episode_gamma *= self.gamma
-                if len(done_env_ids) > 0:
-                    self.episode_loss_meter.update(self.episode_loss[done_env_ids])
-                    self.episode_discounted_loss_meter.update(
-                        self.episode_discounted_loss[done_env_ids]
-                    )
-                    self.episode_length_meter.update(self.episode_length[done_env_ids])
-                    self.horizon_length_meter.update(rollout_len[done_env_ids])
-                    rollout_len[done_env_ids] = 0
-                    for k, v in filter(lambda x: x[0] in self.score_keys, info.items()):
-                        self.episode_scores_meter_map[k + "_final"].update(
-                            v[done_env_ids]
-                        )
-                    for id in done_env_ids:
-                        if self.episode_loss[id] > 1e6 or self.episode_loss[id] < -1e6:
-                            print_error("ep loss error")
-                            raise ValueError
-
-                        self.episode_loss_his.append(self.episode_loss[id].item())
-                        self.episode_discounted_loss_his.append(
-                            self.episode_discounted_loss[id].item()
-                        )
-                        self.episode_length_his.append(self.episode_length[id].item())
-                        self.episode_loss[id] = 0.0
-                        self.episode_discounted_loss[id] = 0.0
-                        self.episode_length[id] = 0
-                        self.episode_gamma[id] = 1.0
+
+                self.episode_loss_meter.update_masked(self.episode_loss, done)
+                self.episode_discounted_loss_meter.update_masked(
+                    self.episode_discounted_loss, done
+                )
+                self.episode_length_meter.update_masked(self.episode_length, done)
+                self.horizon_length_meter.update_masked(rollout_len, done)
+                rollout_len.masked_fill_(done, 0)
+                for k, v in filter(lambda x: x[0] in self.score_keys, info.items()):
+                    self.episode_scores_meter_map[k + "_final"].update_masked(v, done)
+
+                loss_error |= (done & (self.episode_loss.abs() > 1e6)).any()
+
+                done_masks.append(done)
+                done_episode_loss.append(self.episode_loss.clone())
+                done_episode_discounted_loss.append(
+                    self.episode_discounted_loss.clone()
+                )
+                done_episode_length.append(self.episode_length.clone())
+
+                self.episode_loss.masked_fill_(done, 0.0)
+                self.episode_discounted_loss.masked_fill_(done, 0.0)
+                self.episode_length.masked_fill_(done, 0)
+                self.episode_gamma.masked_fill_(done, 1.0)
 
         self.horizon_length_meter.update(rollout_len)
 
-        actor_loss /= self.steps_num * self.num_envs
+        actor_loss /= steps_num * self.num_envs
 
         if self.ret_rms is not None:
             actor_loss = actor_loss * torch.sqrt(ret_var + 1e-6)
 
-        self.actor_loss = actor_loss.detach().item()
+        # flush the rollout bookkeeping with a single transfer
+        with torch.no_grad():
+            flags = torch.stack(
+                [
+                    actor_loss.detach().double(),
+                    term_count.double(),
+                    trunc_count.double(),
+                    inf_obs.double(),
+                    value_error.double(),
+                    loss_error.double(),
+                ]
+            )
+            packed = [
+                flags,
+                torch.stack(early_terms),
+                torch.stack(episode_ends),
+                torch.stack(done_masks),
+                torch.stack(done_episode_loss),
+                torch.stack(done_episode_discounted_loss),
+                torch.stack(done_episode_length),
+            ]
+            sizes = [t.numel() for t in packed]
+            packed = torch.cat([t.double().flatten() for t in packed]).cpu()
+
+        (
+            flags,
+            early_terms,
+            episode_ends,
+            done_masks,
+            done_episode_loss,
+            done_episode_discounted_loss,
+            done_episode_length,
+        ) = torch.split(packed, sizes)
+
+        actor_loss_value, term_count, trunc_count, inf_obs, value_error, loss_error = (
+            flags.tolist()
+        )
+        done_masks = done_masks.bool()
+
+        if inf_obs:
+            print_warning("Got inf obs")
+            # raise ValueError # it's ok to have this for humanoid
+
+        if value_error:
+            print_error("next value error")
+            raise ValueError
+
+        if loss_error:
+            print_error("ep loss error")
+            raise ValueError
+
+        self.actor_loss = actor_loss_value
+        self.early_termination += int(term_count)
+        self.episode_end += int(trunc_count)
+        self.early_terms.extend(early_terms.bool().tolist())
+        self.episode_ends.extend(episode_ends.bool().tolist())
+        self.episode_loss_his.extend(done_episode_loss[done_masks].float().tolist())
+        self.episode_discounted_loss_his.extend(
+            done_episode_discounted_loss[done_masks].float().tolist()
+        )
+        self.episode_length_his.extend(done_episode_length[done_masks].int().tolist())
 
-        self.step_count += self.steps_num * self.num_envs
+        self.step_count += steps_num * self.num_envs
 
         if (
             self.log_jacobians
@@ -455,118 +562,26 @@ class AHAC:
 
         return actor_loss
 
-    @torch.no_grad()
-    def evaluate_policy(self, num_games, deterministic=False):
-        episode_length_his = []
-        episode_loss_his = []
-        episode_discounted_loss_his = []
-        episode_loss = torch.zeros(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-        episode_length = torch.zeros(self.num_envs, dtype=int)
-        episode_gamma = torch.ones(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-        episode_discounted_loss = torch.zeros(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-
-        obs = self.env.reset()
-
-        games_cnt = 0
-        while games_cnt < num_games:
-            if self.obs_rms is not None:
-                obs = self.obs_rms.normalize(obs)
-
-            actions = self.actor(obs, deterministic=deterministic)
-
-            obs, rew, done, _ = self.env.step(torch.tanh(actions))
-
-            episode_length += 1
-
-            done_env_ids = done.nonzero(as_tuple=False).squeeze(-1)
-
-            episode_loss -= rew
-            episode_discounted_loss -= episode_gamma * rew
-            episode_gamma *= self.gamma
-            if len(done_env_ids) > 0:
-                for done_env_id in done_env_ids:
-                    print(
-                        "loss = {:.2f}, len = {}".format(
-                            episode_loss[done_env_id].item(),
-                            episode_length[done_env_id],
-                        )
-                    )
-                    episode_loss_his.append(episode_loss[done_env_id].item())
-                    episode_discounted_loss_his.append(
-                        episode_discounted_loss[done_env_id].item()
-                    )
-                    episode_length_his.append(episode_length[done_env_id].item())
-                    episode_loss[done_env_id] = 0.0
-                    episode_discounted_loss[done_env_id] = 0.0
-                    episode_length[done_env_id] = 0
-                    episode_gamma[done_env_id] = 1.0
-                    games_cnt += 1
-
-        mean_episode_length = np.mean(np.array(episode_length_his))
-        mean_policy_loss = np.mean(np.array(episode_loss_his))
-        mean_policy_discounted_loss = np.mean(np.array(episode_discounted_loss_his))
-
-        return mean_policy_loss, mean_policy_discounted_loss, mean_episode_length
-
     @torch.no_grad()
     def compute_target_values(self):
         if self.critic_method == "one-step":
             self.target_values = self.rew_buf + self.gamma * self.next_values
         elif self.critic_method == "td-lambda":
-            Ai = torch.zeros(self.num_envs, dtype=torch.float32, device=self.device)
-            Bi = torch.zeros(self.num_envs, dtype=torch.float32, device=self.device)
-            lam = torch.ones(self.num_envs, dtype=torch.float32, device=self.device)
-            for i in reversed(range(self.steps_num)):
-                lam = lam * self.lam * (1.0 - self.done_mask[i]) + self.done_mask[i]
-                Ai = (1.0 - self.done_mask[i]) * (
-                    self.lam * self.gamma * Ai
-                    + self.gamma * self.next_values[i]
-                    + (1.0 - lam) / (1.0 - self.lam) * self.rew_buf[i]
-                )
-                Bi = (
-                    self.gamma
-                    * (
-                        self.next_values[i] * self.done_mask[i]
-                        + Bi * (1.0 - self.done_mask[i])
-                    )
-                    + self.rew_buf[i]
-                )
-                self.target_values[i] = (1.0 - self.lam) * Ai + lam * Bi
+            steps = self.steps_num
+            self.target_values[:steps] = tu.td_lambda_targets(
+                self.rew_buf[:steps],
+                self.next_values[:steps],
+                self.done_mask[:steps],
+                self.gamma,
+                self.lam,
+            )
         else:
             raise NotImplementedError
 
-    def compute_critic_loss(self, batch_sample):
-        predicted_values = self.critic.predict(batch_sample["obs"]).squeeze(-2)
-        target_values = batch_sample["target_values"]
-        critic_loss = ((predicted_values - target_values) ** 2).mean()
-
-        return critic_loss
-
     def initialize_env(self):
         self.env.clear_grad()
         self.env.reset()
 
-    @torch.no_grad()
-    def run(self, num_games):
-        (
-            mean_policy_loss,
-            mean_policy_discounted_loss,
-            mean_episode_length,
-        ) = self.evaluate_policy(
-            num_games=num_games, deterministic=not self.stochastic_evaluation
-        )
-        print_info(
-            "mean episode loss = {}, mean discounted loss = {}, mean episode length = {}".format(
-                mean_policy_loss, mean_policy_discounted_loss, mean_episode_length
-            )
-        )
-
     def train(self):
         self.start_time = time.time()
 
@@ -596,13 +611,21 @@ class AHAC:
             self.num_envs, dtype=torch.float32, device=self.device
         )
 
+        # continue the rollout of a resumed run where its checkpoint was taken
+        if self.resume_state is not None:
+            self.restore_rollout(self.resume_state)
+            self.resume_state = None
+
         def actor_closure():
             self.actor_optimizer.zero_grad()
 
+            self.sim_memory.reset_peak()
+
             self.time_report.start_timer("compute actor loss")
 
             self.time_report.start_timer("forward simulation")
-            actor_loss = self.compute_actor_loss()
+            with self.sync_counter:
+                actor_loss = self.compute_actor_loss()
             self.time_report.end_timer("forward simulation")
 
             self.time_report.start_timer("backward simulation")
@@ -628,7 +651,8 @@ class AHAC:
             return actor_loss
 
         # main training process
-        for epoch in range(self.max_epochs):
+        # resumed runs continue from the epoch of the loaded checkpoint
+        for epoch in range(self.iter_count, self.max_epochs):
             time_start_epoch = time.time()
 
             # learning rate schedule
@@ -660,59 +684,26 @@ class AHAC:
             self.time_report.start_timer("prepare critic dataset")
             with torch.no_grad():
                 self.compute_target_values()
-                critic_batch_size = (
-                    self.num_envs * self.steps_num // self.critic_batches
-                )
-
-                dataset = CriticDataset(
-                    critic_batch_size,
+                dataset = StackedCriticDataset(
+                    self.critic_batches,
                     self.obs_buf,
                     self.target_values,
-                    drop_last=False,
                 )
             self.time_report.end_timer("prepare critic dataset")
 
             self.time_report.start_timer("critic training")
-            self.value_loss = 0.0
-            last_losses = deque(maxlen=5)
-            iterations = self.critic_iterations if self.critic_iterations else 64
-            for j in range(iterations):
-                total_critic_loss = 0.0
-                batch_cnt = 0
-                for i in range(len(dataset)):
-                    batch_sample = dataset[i]
-                    self.critic_optimizer.zero_grad()
-                    training_critic_loss = self.compute_critic_loss(batch_sample)
-                    training_critic_loss.backward()
-
-                    # ugly fix for simulation nan problem
-                    for params in self.critic.parameters():
-                        params.grad.nan_to_num_(0.0, 0.0, 0.0)
-
-                    if self.critic_grad_norm:
-                        clip_grad_norm_(self.critic.parameters(), self.critic_grad_norm)
-
-                    self.critic_optimizer.step()
-
-                    total_critic_loss += training_critic_loss
-                    batch_cnt += 1
-
-                total_critic_loss /= batch_cnt
-                if self.critic_iterations is None and len(last_losses) == 5:
-                    diff = abs(np.diff(last_losses).mean())
-                    if diff < 2e-1:
-                        iterations = j + 1
-                        break
-                last_losses.append(total_critic_loss.item())
-
-                self.value_loss = total_critic_loss
-                print(
-                    "value iter {}/{}, loss = {:7.6f}".format(
-                        j + 1, iterations, self.value_loss
-                    ),
-                    end="\r",
-                )
-
+            self.value_loss, iterations = train_critic(
+                self.critic,
+                self.critic_optimizer,
+                dataset,
+                self.critic_iterations if self.critic_iterations else 64,
+                grad_norm=self.critic_grad_norm,
+                early_stop=self.critic_iterations is None,
+            )
+            print(
+                "value iters {}, loss = {:7.6f}".format(iterations, self.value_loss),
+                end="\r",
+            )
             self.time_report.end_timer("critic training")
 
             last_steps = self.steps_num
@@ -738,7 +729,10 @@ class AHAC:
             self.log_scalar("value_loss", self.value_loss)
             self.log_scalar("rollout_len", self.mean_horizon)
             self.log_scalar("fps", fps)
+            self.sim_memory.log(self.log_scalar)
             self.log_scalar("critic_iterations", iterations)
+            if self.sync_counter.enabled:
+                self.log_scalar("rollout_syncs", self.sync_counter.reset())
 
             if len(self.episode_loss_his) > 0:
                 mean_episode_length = self.episode_length_meter.get_mean()
@@ -805,6 +799,13 @@ class AHAC:
                 )
             )
 
+            if self.eval_interval > 0 and self.iter_count % self.eval_interval == 0:
+                self.log_evaluation(
+                    self.evaluate_policy(
+                        self.eval_runs, deterministic=not self.stochastic_evaluation
+                    )
+                )
+
             self.writer.flush()
 
             if self.save_interval > 0 and (self.iter_count % self.save_interval == 0):
@@ -812,7 +813,8 @@ class AHAC:
                     self.name
                     + "policy_iter{}_reward{:.3f}".format(
                         self.iter_count, -mean_policy_loss
-                    )
+                    ),
+                    periodic=True,
                 )
 
         self.time_report.end_timer("algorithm")
@@ -866,17 +868,122 @@ class AHAC:
             )
             self.lambd = self.lambd[0].repeat(self.steps_num)
 
-    def save(self, filename=None):
+    def save(self, filename=None, periodic=False):
         if filename is None:
             filename = "best_policy"
-        torch.save(
-            [self.actor, self.critic, self.obs_rms, self.ret_rms],
-            os.path.join(self.log_dir, "{}.pt".format(filename)),
+        self.checkpoints.save(filename, self.state_dict(), periodic=periodic)
+
+    def state_dict(self):
+        """Training state written by save(), restored by load()"""
+
+        return {
+            "version": CHECKPOINT_VERSION,
+            "actor": self.actor.state_dict(),
+            "critic": self.critic.state_dict(),
+            "obs_rms": self.obs_rms.state_dict() if self.obs_rms is not None else None,
+            "ret_rms": self.ret_rms.state_dict() if self.ret_rms is not None else None,
+            "actor_optimizer": self.actor_optimizer.state_dict(),
+            "critic_optimizer": self.critic_optimizer.state_dict(),
+            "iter_count": self.iter_count,
+            "step_count": self.step_count,
+            "best_policy_loss": float(self.best_policy_loss),
+            "resume": self.resume_dict(),
+            "H": self.H,
+            "lambd": self.lambd,
+        }
+
+    def load_state_dict(self, state, actor=True):
+        if actor:
+            self.actor.load_state_dict(state["actor"])
+        self.critic.load_state_dict(state["critic"])
+
+        for name, shape in (("obs_rms", self.num_obs), ("ret_rms", ())):
+            rms = None
+            if state[name] is not None:
+                rms = RunningMeanStd(shape=shape, device=self.device)
+                rms.load_state_dict(state[name])
+            setattr(self, name, rms)
+
+        # only full resumes restore the optimizers and counters
+        if not actor:
+            return
+
+        self.actor_optimizer.load_state_dict(state["actor_optimizer"])
+        self.critic_optimizer.load_state_dict(state["critic_optimizer"])
+        self.iter_count = state["iter_count"]
+        self.step_count = state["step_count"]
+        self.best_policy_loss = state["best_policy_loss"]
+        self.H = state["H"].to(self.device)
+        self.lambd = state["lambd"].to(self.device)
+        self.init_buffers()
+
+        if "resume" in state:
+            self.load_resume_dict(state["resume"])
+
+    def meters(self):
+        meters = {
+            "episode_loss": self.episode_loss_meter,
+            "episode_discounted_loss": self.episode_discounted_loss_meter,
+            "episode_length": self.episode_length_meter,
+            "horizon_length": self.horizon_length_meter,
+        }
+        meters.update(self.episode_scores_meter_map)
+
+        return meters
+
+    def resume_dict(self):
+        """Rollout state needed to continue training exactly where save() was called"""
+
+        return {
+            "env": self.env.get_checkpoint(),
+            "episode": {name: getattr(self, name, None) for name in self.EPISODE_ATTRS},
+            "history": {name: getattr(self, name) for name in self.HISTORY_ATTRS},
+            "counters": {name: getattr(self, name) for name in self.RESUME_COUNTERS},
+            "meters": {
+                name: {"mean": meter.mean, "size": meter.current_size}
+                for name, meter in self.meters().items()
+            },
+            "rng": rng_state(),
+        }
+
+    def load_resume_dict(self, state):
+        for name, value in state["history"].items():
+            setattr(self, name, list(value))
+
+        for name, value in state["counters"].items():
+            setattr(self, name, value)
+
+        for name, meter in self.meters().items():
+            if name in state["meters"]:
+                meter.mean = state["meters"][name]["mean"].to(self.device)
+                size = state["meters"][name]["size"]
+                meter.current_size = size.to(self.device) if torch.is_tensor(size) else size
+
+        # the env is reset and the RNGs are used when training starts, apply the rest then
+        self.resume_state = state
+
+    def restore_rollout(self, state):
+        """Restores the env, episode accumulators and RNGs saved by resume_dict()"""
+
+        self.env.clear_grad(
+            {name: value.to(self.env.device) for name, value in state["env"].items()}
         )
 
+        for name, value in state["episode"].items():
+            if value is not None:
+                setattr(self, name, value.to(self.device))
+
+        set_rng_state(state["rng"])
+
     def load(self, path, actor=True):
         print("Loading policy from", path)
-        checkpoint = torch.load(path)
+        checkpoint = torch.load(path, map_location=self.device)
+
+        if isinstance(checkpoint, dict):
+            self.load_state_dict(checkpoint, actor=actor)
+            return
+
+        # checkpoints written before CHECKPOINT_VERSION 1 pickle the modules
         if actor:
             self.actor = checkpoint[0].to(self.device)
         self.critic = checkpoint[1].to(self.device)
@@ -892,4 +999,6 @@ class AHAC:
         self.writer.add_scalar(f"{scalar}", value, self.iter_count)
 
     def close(self):
+        self.env.close()
+        self.checkpoints.close()
         self.writer.close()
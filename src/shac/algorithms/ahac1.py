@@ -27,17 +27,19 @@ from tensorboardX import SummaryWriter
 from omegaconf import DictConfig
 from hydra.utils import instantiate
 from typing import Optional, List, Tuple
-from collections import deque
 
 from shac.utils.common import *
 import shac.utils.torch_utils as tu
 from shac.utils.running_mean_std import RunningMeanStd
-from shac.utils.dataset import CriticDataset
+from shac.utils.dataset import StackedCriticDataset
+from shac.utils.critic_trainer import train_critic
+from shac.utils.evaluator import PolicyEvaluationMixin
+from shac.utils.sim_memory import SimStateMemory
 from shac.utils.time_report import TimeReport
 from shac.utils.average_meter import AverageMeter
 
 
-class AHAC1:
+class AHAC1(PolicyEvaluationMixin):
     def __init__(
         self,
         env_config: DictConfig,
@@ -69,7 +71,9 @@ class AHAC1:
         stochastic_eval: bool = False,  # Whether to use stochastic actor in eval
         score_keys: List[str] = [],
         eval_runs: int = 12,
+        eval_envs: Optional[int] = None,  # size of the eval env, defaults to eval_runs
         log_jacobians: bool = False,  # expensive and messes up wandb
+        checkpoint_sim: bool = False,  # re-simulate steps in backward to save memory
         device: str = "cuda",
     ):
         # sanity check parameters
@@ -89,6 +93,7 @@ class AHAC1:
 
         # Create environment
         self.env = instantiate(env_config, logdir=logdir)
+        self.env_config = env_config
         print("num_envs = ", self.env.num_envs)
         print("num_actions = ", self.env.num_actions)
         print("num_obs = ", self.env.num_obs)
@@ -99,6 +104,11 @@ class AHAC1:
         self.max_episode_length = self.env.episode_length
         self.device = torch.device(device)
 
+        # only keep joint states between steps and re-simulate them in backward
+        self.env.checkpoint_sim = checkpoint_sim
+
+        self.sim_memory = SimStateMemory(self.env)
+
         self.steps_min = steps_min
         self.steps_max = steps_max
         self.contact_th = contact_threshold
@@ -182,6 +192,7 @@ class AHAC1:
             self.critic.parameters(),
             self.critic_lr,
             betas,
+            foreach=True,
         )
 
         # replay buffer
@@ -236,6 +247,8 @@ class AHAC1:
         self.acc_jacobians = accumulate_jacobians
         self.log_jacobians = log_jacobians
         self.eval_runs = eval_runs
+        self.eval_envs = eval_envs
+        self.evaluator = None  # created on first use, see make_evaluator()
         self.last_steps = 0
         self.last_log_steps = 0
 
@@ -480,118 +493,26 @@ class AHAC1:
 
         return actor_loss
 
-    @torch.no_grad()
-    def evaluate_policy(self, num_games, deterministic=False):
-        episode_length_his = []
-        episode_loss_his = []
-        episode_discounted_loss_his = []
-        episode_loss = torch.zeros(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-        episode_length = torch.zeros(self.num_envs, dtype=int)
-        episode_gamma = torch.ones(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-        episode_discounted_loss = torch.zeros(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-
-        obs = self.env.reset()
-
-        games_cnt = 0
-        while games_cnt < num_games:
-            if self.obs_rms is not None:
-                obs = self.obs_rms.normalize(obs)
-
-            actions = self.actor(obs, deterministic=deterministic)
-
-            obs, rew, done, _ = self.env.step(torch.tanh(actions))
-
-            episode_length += 1
-
-            done_env_ids = done.nonzero(as_tuple=False).squeeze(-1)
-
-            episode_loss -= rew
-            episode_discounted_loss -= episode_gamma * rew
-            episode_gamma *= self.gamma
-            if len(done_env_ids) > 0:
-                for done_env_id in done_env_ids:
-                    # print(
-                    #     "loss = {:.2f}, len = {}".format(
-                    #         episode_loss[done_env_id].item(),
-                    #         episode_length[done_env_id],
-                    #     )
-                    # )
-                    episode_loss_his.append(episode_loss[done_env_id].item())
-                    episode_discounted_loss_his.append(
-                        episode_discounted_loss[done_env_id].item()
-                    )
-                    episode_length_his.append(episode_length[done_env_id].item())
-                    episode_loss[done_env_id] = 0.0
-                    episode_discounted_loss[done_env_id] = 0.0
-                    episode_length[done_env_id] = 0
-                    episode_gamma[done_env_id] = 1.0
-                    games_cnt += 1
-
-        mean_episode_length = np.mean(np.array(episode_length_his))
-        mean_policy_loss = np.mean(np.array(episode_loss_his))
-        mean_policy_discounted_loss = np.mean(np.array(episode_discounted_loss_his))
-
-        return mean_policy_loss, mean_policy_discounted_loss, mean_episode_length
-
     @torch.no_grad()
     def compute_target_values(self):
         if self.critic_method == "one-step":
             self.target_values = self.rew_buf + self.gamma * self.next_values
         elif self.critic_method == "td-lambda":
-            Ai = torch.zeros(self.num_envs, dtype=torch.float32, device=self.device)
-            Bi = torch.zeros(self.num_envs, dtype=torch.float32, device=self.device)
-            lam = torch.ones(self.num_envs, dtype=torch.float32, device=self.device)
-            for i in reversed(range(self.last_steps)):
-                lam = lam * self.lam * (1.0 - self.done_mask[i]) + self.done_mask[i]
-                Ai = (1.0 - self.done_mask[i]) * (
-                    self.lam * self.gamma * Ai
-                    + self.gamma * self.next_values[i]
-                    + (1.0 - lam) / (1.0 - self.lam) * self.rew_buf[i]
-                )
-                Bi = (
-                    self.gamma
-                    * (
-                        self.next_values[i] * self.done_mask[i]
-                        + Bi * (1.0 - self.done_mask[i])
-                    )
-                    + self.rew_buf[i]
-                )
-                self.target_values[i] = (1.0 - self.lam) * Ai + lam * Bi
+            steps = self.last_steps
+            self.target_values[:steps] = tu.td_lambda_targets(
+                self.rew_buf[:steps],
+                self.next_values[:steps],
+                self.done_mask[:steps],
+                self.gamma,
+                self.lam,
+            )
         else:
             raise NotImplementedError
 
-    def compute_critic_loss(self, batch_sample):
-        predicted_values = self.critic.predict(batch_sample["obs"]).squeeze(-2)
-        target_values = batch_sample["target_values"]
-        critic_loss = ((predicted_values - target_values) ** 2).mean()
-
-        return critic_loss
-
     def initialize_env(self):
         self.env.clear_grad()
         self.env.reset()
 
-    @torch.no_grad()
-    def run(self, num_games):
-        (
-            mean_policy_loss,
-            mean_policy_discounted_loss,
-            mean_episode_length,
-        ) = self.evaluate_policy(
-            num_games=num_games, deterministic=not self.stochastic_evaluation
-        )
-        print_info(
-            "mean episode loss = {}, mean discounted loss = {}, mean episode length = {}".format(
-                mean_policy_loss, mean_policy_discounted_loss, mean_episode_length
-            )
-        )
-
     def train(self):
         self.start_time = time.time()
 
@@ -624,6 +545,8 @@ class AHAC1:
         def actor_closure():
             self.actor_optimizer.zero_grad()
 
+            self.sim_memory.reset_peak()
+
             self.time_report.start_timer("compute actor loss")
 
             self.time_report.start_timer("forward simulation")
@@ -682,61 +605,34 @@ class AHAC1:
             self.time_report.start_timer("prepare critic dataset")
             with torch.no_grad():
                 self.compute_target_values()
-                critic_batch_size = 1
+                # one sample per minibatch for very short rollouts
+                critic_batches = self.num_envs * self.last_steps
                 if self.last_steps >= self.critic_batches:
-                    critic_batch_size = (
-                        self.num_envs * self.last_steps // self.critic_batches
-                    )
+                    critic_batches = self.critic_batches
 
-                dataset = CriticDataset(
-                    critic_batch_size,
+                dataset = StackedCriticDataset(
+                    critic_batches,
                     self.obs_buf[: self.last_steps],
                     self.target_values[: self.last_steps],
-                    drop_last=False,
                 )
             self.time_report.end_timer("prepare critic dataset")
 
             self.time_report.start_timer("critic training")
-            self.value_loss = 0.0
-            last_losses = deque(maxlen=5)
-            iterations = self.critic_iterations if self.critic_iterations else 64
-            for j in range(min(iterations, self.last_steps * 4)):
-                total_critic_loss = 0.0
-                batch_cnt = 0
-                for i in range(len(dataset)):
-                    batch_sample = dataset[i]
-                    self.critic_optimizer.zero_grad()
-                    training_critic_loss = self.compute_critic_loss(batch_sample)
-                    training_critic_loss.backward()
-
-                    # ugly fix for simulation nan problem
-                    for params in self.critic.parameters():
-                        params.grad.nan_to_num_(0.0, 0.0, 0.0)
-
-                    if self.critic_grad_norm:
-                        clip_grad_norm_(self.critic.parameters(), self.critic_grad_norm)
-
-                    self.critic_optimizer.step()
-
-                    total_critic_loss += training_critic_loss
-                    batch_cnt += 1
-
-                total_critic_loss /= batch_cnt
-                if self.critic_iterations is None and len(last_losses) == 5:
-                    diff = abs(np.diff(last_losses).mean())
-                    if diff < 2e-1:
-                        iterations = j + 1
-                        break
-                last_losses.append(total_critic_loss.item())
-
-                self.value_loss = total_critic_loss
-                print(
-                    "value iter {}/{}, loss = {:7.6f}".format(
-                        j + 1, iterations, self.value_loss
-                    ),
-                    end="\r",
-                )
-
+            self.value_loss, iterations = train_critic(
+                self.critic,
+                self.critic_optimizer,
+                dataset,
+                min(
+                    self.critic_iterations if self.critic_iterations else 64,
+                    self.last_steps * 4,
+                ),
+                grad_norm=self.critic_grad_norm,
+                early_stop=self.critic_iterations is None,
+            )
+            print(
+                "value iters {}, loss = {:7.6f}".format(iterations, self.value_loss),
+                end="\r",
+            )
             self.time_report.end_timer("critic training")
 
             # reset buffers correctly for next iteration
@@ -760,6 +656,7 @@ class AHAC1:
             self.log_scalar("value_loss", self.value_loss)
             self.log_scalar("rollout_len", self.mean_horizon)
             self.log_scalar("fps", fps)
+            self.sim_memory.log(self.log_scalar)
             self.log_scalar("critic_iterations", iterations)
 
             if len(self.episode_loss_his) > 0:
@@ -889,4 +786,5 @@ class AHAC1:
         self.writer.add_scalar(f"{scalar}", value, self.step_count)
 
     def close(self):
+        self.env.close()
         self.writer.close()
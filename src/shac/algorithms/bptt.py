@@ -54,6 +54,9 @@ class BPTT:
         print("num_actions = ", self.env.num_actions)
         print("num_obs = ", self.env.num_obs)
 
+        # only keep joint states between steps and re-simulate them in backward
+        self.env.checkpoint_sim = cfg["params"]["config"].get("checkpoint_sim", False)
+
         self.num_envs = self.env.num_envs
         self.num_obs = self.env.num_obs
         self.num_actions = self.env.num_actions
@@ -553,4 +556,5 @@ class BPTT:
         self.obs_rms = checkpoint[1].to(self.device)
 
     def close(self):
+        self.env.close()
         self.writer.close()
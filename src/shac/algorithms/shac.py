@@ -22,12 +22,32 @@ from typing import Optional, List, Tuple
 from shac.utils.common import *
 import shac.utils.torch_utils as tu
 from shac.utils.running_mean_std import RunningMeanStd
-from shac.utils.dataset import CriticDataset, QCriticDataset
+from shac.utils.dataset import StackedCriticDataset
+from shac.utils.critic_trainer import train_critic
+from shac.utils.evaluator import PolicyEvaluationMixin
+from shac.utils.checkpoint import (
+    CheckpointWriter,
+    CHECKPOINT_VERSION,
+    rng_state,
+    set_rng_state,
+)
+from shac.utils.sim_memory import SimStateMemory
 from shac.utils.time_report import TimeReport
 from shac.utils.average_meter import AverageMeter
 
 
-class SHAC:
+class SHAC(PolicyEvaluationMixin):
+    # per-env episode accumulators, histories and counters carried across epochs,
+    # saved with every checkpoint so a resumed run continues exactly, see resume_dict()
+    EPISODE_ATTRS = (
+        "episode_loss",
+        "episode_discounted_loss",
+        "episode_length",
+        "episode_gamma",
+    )
+    HISTORY_ATTRS = ("episode_loss_his", "episode_discounted_loss_his", "episode_length_his")
+    RESUME_COUNTERS = ("early_termination", "episode_end", "last_log_steps", "episode")
+
     def __init__(
         self,
         env_config: DictConfig,
@@ -54,10 +74,15 @@ class SHAC:
         critic_method: str = "one-step",
         target_critic_alpha: float = 0.4,
         save_interval: int = 500,  # how often to save policy
+        keep_checkpoints: int = 5,  # periodic checkpoints kept on disk, best/init/final are always kept
+        resume: bool = False,  # continues the run in logdir, whose init_policy is kept
         stochastic_eval: bool = False,  # Whether to use stochastic actor in eval
         score_keys: List[str] = [],
         eval_runs: int = 12,
+        eval_interval: int = 0,  # evaluate on a separate no-grad env every n epochs, 0 disables
+        eval_envs: Optional[int] = None,  # size of the eval env, defaults to eval_runs
         log_jacobians: bool = False,  # expensive and messes up wandb
+        checkpoint_sim: bool = False,  # re-simulate steps in backward to save memory
         device: str = "cuda",
     ):
         # sanity check parameters
@@ -75,9 +100,11 @@ class SHAC:
         assert 0 < target_critic_alpha <= 1.0
         assert save_interval > 0
         assert eval_runs >= 0
+        assert eval_interval >= 0
 
         # Create environment
         self.env = instantiate(env_config, logdir=logdir)
+        self.env_config = env_config
         print("num_envs = ", self.env.num_envs)
         print("num_actions = ", self.env.num_actions)
         print("num_obs = ", self.env.num_obs)
@@ -88,6 +115,11 @@ class SHAC:
         self.max_episode_length = self.env.episode_length
         self.device = torch.device(device)
 
+        # only keep joint states between steps and re-simulate them in backward
+        self.env.checkpoint_sim = checkpoint_sim
+
+        self.sim_memory = SimStateMemory(self.env)
+
         self.steps_num = steps_num
         self.max_epochs = max_epochs
         self.actor_lr = actor_lr
@@ -100,6 +132,7 @@ class SHAC:
 
         self.critic_method = critic_method
         self.critic_iterations = critic_iterations
+        self.critic_batches = critic_batches
         self.critic_batch_size = self.num_envs * self.steps_num // critic_batches
         self.target_critic_alpha = target_critic_alpha
 
@@ -123,6 +156,7 @@ class SHAC:
             self.log_dir = logdir
             os.makedirs(self.log_dir, exist_ok=True)
             self.writer = SummaryWriter(os.path.join(self.log_dir, "log"))
+            self.checkpoints = CheckpointWriter(self.log_dir, keep_checkpoints)
 
         # Create actor and critic
         self.actor = instantiate(
@@ -150,9 +184,6 @@ class SHAC:
         self.episode_ends = []
         self.episode = 0
 
-        if train:
-            self.save("init_policy")
-
         # initialize optimizers
         self.actor_optimizer = torch.optim.Adam(
             self.actor.parameters(),
@@ -163,6 +194,7 @@ class SHAC:
             self.critic.parameters(),
             self.critic_lr,
             betas,
+            foreach=True,
         )
 
         # replay buffer
@@ -214,6 +246,10 @@ class SHAC:
         self.episode_end = 0
         self.log_jacobians = log_jacobians
         self.eval_runs = eval_runs
+        self.eval_interval = eval_interval
+        self.eval_envs = eval_envs
+        self.evaluator = None  # created on first use, see make_evaluator()
+        self.resume_state = None  # env, episode and RNG state applied when train() starts
         self.last_log_steps = 0
 
         # average meter
@@ -230,6 +266,10 @@ class SHAC:
         # timer
         self.time_report = TimeReport()
 
+        # only a fresh run saves its initialization, a resumed one keeps the original
+        if train and not resume:
+            self.save("init_policy")
+
     @property
     def mean_horizon(self):
         return self.horizon_length_meter.get_mean()
@@ -445,118 +485,26 @@ class SHAC:
 
         return actor_loss
 
-    @torch.no_grad()
-    def evaluate_policy(self, num_games, deterministic=False):
-        episode_length_his = []
-        episode_loss_his = []
-        episode_discounted_loss_his = []
-        episode_loss = torch.zeros(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-        episode_length = torch.zeros(self.num_envs, dtype=int)
-        episode_gamma = torch.ones(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-        episode_discounted_loss = torch.zeros(
-            self.num_envs, dtype=torch.float32, device=self.device
-        )
-
-        obs = self.env.reset()
-
-        games_cnt = 0
-        while games_cnt < num_games:
-            if self.obs_rms is not None:
-                obs = self.obs_rms.normalize(obs)
-
-            actions = self.actor(obs, deterministic=deterministic)
-
-            obs, rew, done, _ = self.env.step(torch.tanh(actions))
-
-            episode_length += 1
-
-            done_env_ids = done.nonzero(as_tuple=False).squeeze(-1)
-
-            episode_loss -= rew
-            episode_discounted_loss -= episode_gamma * rew
-            episode_gamma *= self.gamma
-            if len(done_env_ids) > 0:
-                for done_env_id in done_env_ids:
-                    print(
-                        "loss = {:.2f}, len = {}".format(
-                            episode_loss[done_env_id].item(),
-                            episode_length[done_env_id],
-                        )
-                    )
-                    episode_loss_his.append(episode_loss[done_env_id].item())
-                    episode_discounted_loss_his.append(
-                        episode_discounted_loss[done_env_id].item()
-                    )
-                    episode_length_his.append(episode_length[done_env_id].item())
-                    episode_loss[done_env_id] = 0.0
-                    episode_discounted_loss[done_env_id] = 0.0
-                    episode_length[done_env_id] = 0
-                    episode_gamma[done_env_id] = 1.0
-                    games_cnt += 1
-
-        mean_episode_length = np.mean(np.array(episode_length_his))
-        mean_policy_loss = np.mean(np.array(episode_loss_his))
-        mean_policy_discounted_loss = np.mean(np.array(episode_discounted_loss_his))
-
-        return mean_policy_loss, mean_policy_discounted_loss, mean_episode_length
-
     @torch.no_grad()
     def compute_target_values(self):
         if self.critic_method == "one-step":
             self.target_values = self.rew_buf + self.gamma * self.next_values
         elif self.critic_method == "td-lambda":
-            Ai = torch.zeros(self.num_envs, dtype=torch.float32, device=self.device)
-            Bi = torch.zeros(self.num_envs, dtype=torch.float32, device=self.device)
-            lam = torch.ones(self.num_envs, dtype=torch.float32, device=self.device)
-            for i in reversed(range(self.steps_num)):
-                lam = lam * self.lam * (1.0 - self.done_mask[i]) + self.done_mask[i]
-                Ai = (1.0 - self.done_mask[i]) * (
-                    self.lam * self.gamma * Ai
-                    + self.gamma * self.next_values[i]
-                    + (1.0 - lam) / (1.0 - self.lam) * self.rew_buf[i]
-                )
-                Bi = (
-                    self.gamma
-                    * (
-                        self.next_values[i] * self.done_mask[i]
-                        + Bi * (1.0 - self.done_mask[i])
-                    )
-                    + self.rew_buf[i]
-                )
-                self.target_values[i] = (1.0 - self.lam) * Ai + lam * Bi
+            steps = self.steps_num
+            self.target_values[:steps] = tu.td_lambda_targets(
+                self.rew_buf[:steps],
+                self.next_values[:steps],
+                self.done_mask[:steps],
+                self.gamma,
+                self.lam,
+            )
         else:
             raise NotImplementedError
 
-    def compute_critic_loss(self, batch_sample):
-        predicted_values = self.critic.predict(batch_sample["obs"]).squeeze(-2)
-        target_values = batch_sample["target_values"]
-        critic_loss = ((predicted_values - target_values) ** 2).mean()
-
-        return critic_loss
-
     def initialize_env(self):
         self.env.clear_grad()
         self.env.reset()
 
-    @torch.no_grad()
-    def run(self, num_games):
-        (
-            mean_policy_loss,
-            mean_policy_discounted_loss,
-            mean_episode_length,
-        ) = self.evaluate_policy(
-            num_games=num_games, deterministic=not self.stochastic_evaluation
-        )
-        print_info(
-            "mean episode loss = {}, mean discounted loss = {}, mean episode length = {}".format(
-                mean_policy_loss, mean_policy_discounted_loss, mean_episode_length
-            )
-        )
-
     def train(self):
         self.start_time = time.time()
 
@@ -586,9 +534,16 @@ class SHAC:
             self.num_envs, dtype=torch.float32, device=self.device
         )
 
+        # continue the rollout of a resumed run where its checkpoint was taken
+        if self.resume_state is not None:
+            self.restore_rollout(self.resume_state)
+            self.resume_state = None
+
         def actor_closure():
             self.actor_optimizer.zero_grad()
 
+            self.sim_memory.reset_peak()
+
             self.time_report.start_timer("compute actor loss")
 
             self.time_report.start_timer("forward simulation")
@@ -618,7 +573,8 @@ class SHAC:
             return actor_loss
 
         # main training process
-        for epoch in range(self.max_epochs):
+        # resumed runs continue from the epoch of the loaded checkpoint
+        for epoch in range(self.iter_count, self.max_epochs):
             time_start_epoch = time.time()
 
             # learning rate schedule
@@ -647,45 +603,26 @@ class SHAC:
             self.time_report.start_timer("prepare critic dataset")
             with torch.no_grad():
                 self.compute_target_values()
-                dataset = CriticDataset(
-                    self.critic_batch_size,
+                dataset = StackedCriticDataset(
+                    self.critic_batches,
                     self.obs_buf,
                     self.target_values,
-                    drop_last=False,
                 )
             self.time_report.end_timer("prepare critic dataset")
 
             self.time_report.start_timer("critic training")
-            self.value_loss = 0.0
-            for j in range(self.critic_iterations):
-                total_critic_loss = 0.0
-                batch_cnt = 0
-                for i in range(len(dataset)):
-                    batch_sample = dataset[i]
-                    self.critic_optimizer.zero_grad()
-                    training_critic_loss = self.compute_critic_loss(batch_sample)
-                    training_critic_loss.backward()
-
-                    # ugly fix for simulation nan problem
-                    for params in self.critic.parameters():
-                        params.grad.nan_to_num_(0.0, 0.0, 0.0)
-
-                    if self.critic_grad_norm:
-                        clip_grad_norm_(self.critic.parameters(), self.critic_grad_norm)
-
-                    self.critic_optimizer.step()
-
-                    total_critic_loss += training_critic_loss
-                    batch_cnt += 1
-
-                self.value_loss = (total_critic_loss / batch_cnt).detach().cpu().item()
-                print(
-                    "value iter {}/{}, loss = {:7.6f}".format(
-                        j + 1, self.critic_iterations, self.value_loss
-                    ),
-                    end="\r",
-                )
-
+            self.value_loss, iterations = train_critic(
+                self.critic,
+                self.critic_optimizer,
+                dataset,
+                self.critic_iterations,
+                grad_norm=self.critic_grad_norm,
+                early_stop=False,
+            )
+            print(
+                "value iters {}, loss = {:7.6f}".format(iterations, self.value_loss),
+                end="\r",
+            )
             self.time_report.end_timer("critic training")
 
             self.iter_count += 1
@@ -700,6 +637,7 @@ class SHAC:
             self.log_scalar("value_loss", self.value_loss)
             self.log_scalar("rollout_len", self.mean_horizon)
             self.log_scalar("fps", fps)
+            self.sim_memory.log(self.log_scalar)
 
             if len(self.episode_loss_his) > 0:
                 mean_episode_length = self.episode_length_meter.get_mean()
@@ -760,16 +698,15 @@ class SHAC:
                 )
             )
 
-            self.writer.flush()
-
-            if self.save_interval > 0 and (self.iter_count % self.save_interval == 0):
-                self.save(
-                    self.name
-                    + "policy_iter{}_reward{:.3f}".format(
-                        self.iter_count, -mean_policy_loss
+            if self.eval_interval > 0 and self.iter_count % self.eval_interval == 0:
+                self.log_evaluation(
+                    self.evaluate_policy(
+                        self.eval_runs, deterministic=not self.stochastic_evaluation
                     )
                 )
 
+            self.writer.flush()
+
             # update target critic
             with torch.no_grad():
                 alpha = self.target_critic_alpha
@@ -779,6 +716,16 @@ class SHAC:
                     param_targ.data.mul_(alpha)
                     param_targ.data.add_((1.0 - alpha) * param.data)
 
+            # last in the epoch, so periodic checkpoints are exact resume points
+            if self.save_interval > 0 and (self.iter_count % self.save_interval == 0):
+                self.save(
+                    self.name
+                    + "policy_iter{}_reward{:.3f}".format(
+                        self.iter_count, -mean_policy_loss
+                    ),
+                    periodic=True,
+                )
+
         self.time_report.end_timer("algorithm")
 
         self.time_report.report()
@@ -804,17 +751,114 @@ class SHAC:
 
         self.close()
 
-    def save(self, filename=None):
+    def save(self, filename=None, periodic=False):
         if filename is None:
             filename = "best_policy"
-        torch.save(
-            [self.actor, self.critic, self.target_critic, self.obs_rms, self.ret_rms],
-            os.path.join(self.log_dir, "{}.pt".format(filename)),
+        self.checkpoints.save(filename, self.state_dict(), periodic=periodic)
+
+    def state_dict(self):
+        """Training state written by save(), restored by load()"""
+
+        return {
+            "version": CHECKPOINT_VERSION,
+            "actor": self.actor.state_dict(),
+            "critic": self.critic.state_dict(),
+            "target_critic": self.target_critic.state_dict(),
+            "obs_rms": self.obs_rms.state_dict() if self.obs_rms is not None else None,
+            "ret_rms": self.ret_rms.state_dict() if self.ret_rms is not None else None,
+            "actor_optimizer": self.actor_optimizer.state_dict(),
+            "critic_optimizer": self.critic_optimizer.state_dict(),
+            "iter_count": self.iter_count,
+            "step_count": self.step_count,
+            "best_policy_loss": float(self.best_policy_loss),
+            "resume": self.resume_dict(),
+        }
+
+    def load_state_dict(self, state):
+        self.actor.load_state_dict(state["actor"])
+        self.critic.load_state_dict(state["critic"])
+        self.target_critic.load_state_dict(state["target_critic"])
+
+        for name, shape in (("obs_rms", self.num_obs), ("ret_rms", ())):
+            rms = None
+            if state[name] is not None:
+                rms = RunningMeanStd(shape=shape, device=self.device)
+                rms.load_state_dict(state[name])
+            setattr(self, name, rms)
+
+        self.actor_optimizer.load_state_dict(state["actor_optimizer"])
+        self.critic_optimizer.load_state_dict(state["critic_optimizer"])
+        self.iter_count = state["iter_count"]
+        self.step_count = state["step_count"]
+        self.best_policy_loss = state["best_policy_loss"]
+
+        if "resume" in state:
+            self.load_resume_dict(state["resume"])
+
+    def meters(self):
+        meters = {
+            "episode_loss": self.episode_loss_meter,
+            "episode_discounted_loss": self.episode_discounted_loss_meter,
+            "episode_length": self.episode_length_meter,
+            "horizon_length": self.horizon_length_meter,
+        }
+        meters.update(self.episode_scores_meter_map)
+
+        return meters
+
+    def resume_dict(self):
+        """Rollout state needed to continue training exactly where save() was called"""
+
+        return {
+            "env": self.env.get_checkpoint(),
+            "episode": {name: getattr(self, name, None) for name in self.EPISODE_ATTRS},
+            "history": {name: getattr(self, name) for name in self.HISTORY_ATTRS},
+            "counters": {name: getattr(self, name) for name in self.RESUME_COUNTERS},
+            "meters": {
+                name: {"mean": meter.mean, "size": meter.current_size}
+                for name, meter in self.meters().items()
+            },
+            "rng": rng_state(),
+        }
+
+    def load_resume_dict(self, state):
+        for name, value in state["history"].items():
+            setattr(self, name, list(value))
+
+        for name, value in state["counters"].items():
+            setattr(self, name, value)
+
+        for name, meter in self.meters().items():
+            if name in state["meters"]:
+                meter.mean = state["meters"][name]["mean"].to(self.device)
+                size = state["meters"][name]["size"]
+                meter.current_size = size.to(self.device) if torch.is_tensor(size) else size
+
+        # the env is reset and the RNGs are used when training starts, apply the rest then
+        self.resume_state = state
+
+    def restore_rollout(self, state):
+        """Restores the env, episode accumulators and RNGs saved by resume_dict()"""
+
+        self.env.clear_grad(
+            {name: value.to(self.env.device) for name, value in state["env"].items()}
         )
 
+        for name, value in state["episode"].items():
+            if value is not None:
+                setattr(self, name, value.to(self.device))
+
+        set_rng_state(state["rng"])
+
     def load(self, path):
         print_info("Loading policy from", path)
-        checkpoint = torch.load(path)
+        checkpoint = torch.load(path, map_location=self.device)
+
+        if isinstance(checkpoint, dict):
+            self.load_state_dict(checkpoint)
+            return
+
+        # checkpoints written before CHECKPOINT_VERSION 1 pickle the modules
         self.actor = checkpoint[0].to(self.device)
         self.critic = checkpoint[1].to(self.device)
         self.target_critic = checkpoint[2].to(self.device)
@@ -830,4 +874,6 @@ class SHAC:
         self.writer.add_scalar(f"{scalar}", value, self.step_count)
 
     def close(self):
+        self.env.close()
+        self.checkpoints.close()
         self.writer.close()
@@ -23,17 +23,42 @@ class AverageMeter(nn.Module):
             return
         new_mean = torch.mean(values.float(), dim=0)
         size = np.clip(size, 0, self.max_size)
-        old_size = min(self.max_size - size, self.current_size)
+        if torch.is_tensor(self.current_size):
+            old_size = torch.clamp(self.current_size, max=self.max_size - size)
+        else:
+            old_size = min(self.max_size - size, self.current_size)
         size_sum = old_size + size
         self.current_size = size_sum
         self.mean = (self.mean * old_size + new_mean * size) / size_sum
 
+    def update_masked(self, values, mask):
+        """Same as update(values[mask]) but without syncing on the number of selected rows,
+        the size is then kept as a tensor on the device of values
+        """
+        mask = mask.view(-1, *([1] * (values.dim() - 1))).float()
+        count = mask.sum()
+        # where() rather than a product so non-finite unselected rows are ignored
+        selected = torch.where(mask > 0, values.float(), torch.zeros_like(mask))
+        new_mean = selected.sum(dim=0) / count.clamp(min=1.0)
+        size = count.clamp(max=self.max_size)
+        current_size = torch.as_tensor(
+            self.current_size, dtype=torch.float32, device=values.device
+        )
+        old_size = torch.minimum(self.max_size - size, current_size)
+        size_sum = old_size + size
+        self.current_size = size_sum
+        self.mean = torch.where(
+            size > 0,
+            (self.mean * old_size + new_mean * size) / size_sum.clamp(min=1.0),
+            self.mean,
+        )
+
     def clear(self):
         self.current_size = 0
         self.mean.fill_(0)
 
     def __len__(self):
-        return self.current_size
+        return int(self.current_size)
 
     def get_mean(self):
         return self.mean.squeeze(0).cpu().numpy()
@@ -0,0 +1,142 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+import os
+import re
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+# bump when the layout of the checkpoint dict changes
+CHECKPOINT_VERSION = 1
+
+# periodic checkpoints are named <alg>_<env>policy_iter<n>_reward<r>.pt
+PERIODIC_PATTERN = re.compile(r"policy_iter(\d+)_reward.*\.pt$")
+
+
+def snapshot(obj):
+    """Copies all tensors of a (nested) state dict to host memory
+
+    The copy is taken before returning, so training may keep updating the
+    parameters while the snapshot is written.
+    """
+
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    elif isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(v) for v in obj)
+
+    return obj
+
+
+def rng_state():
+    """Returns the states of the python, numpy and torch (host and CUDA) RNGs"""
+
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+
+    return state
+
+
+def set_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"].cpu())
+
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all([s.cpu() for s in state["cuda"]])
+
+
+def periodic_checkpoints(log_dir):
+    """Returns the periodic checkpoints in `log_dir` ordered by iteration"""
+
+    if not os.path.isdir(log_dir):
+        return []
+
+    found = []
+    for name in os.listdir(log_dir):
+        match = PERIODIC_PATTERN.search(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(log_dir, name)))
+
+    return [path for _, path in sorted(found)]
+
+
+class CheckpointWriter:
+    """Writes checkpoints to `log_dir` on a background thread
+
+    Each checkpoint is written to a temporary file which is then renamed, so an
+    interrupted write never leaves a truncated checkpoint behind. Only the last
+    `keep_last` periodic checkpoints are kept on disk, named checkpoints (best,
+    init, final) are overwritten in place and always kept.
+    """
+
+    def __init__(self, log_dir, keep_last=5):
+        self.log_dir = log_dir
+        self.keep_last = keep_last
+
+        # checkpoints of a resumed run in the same directory count towards keep_last
+        self.periodic = deque(periodic_checkpoints(log_dir))
+        self.pending = []
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def save(self, name, state, periodic=False):
+        """Snapshots `state` and queues it to be written as `<log_dir>/<name>.pt`"""
+
+        self.check()
+
+        path = os.path.join(self.log_dir, "{}.pt".format(name))
+        state = snapshot(state)
+
+        expired = []
+        if periodic:
+            self.periodic.append(path)
+            while self.keep_last > 0 and len(self.periodic) > self.keep_last:
+                expired.append(self.periodic.popleft())
+
+        self.pending.append(self.executor.submit(self._write, path, state, expired))
+
+    def check(self):
+        """Re-raises the error of any failed write and forgets finished ones"""
+
+        done = [f for f in self.pending if f.done()]
+        self.pending = [f for f in self.pending if not f.done()]
+
+        for f in done:
+            f.result()
+
+    def wait(self):
+        """Blocks until all queued checkpoints are written"""
+
+        pending, self.pending = self.pending, []
+        for f in pending:
+            f.result()
+
+    def close(self):
+        self.wait()
+        self.executor.shutdown()
+
+    @staticmethod
+    def _write(path, state, expired):
+        tmp = "{}.tmp{}".format(path, os.getpid())
+        torch.save(state, tmp)
+        os.replace(tmp, path)
+
+        for old in expired:
+            if old != path and os.path.exists(old):
+                os.remove(old)
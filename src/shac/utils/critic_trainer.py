@@ -0,0 +1,91 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+import torch
+from torch.nn.utils.clip_grad import clip_grad_norm_
+
+
+def critic_loss(critic, batch):
+    """Weighted mean squared error of the critic on a StackedCriticDataset minibatch
+
+    Samples with non-finite obs or targets have zero weight.
+    """
+
+    predicted_values = critic.predict(batch["obs"])
+    target_values = batch["target_values"].unsqueeze(-1)
+    weights = batch["weights"]
+
+    error = ((predicted_values - target_values) ** 2).mean(dim=-1)
+
+    return (error * weights).sum() / weights.sum().clamp(min=1.0)
+
+
+def train_critic(
+    critic,
+    optimizer,
+    dataset,
+    iterations,
+    grad_norm=None,
+    early_stop=False,
+    check_every=5,
+    window=5,
+    tol=2e-1,
+    compute_loss=critic_loss,
+):
+    """Fits the critic on a StackedCriticDataset for up to `iterations` epochs
+
+    `compute_loss` maps the critic and a minibatch (dict of obs, target_values,
+    weights) to a scalar loss. Non-finite gradients, e.g. from values that
+    overflow inside the critic, are zeroed before clipping and the step.
+
+    Epoch losses are accumulated on device and the early stop criterion
+    (mean change of the last `window` epoch losses below `tol`) is only
+    evaluated every `check_every` epochs, so the loop syncs with the host
+    once per check rather than once per epoch. Training may therefore run
+    up to `check_every - 1` epochs past the one where the criterion is met.
+
+    Returns:
+        The mean loss of the last epoch (float) and the number of epochs run
+    """
+
+    params = [p for p in critic.parameters() if p.requires_grad]
+    losses = torch.zeros(iterations, device=dataset.obs.device)
+
+    epochs = 0
+    for j in range(iterations):
+        total_loss = torch.zeros((), device=dataset.obs.device)
+
+        for i in range(len(dataset)):
+            optimizer.zero_grad(set_to_none=True)
+            loss = compute_loss(critic, dataset[i])
+            loss.backward()
+
+            # ugly fix for simulation nan problem
+            for p in params:
+                if p.grad is not None:
+                    p.grad.nan_to_num_(0.0, 0.0, 0.0)
+
+            if grad_norm:
+                clip_grad_norm_(params, grad_norm)
+
+            optimizer.step()
+
+            total_loss += loss.detach()
+
+        losses[j] = total_loss / len(dataset)
+        epochs = j + 1
+
+        if early_stop and epochs > window and epochs % check_every == 0:
+            # criterion of the original per-epoch loop, evaluated for every epoch since the last check
+            history = losses[:epochs]
+            change = (history[window - 1 : -1] - history[: -window]).abs() / (
+                window - 1
+            )
+            if bool((change < tol).any()):
+                break
+
+    return losses[epochs - 1].item(), epochs
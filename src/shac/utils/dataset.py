@@ -54,6 +54,56 @@ class CriticDataset:
         }
 
 
+class StackedCriticDataset:
+    """CriticDataset laid out as (num_batches, batch_size, ...) tensors on device
+
+    Samples with non-finite observations or targets are kept but zeroed and
+    given a weight of 0 instead of being filtered out, so building the dataset
+    needs no host sync and every minibatch has the same shape. The tail of the
+    last minibatch is padded with zero weight samples.
+    """
+
+    def __init__(self, num_batches, obs, target_values, shuffle=True):
+        obs = obs.reshape(-1, obs.shape[-1])
+        target_values = target_values.reshape(-1)
+
+        valid = torch.isfinite(obs).all(dim=-1) & torch.isfinite(target_values)
+        obs = torch.where(valid.unsqueeze(-1), obs, torch.zeros_like(obs))
+        target_values = torch.where(
+            valid, target_values, torch.zeros_like(target_values)
+        )
+        weights = valid.to(obs.dtype)
+
+        if shuffle:
+            index = torch.randperm(obs.shape[0], device=obs.device)
+            obs = obs[index]
+            target_values = target_values[index]
+            weights = weights[index]
+
+        self.length = num_batches
+        self.batch_size = (obs.shape[0] + num_batches - 1) // num_batches
+
+        pad = self.length * self.batch_size - obs.shape[0]
+        if pad > 0:
+            obs = torch.cat((obs, obs.new_zeros((pad, obs.shape[-1]))))
+            target_values = torch.cat((target_values, target_values.new_zeros(pad)))
+            weights = torch.cat((weights, weights.new_zeros(pad)))
+
+        self.obs = obs.view(self.length, self.batch_size, -1)
+        self.target_values = target_values.view(self.length, self.batch_size)
+        self.weights = weights.view(self.length, self.batch_size)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return {
+            "obs": self.obs[index],
+            "target_values": self.target_values[index],
+            "weights": self.weights[index],
+        }
+
+
 class QCriticDataset:
     def __init__(
         self, batch_size, obs, act, target_values, shuffle=False, drop_last=False
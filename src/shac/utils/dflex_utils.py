@@ -106,25 +106,42 @@ class ContactSemiImplicitIntegrator(SemiImplicitIntegrator):
         state.active_contacts = torch.zeros(state.body_f_s.shape[0], dtype=torch.bool)
         return state
 
-    def _simulate(self, tape, model, state_in, state_out, dt, update_mass_matrix=True):
+    def _simulate(
+        self,
+        tape,
+        model,
+        state_in,
+        state_out,
+        dt,
+        update_mass_matrix=True,
+        requires_grad=True,
+    ):
         with dflex.util.ScopedTimer("simulate", False):
             # alloc particle force buffer
             if model.particle_count:
                 state_out.particle_f.zero_()
 
             if model.link_count:
-                state_out.body_ft_s = torch.zeros(
-                    (model.link_count, 6),
-                    dtype=torch.float32,
-                    device=model.adapter,
-                    requires_grad=True,
-                )
-                state_out.body_f_ext_s = torch.zeros(
-                    (model.link_count, 6),
-                    dtype=torch.float32,
-                    device=model.adapter,
-                    requires_grad=True,
-                )
+                if requires_grad:
+                    state_out.body_ft_s = torch.zeros(
+                        (model.link_count, 6),
+                        dtype=torch.float32,
+                        device=model.adapter,
+                        requires_grad=True,
+                    )
+                    state_out.body_f_ext_s = torch.zeros(
+                        (model.link_count, 6),
+                        dtype=torch.float32,
+                        device=model.adapter,
+                        requires_grad=True,
+                    )
+                else:
+                    state_out.body_ft_s = model.scratch(
+                        "body_ft_s", (model.link_count, 6)
+                    )
+                    state_out.body_f_ext_s = model.scratch(
+                        "body_f_ext_s", (model.link_count, 6)
+                    )
 
             # damped springs
             if model.spring_count:
@@ -392,8 +409,10 @@ class ContactSemiImplicitIntegrator(SemiImplicitIntegrator):
                     preserve_output=True,
                 )
 
+                model.mass_matrix_cache.record(update_mass_matrix)
+
                 if update_mass_matrix:
-                    model.alloc_mass_matrix()
+                    model.alloc_mass_matrix(requires_grad, tape)
 
                     # build J
                     tape.launch(
@@ -478,7 +497,10 @@ class ContactSemiImplicitIntegrator(SemiImplicitIntegrator):
                         skip_check_grad=True,
                     )
 
-                tmp = torch.zeros_like(state_out.joint_tau)
+                if requires_grad:
+                    tmp = torch.zeros_like(state_out.joint_tau)
+                else:
+                    tmp = model.scratch("tmp", state_out.joint_tau.shape)
 
                 # solve for qdd
                 tape.launch(
@@ -0,0 +1,181 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+import math
+
+import torch
+from hydra.utils import instantiate
+
+from shac.utils.common import print_info
+
+
+class PolicyEvaluator:
+    """Runs evaluation episodes of a policy on a dedicated no-grad env
+
+    Every env records its first ceil(num_episodes / num_envs) episodes, so the
+    result is not biased towards episodes that terminate early. Episode losses,
+    lengths and score keys are accumulated on device with masks and the host
+    only checks whether all envs are finished every `check_every` steps.
+    """
+
+    def __init__(self, env, gamma=0.99, score_keys=(), check_every=32):
+        self.env = env
+        self.gamma = gamma
+        self.score_keys = list(score_keys)
+        self.check_every = check_every
+
+        self.num_envs = env.num_envs
+        self.device = torch.device(env.device)
+
+    @torch.inference_mode()
+    def evaluate(self, actor, num_episodes, obs_rms=None, deterministic=True):
+        """Evaluates the actor for at least `num_episodes` episodes
+
+        Actions are passed through tanh as in the training rollouts.
+
+        Returns:
+            A dict with the mean, std and percentiles of the episode loss (negative
+            return), the mean discounted loss, the mean and std of the episode
+            lengths, the mean of every score key and the number of episodes
+        """
+
+        n = self.num_envs
+        per_env = max(1, math.ceil(num_episodes / n))
+
+        # episode slots per env, the extra slot takes the episodes that are not recorded
+        shape = (n, per_env + 1)
+        losses = torch.zeros(shape, device=self.device)
+        discounted_losses = torch.zeros(shape, device=self.device)
+        lengths = torch.zeros(shape, device=self.device)
+        scores = {k: torch.zeros(shape, device=self.device) for k in self.score_keys}
+
+        loss = torch.zeros(n, device=self.device)
+        discounted_loss = torch.zeros(n, device=self.device)
+        discount = torch.ones(n, device=self.device)
+        length = torch.zeros(n, device=self.device)
+        finished = torch.zeros(n, dtype=torch.long, device=self.device)
+
+        rows = torch.arange(n, device=self.device)
+
+        obs = self.env.reset()
+
+        # an episode lasts at most episode_length steps
+        max_steps = per_env * self.env.episode_length
+
+        for step in range(max_steps):
+            if obs_rms is not None:
+                obs = obs_rms.normalize(obs)
+
+            actions = actor(obs, deterministic=deterministic)
+            obs, rew, done, info = self.env.step(torch.tanh(actions))
+
+            loss -= rew
+            discounted_loss -= discount * rew
+            discount *= self.gamma
+            length += 1
+
+            slot = torch.where(done, finished.clamp(max=per_env), per_env)
+            losses[rows, slot] = loss
+            discounted_losses[rows, slot] = discounted_loss
+            lengths[rows, slot] = length
+            for k in self.score_keys:
+                scores[k][rows, slot] = info[k].float()
+
+            finished += done
+            loss.masked_fill_(done, 0.0)
+            discounted_loss.masked_fill_(done, 0.0)
+            discount.masked_fill_(done, 1.0)
+            length.masked_fill_(done, 0.0)
+
+            if (step + 1) % self.check_every == 0 and bool(
+                (finished >= per_env).all()
+            ):
+                break
+
+        # every env finishes per_env episodes within max_steps
+        losses = losses[:, :per_env].flatten()
+        q = torch.tensor([0.05, 0.25, 0.5, 0.75, 0.95], device=self.device)
+        percentiles = torch.quantile(losses, q).tolist()
+        lengths = lengths[:, :per_env]
+
+        summary = {
+            "episodes": losses.numel(),
+            "loss_mean": losses.mean().item(),
+            "loss_std": losses.std(unbiased=False).item(),
+            "loss_percentiles": dict(zip((5, 25, 50, 75, 95), percentiles)),
+            "discounted_loss_mean": discounted_losses[:, :per_env].mean().item(),
+            "length_mean": lengths.mean().item(),
+            "length_std": lengths.std(unbiased=False).item(),
+            "scores": {k: scores[k][:, :per_env].mean().item() for k in self.score_keys},
+        }
+
+        return summary
+
+
+class PolicyEvaluationMixin:
+    """Policy evaluation shared by the training algorithms
+
+    Expects `env`, `env_config`, `actor`, `obs_rms`, `gamma`, `score_keys`,
+    `eval_runs`, `eval_envs`, `stochastic_evaluation` and `evaluator` (None
+    until first use) attributes and a `log_scalar` method.
+    """
+
+    def make_evaluator(self):
+        """Creates the evaluator, with its own no-grad env unless this one already is"""
+
+        if getattr(self.env, "no_grad", False):
+            env = self.env
+        else:
+            env = instantiate(
+                self.env_config,
+                no_grad=True,
+                render=False,
+                num_envs=self.eval_envs or max(self.eval_runs, 1),
+            )
+
+        return PolicyEvaluator(env, self.gamma, self.score_keys)
+
+    def evaluate_policy(self, num_games, deterministic=False):
+        if self.evaluator is None:
+            self.evaluator = self.make_evaluator()
+
+        return self.evaluator.evaluate(
+            self.actor, num_games, obs_rms=self.obs_rms, deterministic=deterministic
+        )
+
+    def run(self, num_games):
+        summary = self.evaluate_policy(
+            num_games=num_games, deterministic=not self.stochastic_evaluation
+        )
+        print_info(
+            "mean episode loss = {}, mean discounted loss = {}, mean episode length = {}".format(
+                summary["loss_mean"],
+                summary["discounted_loss_mean"],
+                summary["length_mean"],
+            )
+        )
+        print_info(
+            "{} episodes, loss std = {}, percentiles = {}, scores = {}".format(
+                summary["episodes"],
+                summary["loss_std"],
+                summary["loss_percentiles"],
+                summary["scores"],
+            )
+        )
+
+        return summary
+
+    def log_evaluation(self, summary):
+        self.log_scalar("eval/policy_loss", summary["loss_mean"])
+        self.log_scalar("eval/rewards", -summary["loss_mean"])
+        self.log_scalar("eval/policy_loss_std", summary["loss_std"])
+        for q, value in summary["loss_percentiles"].items():
+            self.log_scalar(f"eval/policy_loss_p{q}", value)
+        self.log_scalar("eval/policy_discounted_loss", summary["discounted_loss_mean"])
+        self.log_scalar("eval/episode_lengths", summary["length_mean"])
+        for score_key, score in summary["scores"].items():
+            self.log_scalar(f"eval/scores/{score_key}", score)
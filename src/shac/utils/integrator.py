@@ -100,7 +100,16 @@ def eval_rigid_contacts_art(
 
 
 class ContactIntegrator(SemiImplicitIntegrator):
-    def _simulate(self, tape, model, state_in, state_out, dt, update_mass_matrix=True):
+    def _simulate(
+        self,
+        tape,
+        model,
+        state_in,
+        state_out,
+        dt,
+        update_mass_matrix=True,
+        requires_grad=True,
+    ):
         with dflex.util.ScopedTimer("simulate", False):
             body_f_s = state_in.body_f_s
 
@@ -109,18 +118,26 @@ class ContactIntegrator(SemiImplicitIntegrator):
                 state_out.particle_f.zero_()
 
             if model.link_count:
-                state_out.body_ft_s = torch.zeros(
-                    (model.link_count, 6),
-                    dtype=torch.float32,
-                    device=model.adapter,
-                    requires_grad=True,
-                )
-                state_out.body_f_ext_s = torch.zeros(
-                    (model.link_count, 6),
-                    dtype=torch.float32,
-                    device=model.adapter,
-                    requires_grad=True,
-                )
+                if requires_grad:
+                    state_out.body_ft_s = torch.zeros(
+                        (model.link_count, 6),
+                        dtype=torch.float32,
+                        device=model.adapter,
+                        requires_grad=True,
+                    )
+                    state_out.body_f_ext_s = torch.zeros(
+                        (model.link_count, 6),
+                        dtype=torch.float32,
+                        device=model.adapter,
+                        requires_grad=True,
+                    )
+                else:
+                    state_out.body_ft_s = model.scratch(
+                        "body_ft_s", (model.link_count, 6)
+                    )
+                    state_out.body_f_ext_s = model.scratch(
+                        "body_f_ext_s", (model.link_count, 6)
+                    )
 
             # damped springs
             if model.spring_count:
@@ -388,8 +405,10 @@ class ContactIntegrator(SemiImplicitIntegrator):
                     preserve_output=True,
                 )
 
+                model.mass_matrix_cache.record(update_mass_matrix)
+
                 if update_mass_matrix:
-                    model.alloc_mass_matrix()
+                    model.alloc_mass_matrix(requires_grad, tape)
 
                     # build J
                     tape.launch(
@@ -474,7 +493,10 @@ class ContactIntegrator(SemiImplicitIntegrator):
                         skip_check_grad=True,
                     )
 
-                tmp = torch.zeros_like(state_out.joint_tau)
+                if requires_grad:
+                    tmp = torch.zeros_like(state_out.joint_tau)
+                else:
+                    tmp = model.scratch("tmp", state_out.joint_tau.shape)
 
                 # solve for qdd
                 tape.launch(
@@ -35,8 +35,86 @@ def parse_diff_env_kwargs(diff_env):
     return env_kwargs
 
 
+class AsyncTransfer:
+    """Moves batches of tensors between two devices through pinned host buffers
+
+    Host to CUDA copies are staged in pinned memory and issued non-blocking, CUDA to
+    host copies land in pinned buffers with one synchronization per batch instead of
+    one per tensor. Staging buffers are double-buffered, so tensors returned by the
+    previous call stay valid while the next batch is copied.
+    """
+
+    def __init__(self, src, dst, slots=2):
+        self.src = torch.device(src)
+        self.dst = torch.device(dst)
+        self.slots = slots
+        self.slot = 0
+        self.buffers = {}
+        self.events = [None] * slots
+
+    def _staging(self, key, tensor):
+        buffers = self.buffers.get(key)
+
+        if (
+            buffers is None
+            or buffers[0].shape != tensor.shape
+            or buffers[0].dtype != tensor.dtype
+        ):
+            buffers = [
+                torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True)
+                for _ in range(self.slots)
+            ]
+            self.buffers[key] = buffers
+
+        return buffers[self.slot]
+
+    def __call__(self, **tensors):
+        """Returns a dict with the tensors moved to the destination device"""
+
+        if self.src.type == self.dst.type:
+            return {k: t.to(self.dst) for k, t in tensors.items()}
+
+        # wait until the copies issued from this slot two calls ago have finished
+        event = self.events[self.slot]
+        if event is not None:
+            event.synchronize()
+
+        out = {}
+
+        if self.dst.type == "cuda":
+            for k, t in tensors.items():
+                staging = self._staging(k, t)
+                staging.copy_(t)
+                out[k] = staging.to(self.dst, non_blocking=True)
+
+            event = torch.cuda.Event()
+            event.record(torch.cuda.current_stream(self.dst))
+            self.events[self.slot] = event
+        else:
+            for k, t in tensors.items():
+                staging = self._staging(k, t)
+                staging.copy_(t.detach(), non_blocking=True)
+                out[k] = staging
+
+            torch.cuda.current_stream(self.src).synchronize()
+
+        self.slot = (self.slot + 1) % self.slots
+
+        return out
+
+
 class RLGPUEnv(vecenv.IVecEnv):
-    def __init__(self, config_name, num_actors, **kwargs):
+    def __init__(
+        self, config_name, num_actors, async_transfer=False, info_keys=None, **kwargs
+    ):
+        """
+        Args:
+            async_transfer: Copy actions, observations, rewards and dones between the
+                env and rl_games devices through pinned buffers with non-blocking copies
+            info_keys: Only pass these keys of the step extras on to rl_games, all keys
+                are passed if None
+        """
+
         self.env = env_configurations.configurations[config_name]["env_creator"](
             **kwargs
         )
@@ -45,13 +123,32 @@ class RLGPUEnv(vecenv.IVecEnv):
 
         self.rl_device = "cuda" if torch.cuda.is_available() else "cpu"
 
+        self.info_keys = info_keys
+
+        self.to_rl = None
+        self.to_env = None
+        if async_transfer:
+            self.to_rl = AsyncTransfer(self.env.device, self.rl_device)
+            self.to_env = AsyncTransfer(self.rl_device, self.env.device)
+
         self.full_state["obs"] = self.env.reset(force_reset=True).to(self.rl_device)
         print(self.full_state["obs"].shape)
 
     def step(self, actions):
-        self.full_state["obs"], reward, is_done, info = self.env.step(
-            actions.to(self.env.device)
-        )
+        if self.to_env is not None:
+            actions = self.to_env(actions=actions)["actions"]
+        else:
+            actions = actions.to(self.env.device)
+
+        self.full_state["obs"], reward, is_done, info = self.env.step(actions)
+
+        if self.info_keys is not None:
+            info = {k: v for k, v in info.items() if k in self.info_keys}
+
+        if self.to_rl is not None:
+            out = self.to_rl(obs=self.full_state["obs"], reward=reward, is_done=is_done)
+
+            return out["obs"], out["reward"], out["is_done"], info
 
         return (
             self.full_state["obs"].to(self.rl_device),
@@ -30,6 +30,14 @@ class RunningMeanStd(object):
         rms.count = self.count
         return rms
 
+    def state_dict(self):
+        return {"mean": self.mean, "var": self.var, "count": self.count}
+
+    def load_state_dict(self, state):
+        self.mean = state["mean"].to(self.mean.device).clone()
+        self.var = state["var"].to(self.var.device).clone()
+        self.count = state["count"]
+
     @torch.no_grad()
     def update(self, arr: torch.tensor) -> None:
         batch_mean = torch.mean(arr, dim=0)
@@ -0,0 +1,27 @@
+# Copyright (c) 2022 NVIDIA CORPORATION.  All rights reserved.
+# NVIDIA CORPORATION and its licensors retain all intellectual property
+# and proprietary rights in and to this software, related documentation
+# and any modifications thereto.  Any use, reproduction, disclosure or
+# distribution of this software and related documentation without an express
+# license agreement from NVIDIA CORPORATION is strictly prohibited.
+
+
+class SimStateMemory:
+    """Logs the peak memory of the intermediate simulation states of an env
+
+    dflex envs recycle intermediate simulation states through the StatePool of
+    their model, other envs have no pool and are not logged.
+    """
+
+    def __init__(self, env):
+        self.pool = getattr(getattr(env, "model", None), "state_pool", None)
+
+    def reset_peak(self):
+        if self.pool is not None:
+            self.pool.reset_peak()
+
+    def log(self, log_scalar):
+        """Logs the peak since the last reset_peak() with `log_scalar(name, value)`"""
+
+        if self.pool is not None:
+            log_scalar("sim_state_peak_mb", self.pool.peak_bytes / 2**20)
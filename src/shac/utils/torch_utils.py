@@ -11,6 +11,7 @@ import numpy as np
 import gc
 import torch
 import cProfile
+import warnings
 from time import sleep
 
 log_output = ""
@@ -222,6 +223,108 @@ def grad_norm(params):
     return torch.sqrt(grad_norm)
 
 
+def reverse_linear_scan(coef, b, done, x_end=None):
+    """Solves x_i = coef * (1 - done_i) * x_{i+1} + b_i for all i at once
+
+    The recursion runs backwards over the first dim of `b` / `done` starting
+    from `x_end` (zeros if None). Rather than one step at a time, each x_i is
+    evaluated in closed form as the coef-discounted sum of b over [i, e_i],
+    where e_i is the first done step at or after i, using a reverse cumsum
+    (in float64 to keep the coef^-i rescaling accurate).
+    """
+
+    T = b.shape[0]
+    view = (-1,) + (1,) * (b.dim() - 1)
+
+    if coef == 0.0:
+        return b.clone()
+
+    steps = torch.arange(T + 1, device=b.device).view(view)
+    powers = torch.pow(torch.tensor(coef, dtype=torch.float64, device=b.device), steps)
+
+    # R_i = sum_{j >= i} coef^j b_j with R_T = 0
+    scaled = b.double() * powers[:T]
+    R = torch.flip(torch.cumsum(torch.flip(scaled, [0]), dim=0), [0])
+    R = torch.cat((R, torch.zeros_like(R[:1])))
+
+    # first done step at or after i, T if there is none
+    end = torch.where(done > 0, steps[:T], torch.full_like(steps[:T], T))
+    end = torch.flip(torch.cummin(torch.flip(end, [0]), dim=0).values, [0])
+
+    x = (R[:T] - R.gather(0, torch.clamp(end + 1, max=T))) / powers[:T]
+
+    if x_end is not None:
+        # segments that reach the end also carry coef^(T-i) x_end
+        carry = powers[T] / powers[:T] * x_end.double()
+        x = x + torch.where(end == T, carry, torch.zeros_like(carry))
+
+    return x.to(b.dtype)
+
+
+def td_lambda_targets(rew, values, done_mask, gamma, lam):
+    """Batched TD(lambda) value targets over [T, N] reward, next value and done buffers
+
+    Equivalent to the reversed per-step loop
+
+        lam_i = lam_{i+1} * lam * (1 - d_i) + d_i
+        A_i = (1 - d_i) * (lam * gamma * A_{i+1} + gamma * V_i + (1 - lam_i) / (1 - lam) * r_i)
+        B_i = gamma * (V_i * d_i + B_{i+1} * (1 - d_i)) + r_i
+        target_i = (1 - lam) * A_i + lam_i * B_i
+
+    with lam_T = 1 and A_T = B_T = 0, but each recursion is evaluated with
+    reverse_linear_scan instead of T small kernel launches.
+    """
+
+    not_done = 1.0 - done_mask
+
+    lam_i = reverse_linear_scan(lam, done_mask, done_mask, torch.ones_like(rew[0]))
+    A = reverse_linear_scan(
+        lam * gamma,
+        not_done * (gamma * values + (1.0 - lam_i) / (1.0 - lam) * rew),
+        done_mask,
+    )
+    B = reverse_linear_scan(gamma, gamma * values * done_mask + rew, done_mask)
+
+    return (1.0 - lam) * A + lam_i * B
+
+
+class SyncCounter:
+    """Counts device to host synchronizations made inside a `with` block
+
+    Relies on torch's CUDA sync debug mode, which warns on every synchronizing
+    operation, so it only counts on CUDA devices. The total over all blocks
+    is kept in `count` until `reset()` is called.
+    """
+
+    def __init__(self, device, enabled=True):
+        self.enabled = enabled and torch.device(device).type == "cuda"
+        self.count = 0
+        self._catcher = None
+
+    def reset(self):
+        count = self.count
+        self.count = 0
+        return count
+
+    def __enter__(self):
+        if self.enabled:
+            self._mode = torch.cuda.get_sync_debug_mode()
+            self._catcher = warnings.catch_warnings(record=True)
+            self._records = self._catcher.__enter__()
+            warnings.simplefilter("always")
+            torch.cuda.set_sync_debug_mode("warn")
+        return self
+
+    def __exit__(self, *args):
+        if self._catcher is not None:
+            torch.cuda.set_sync_debug_mode(self._mode)
+            self._catcher.__exit__(*args)
+            self._catcher = None
+            self.count += sum(
+                1 for w in self._records if "synchronizing" in str(w.message)
+            )
+
+
 def print_leaf_nodes(grad_fn, id_set):
     if grad_fn is None:
         return